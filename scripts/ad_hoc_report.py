@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Ad hoc report: runs every query in sql/ad_hoc_analysis.sql concurrently
+against one scored snapshot and prints each result as a rich table
+"""
+
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pyarrow as pa
+from rich.console import Console
+from rich.table import Table
+from rich.text import Text
+
+import pipeline_runner as runner
+import result_cache
+import validate_ingest
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+AD_HOC_SQL = PROJECT_ROOT / 'sql' / 'ad_hoc_analysis.sql'
+
+# The queries share one snapshot, so they may only read it
+READ_ONLY_STATEMENT = re.compile(r'(SELECT|WITH|FROM)\b', re.IGNORECASE)
+TITLE_PREFIX = re.compile(r'^Overview:\s*')
+
+# Rows shown (and cached) per query; a listing like "deals closing soon" runs
+# to hundreds of thousands of rows on a large export
+MAX_ROWS = 25
+
+# Schema metadata marking a cached result that had more rows than it kept
+TRUNCATED = {b'truncated': b'true'}
+
+
+def load_queries(sql_path=AD_HOC_SQL):
+    """(title, sql) for each query in the file, titled by the first line of the comment block above it"""
+    queries = []
+    for chunk in Path(sql_path).read_text().split(';'):
+        title, sql_lines, in_comment = None, [], False
+        for line in chunk.splitlines():
+            stripped = line.strip()
+            if stripped.startswith('--'):
+                if not in_comment and not sql_lines:
+                    title = TITLE_PREFIX.sub('', stripped.lstrip('-').strip())
+                in_comment = True
+            else:
+                in_comment = False
+                if stripped:
+                    sql_lines.append(line)
+        sql = '\n'.join(sql_lines).strip()
+        if not sql:
+            continue
+        if not READ_ONLY_STATEMENT.match(sql):
+            raise ValueError(f"{sql_path}: only queries can run against the shared snapshot, got: {sql.split()[0]}")
+        queries.append((title or f'Query {len(queries) + 1}', sql))
+    return queries
+
+
+def fetch_head(result, rows):
+    """(first rows of a result as an Arrow table, whether it had more) without fetching the rest"""
+    reader = runner.arrow_batches(result, rows + 1)
+    batches, fetched = [], 0
+    for batch in reader:
+        batches.append(batch)
+        fetched += batch.num_rows
+        if fetched > rows:
+            break
+    return pa.Table.from_batches(batches, reader.schema).slice(0, rows), fetched > rows
+
+
+def run_queries(con, queries, workers=None, max_rows=MAX_ROWS):
+    """[(table, truncated, seconds)] for each (title, sql), run concurrently, one cursor per query
+
+    DuckDB releases the GIL while it executes, and every cursor reads the same
+    snapshot, so the queries overlap and the wall time approaches the slowest
+    one given enough cores.
+    """
+    def timed(sql):
+        started = time.perf_counter()
+        cursor = con.cursor()
+        try:
+            table, truncated = fetch_head(cursor.execute(sql), max_rows)
+        finally:
+            cursor.close()
+        return table, truncated, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=workers or max(len(queries), 1)) as pool:
+        return list(pool.map(timed, [sql for _, sql in queries]))
+
+
+def build_report(con, input_path=runner.DEFAULT_INPUT, queries=None, use_cache=True, workers=None,
+                 max_rows=MAX_ROWS, keep_duplicates=False, cache_dir=result_cache.CACHE_DIR):
+    """[{'title', 'table', 'truncated', 'seconds', 'cached'}] for each ad hoc query over the scored export
+
+    Results are cached under the snapshot's content key (the input, reference
+    tables, scoring SQL and risk model, as for the runner) plus the query
+    text. Deals are only scored, once, into a snapshot table when a query
+    misses.
+    """
+    queries = load_queries() if queries is None else queries
+    runner.score(con, input_path, keep_duplicates=keep_duplicates)
+    statements = runner.load_scoring_sql() + ([runner.KEEP_DUPLICATES_VIEW] if keep_duplicates else [])
+    snapshot_key = result_cache.cache_key(con, input_path, statements, runner.RISK_MODEL) if use_cache else None
+
+    keys = [result_cache.query_key(snapshot_key, f"{sql}\nLIMIT {max_rows}") if snapshot_key else None
+            for _, sql in queries]
+    results = []
+    for (title, _), key in zip(queries, keys):
+        cached = result_cache.load_table(key, cache_dir) if key else None
+        results.append({
+            'title': title,
+            'table': cached,
+            'truncated': cached is not None and cached.schema.metadata == TRUNCATED,
+            'seconds': 0.0,
+            'cached': cached is not None,
+        })
+
+    misses = [i for i, result in enumerate(results) if not result['cached']]
+    if misses:
+        runner.snapshot_scores(con)
+        for i, (table, truncated, seconds) in zip(misses, run_queries(con, [queries[i] for i in misses], workers,
+                                                                        max_rows)):
+            results[i].update(table=table, truncated=truncated, seconds=seconds)
+            if keys[i]:
+                result_cache.store_table(keys[i], table.replace_schema_metadata(TRUNCATED if truncated else None),
+                                         cache_dir)
+    return results
+
+
+def rich_table(title, table, seconds=0.0, cached=False, truncated=False):
+    """A rich Table for an Arrow result, numbers right-aligned
+
+    Titles, headers and values are Text, not markup, so a deal named
+    'Foo [/bar]' prints as written.
+    """
+    rows = f'first {table.num_rows} rows' if truncated else f'{table.num_rows} rows'
+    timing = 'cached' if cached else f'{seconds:.2f}s'
+    view = Table(title=Text.assemble(title, (f' ({rows}, {timing})', 'dim')), title_justify='left')
+    for field in table.schema:
+        numeric = pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_decimal(field.type)
+        view.add_column(Text(field.name), justify='right' if numeric else 'left')
+    for row in table.to_pylist():
+        view.add_row(*(Text('' if value is None else str(value)) for value in row.values()))
+    return view
+
+
+def print_report(results, console=None):
+    console = console or Console()
+    for result in results:
+        console.print(rich_table(result['title'], result['table'], result['seconds'], result['cached'],
+                                 result['truncated']))
+        console.print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV or Parquet)')
+    parser.add_argument('--sql', type=Path, default=AD_HOC_SQL, help='File of queries over risk_analysis')
+    parser.add_argument('--workers', type=int, default=None, help='Queries run at once (default: all of them)')
+    parser.add_argument('--max-rows', type=int, default=MAX_ROWS, help='Rows shown per query')
+    parser.add_argument('--no-cache', action='store_true', help='Re-run every query, bypassing the result cache')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Score duplicate opportunities too instead of collapsing them into one deal')
+    runner.add_resource_arguments(parser)
+    args = parser.parse_args()
+
+    con = runner.connect(limits=runner.resource_limits(args.memory_limit, args.spill_dir, args.threads))
+    started = time.perf_counter()
+    results = build_report(con, validate_ingest.validated(args.input), load_queries(args.sql),
+                           use_cache=not args.no_cache, workers=args.workers, max_rows=args.max_rows,
+                           keep_duplicates=args.keep_duplicates)
+    elapsed = time.perf_counter() - started
+
+    print_report(results)
+    cached = sum(result['cached'] for result in results)
+    slowest = max((result['seconds'] for result in results), default=0)
+    print(f"✅ {len(results)} queries ({cached} cached) in {elapsed:.2f}s, slowest query {slowest:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Out-of-core benchmark: scores and renders a synthetic export of any size under
+a DuckDB memory limit and reports the runner's wall time and peak memory
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pipeline_runner as runner
+import validate_ingest
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_WORK_DIR = PROJECT_ROOT / '.cache' / 'benchmark'
+
+# DuckDB's memory_limit covers its buffer pool, not the interpreter, the
+# libraries or allocator slack, which took another ~0.3-0.4 GB on the runner
+MEMORY_LIMIT_SHARE = 0.7
+
+# Copies of the base export with fresh Ids and amounts scaled by up to +/-50%,
+# so the scaled export has unique Ids and a spread of amounts
+SCALED_EXPORT_QUERY = """
+SELECT * REPLACE (
+    "Id" || '-' || copy AS "Id",
+    CAST("Amount" * (0.5 + (hash("Id", copy) % 1000) / 1000.0) AS DECIMAL(12,2)) AS "Amount"
+)
+FROM {base} CROSS JOIN range({copies}) AS copies(copy)
+"""
+
+
+def scale_export(con, base, rows, output):
+    """Write at least rows opportunities to output (Parquet) by repeating the base export; returns the row count"""
+    base_scan = validate_ingest.csv_scan(base, store_rejects=False)
+    base_rows = con.execute(f"SELECT COUNT(*) FROM {base_scan}").fetchone()[0]
+    copies = -(-rows // base_rows)
+    con.execute(
+        f"COPY ({SCALED_EXPORT_QUERY.format(base=base_scan, copies=copies)}) "
+        f"TO {runner.sql_literal(Path(output).as_posix())} (FORMAT PARQUET)"
+    )
+    return base_rows * copies
+
+
+def peak_child_bytes():
+    """Peak resident memory of the largest finished child process (ru_maxrss is in KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def run_benchmark(rows, memory_limit, threads, work_dir, base=runner.DEFAULT_INPUT):
+    """Build the scaled export if needed, then run pipeline_runner.py on it in a child process
+
+    Returns (rows, seconds, peak_bytes, output). The export is reused across
+    runs of the same size.
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    export = work_dir / f'opportunities_{rows}.parquet'
+    if not export.exists():
+        print(f"   Building a {rows:,}-row export from {base}")
+        staging = export.with_suffix('.tmp')
+        with runner.connect(limits=runner.resource_limits(memory_limit, work_dir / 'spill', threads)) as con:
+            scale_export(con, base, rows, staging)
+        staging.replace(export)
+
+    # The copies repeat each deal's name and account, so they would all
+    # collapse into the base deals as duplicates; score every one
+    command = [
+        sys.executable, str(Path(__file__).parent / 'pipeline_runner.py'),
+        '--input', str(export), '--html-output', str(work_dir / 'dashboard.html'), '--no-cache',
+        '--keep-duplicates', '--memory-limit', memory_limit, '--spill-dir', str(work_dir / 'spill'),
+    ]
+    if threads:
+        command += ['--threads', str(threads)]
+    started = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f"pipeline_runner.py failed after {seconds:.1f}s:\n{result.stderr}")
+    with runner.connect() as con:
+        scored_rows = con.execute(f"SELECT COUNT(*) FROM {runner.source_scan(export)}").fetchone()[0]
+    return scored_rows, seconds, peak_child_bytes(), result.stdout
+
+
+def parse_bytes(size):
+    """'2GB' / '512MB' / '1.5GiB' as a byte count, read the way DuckDB reads memory_limit"""
+    units = {'kb': 1e3, 'mb': 1e6, 'gb': 1e9, 'tb': 1e12, 'kib': 2**10, 'mib': 2**20, 'gib': 2**30, 'tib': 2**40}
+    text = size.strip().lower()
+    for unit in sorted(units, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * units[unit])
+    return int(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=50_000_000, help='Opportunities in the scaled export')
+    parser.add_argument('--cap', default='2GB', help='Peak memory the runner process may reach')
+    parser.add_argument('--memory-limit',
+                        help='DuckDB memory limit (default: 70%% of --cap, leaving room for Python, '
+                             'pandas/Arrow and allocations DuckDB does not count)')
+    parser.add_argument('--threads', type=int, help='DuckDB threads (default: one per core)')
+    parser.add_argument('--base', type=Path, default=runner.DEFAULT_INPUT, help='Export to repeat (CSV)')
+    parser.add_argument('--work-dir', type=Path, default=DEFAULT_WORK_DIR,
+                        help='Where the scaled export, spill files and dashboard are written')
+    args = parser.parse_args()
+
+    cap = parse_bytes(args.cap)
+    memory_limit = args.memory_limit or f"{int(cap * MEMORY_LIMIT_SHARE / 1e6)}MB"
+    rows, seconds, peak, _ = run_benchmark(args.rows, memory_limit, args.threads, args.work_dir, args.base)
+    status = '✅' if peak <= cap else '❌'
+    print(f"{status} Scored and rendered {rows:,} rows in {seconds:.1f}s with memory_limit {memory_limit}; "
+          f"peak memory {peak / 1e9:.2f} GB of a {cap / 1e9:.2f} GB cap")
+    if peak > cap:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Derive stage benchmarks (min/max days in stage) from Closed Won stage history
+
+Reads OpportunityFieldHistory-style exports (OpportunityId, Field, OldValue,
+NewValue, CreatedDate) and summarizes time in stage with mergeable quantile
+sketches, so shards can be folded in one streaming pass and new history added
+incrementally each night. Each shard must hold complete histories for the
+opportunities it contains (e.g. a nightly extract of deals closed that day).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import numpy as np
+from pathlib import Path
+
+import pipeline_runner as runner
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_STATE = PROJECT_ROOT / 'data' / 'stage_sketches.json'
+DEFAULT_OUTPUT = runner.REFERENCE_OVERRIDES['stage_benchmarks']
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+# Days in stage for each stage a Closed Won deal passed through
+WON_STAGE_DURATIONS_QUERY = """
+WITH transitions AS (
+    SELECT
+        "OpportunityId" AS opportunity_id,
+        "NewValue" AS stage_name,
+        CAST("CreatedDate" AS DATE) AS entered_at,
+        LEAD(CAST("CreatedDate" AS DATE)) OVER w AS exited_at,
+        LAST_VALUE("NewValue") OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS final_stage
+    FROM {source}
+    WHERE "Field" = 'StageName'
+    WINDOW w AS (PARTITION BY "OpportunityId" ORDER BY "CreatedDate")
+)
+SELECT stage_name, DATE_DIFF('day', entered_at, exited_at) AS days
+FROM transitions
+WHERE final_stage = 'Closed Won' AND exited_at IS NOT NULL
+"""
+
+
+class QuantileSketch:
+    """Mergeable log-bucketed quantile sketch (DDSketch-style) with bounded relative error
+
+    Values land in buckets whose bounds grow by a factor of gamma, so any
+    quantile is returned within relative_accuracy of the true value. Two
+    sketches with the same accuracy merge by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, buckets=None, zero_count=0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {int(k): int(v) for k, v in (buckets or {}).items()}
+        self.zero_count = int(zero_count)
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, values):
+        values = np.asarray(values, dtype='float64')
+        positive = values[values > 0]
+        self.zero_count += int(values.size - positive.size)
+
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype('int64'), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge sketches with the same relative accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'buckets': {str(k): v for k, v in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['relative_accuracy'], data['buckets'], data['zero_count'])
+
+
+def shard_digest(path):
+    """Content hash identifying a shard, so a renamed shard is not folded in twice and a new one is never skipped"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_state(state_file):
+    """Sketches per stage plus the content hashes of the shards already folded in"""
+    if Path(state_file).exists():
+        data = json.loads(Path(state_file).read_text())
+        sketches = {stage: QuantileSketch.from_dict(s) for stage, s in data['sketches'].items()}
+        return sketches, set(data['shards'])
+    return {}, set()
+
+
+def save_state(state_file, sketches, shards):
+    Path(state_file).parent.mkdir(parents=True, exist_ok=True)
+    Path(state_file).write_text(json.dumps({
+        'sketches': {stage: sketch.to_dict() for stage, sketch in sorted(sketches.items())},
+        'shards': sorted(shards),
+    }, indent=2))
+
+
+def summarize_shard(con, shard, relative_accuracy, batch_rows=1_000_000):
+    """Stream one history shard into per-stage sketches"""
+    sketches = {}
+    result = con.execute(WON_STAGE_DURATIONS_QUERY.format(source=runner.source_scan(shard)))
+    for batch in runner.arrow_batches(result, batch_rows):
+        stages = batch.column('stage_name').to_numpy(zero_copy_only=False)
+        days = batch.column('days').to_numpy(zero_copy_only=False)
+        for stage in np.unique(stages):
+            sketch = sketches.setdefault(stage, QuantileSketch(relative_accuracy))
+            sketch.add(days[stages == stage])
+    return sketches
+
+
+def current_benchmarks(con):
+    """Benchmarks from the scoring SQL (plus any existing override), used for stage order and fallbacks"""
+    runner.create_reference_tables(con)
+    return con.execute(
+        "SELECT stage_name, min_days, max_days, sequence_order FROM stage_benchmarks ORDER BY sequence_order"
+    ).fetchall()
+
+
+def calibrate(sketches, benchmarks, low=0.25, high=0.75, min_samples=20):
+    """Per-stage (min_days, max_days) percentiles; stages without enough history keep their current values"""
+    rows = []
+    for stage_name, min_days, max_days, sequence_order in benchmarks:
+        sketch = sketches.get(stage_name)
+        if sketch and sketch.count >= min_samples:
+            min_days = max(1, round(sketch.quantile(low)))
+            max_days = max(min_days, round(sketch.quantile(high)))
+        rows.append((stage_name, min_days, max_days, sequence_order))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('shards', nargs='*', type=Path, help='Stage history files (CSV or Parquet)')
+    parser.add_argument('--state', type=Path, default=DEFAULT_STATE, help='Sketch state carried between runs')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='Calibrated stage_benchmarks CSV')
+    parser.add_argument('--low', type=float, default=0.25, help='Percentile used for min_days')
+    parser.add_argument('--high', type=float, default=0.75, help='Percentile used for max_days')
+    parser.add_argument('--min-samples', type=int, default=20,
+                        help='Minimum Closed Won stage visits per stage (a deal re-entering a stage counts again)')
+    parser.add_argument('--accuracy', type=float, default=0.01, help='Sketch relative accuracy')
+    args = parser.parse_args()
+
+    sketches, processed = load_state(args.state)
+    con = runner.connect()
+
+    for shard in args.shards:
+        digest = shard_digest(shard)
+        if digest in processed:
+            print(f"   Skipping already summarized shard: {shard}")
+            continue
+        for stage, sketch in summarize_shard(con, shard, args.accuracy).items():
+            sketches.setdefault(stage, QuantileSketch(args.accuracy)).merge(sketch)
+        processed.add(digest)
+        print(f"   Summarized {shard}")
+
+    save_state(args.state, sketches, processed)
+    rows = calibrate(sketches, current_benchmarks(con), args.low, args.high, args.min_samples)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        f.write('stage_name,min_days,max_days,sequence_order\n')
+        for row in rows:
+            f.write(','.join(str(v) for v in row) + '\n')
+
+    print(f"\n✅ Calibrated stage benchmarks (p{args.low * 100:.0f}-p{args.high * 100:.0f} of Closed Won time in stage)")
+    for stage_name, min_days, max_days, _ in rows:
+        samples = sketches[stage_name].count if stage_name in sketches else 0
+        print(f"   {stage_name:<22} {min_days:>4}-{max_days:<4} days  ({samples} visits)")
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
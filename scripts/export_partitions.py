@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Partitioned alert export: Hive-partitioned Parquet and newline-delimited JSON,
+one directory per owner and stage, plus a manifest of per-file stats
+"""
+
+import argparse
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pipeline_runner as runner
+import validate_ingest
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / 'exports' / 'alerts'
+PARTITION_COLUMNS = ('owner_name', 'stage_name')
+MANIFEST_FILE = '_manifest.json'
+
+# Per-file row and value stats, read back from what was actually written
+FILE_STATS_QUERY = """
+SELECT
+    filename,
+    owner_name,
+    stage_name,
+    COUNT(*) AS rows,
+    SUM(amount) AS amount,
+    MIN(risk_score) AS min_risk_score,
+    MAX(risk_score) AS max_risk_score
+FROM read_parquet({files}, hive_partitioning = true, filename = true)
+GROUP BY ALL
+ORDER BY owner_name, stage_name, filename
+"""
+
+
+def write_parquet(con, parquet_dir):
+    """One partitioned COPY; DuckDB writes the partitions on all its threads"""
+    con.execute(
+        f"COPY ({runner.ALERTS_QUERY}) TO {runner.sql_literal(parquet_dir.as_posix())} "
+        f"(FORMAT PARQUET, PARTITION_BY ({', '.join(PARTITION_COLUMNS)}))"
+    )
+
+
+def write_ndjson(con, parquet_file, json_file):
+    """NDJSON for one partition, read from its Parquet file so each writer scans only its slice
+
+    DuckDB can't partition JSON output itself, so the JSON side mirrors the
+    Parquet directory layout. Rows keep every column, owner and stage included,
+    so a partition file stands on its own.
+    """
+    json_file.parent.mkdir(parents=True, exist_ok=True)
+    con.execute(
+        f"COPY (SELECT * FROM read_parquet({runner.sql_literal(parquet_file.as_posix())}, hive_partitioning = true)) "
+        f"TO {runner.sql_literal(json_file.as_posix())} (FORMAT JSON)"
+    )
+
+
+def export_partitions(con, output_dir=DEFAULT_OUTPUT_DIR, max_workers=8):
+    """Write both formats from a scored connection and return the manifest
+
+    With no alerts nothing is written but an empty manifest, so a consumer
+    still finds one.
+    """
+    output_dir = Path(output_dir)
+    parquet_dir = output_dir / 'parquet'
+    json_dir = output_dir / 'ndjson'
+    for path in (parquet_dir, json_dir):
+        shutil.rmtree(path, ignore_errors=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = {'partition_by': list(PARTITION_COLUMNS), 'files': []}
+    if not con.execute("SELECT COUNT(*) FROM risk_alerts").fetchone()[0]:
+        (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        return manifest
+
+    write_parquet(con, parquet_dir)
+
+    files = runner.sql_literal((parquet_dir / '**' / '*.parquet').as_posix())
+    stats = con.execute(FILE_STATS_QUERY.format(files=files)).fetchall()
+
+    json_targets = []
+    for filename, owner, stage, rows, amount, min_score, max_score in stats:
+        parquet_file = Path(filename)
+        relative = parquet_file.relative_to(parquet_dir)
+        json_file = json_dir / relative.with_suffix('.json')
+        json_targets.append((parquet_file, json_file))
+        for fmt, path in (('parquet', parquet_file), ('ndjson', json_file)):
+            manifest['files'].append({
+                'path': path.relative_to(output_dir).as_posix(),
+                'format': fmt,
+                'owner_name': owner,
+                'stage_name': stage,
+                'rows': rows,
+                'amount': float(amount or 0),
+                'min_risk_score': min_score,
+                'max_risk_score': max_score,
+            })
+
+    # One cursor per writer thread; DuckDB releases the GIL while it writes
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(lambda src, dst: write_ndjson(con.cursor(), src, dst), src, dst)
+            for src, dst in json_targets
+        ]
+        for future in futures:
+            future.result()
+
+    (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--input', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT_DIR, help='Export directory')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent NDJSON writers')
+    args = parser.parse_args()
+
+    con = runner.connect()
+    runner.score(con, validate_ingest.validated(args.input))
+    manifest = export_partitions(con, args.output, args.workers)
+
+    partitions = len(manifest['files']) // 2
+    rows = sum(f['rows'] for f in manifest['files'] if f['format'] == 'parquet')
+    print(f"✅ Exported {rows} alerts into {partitions} owner/stage partitions")
+    print(f"   Parquet: {args.output / 'parquet'}")
+    print(f"   NDJSON:  {args.output / 'ndjson'}")
+    print(f"   Stats:   {args.output / MANIFEST_FILE}")
+
+
+if __name__ == "__main__":
+    main()
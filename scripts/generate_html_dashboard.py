@@ -3,8 +3,13 @@
 Pipeline health risk analysis 
 """
 
+import heapq
+import math
+import os
 import pandas as pd
+import pyarrow as pa
 import json
+from html import escape
 from pathlib import Path
 
 # Get the project root directory
@@ -23,110 +28,163 @@ COLORS = {
     'high_risk': '#dc3545',  # Red
 }
 
-# Load data
-with open(PROJECT_ROOT / 'data' / 'dashboard_data.json', 'r') as f:
-    alerts = json.load(f)
-
-df = pd.read_csv(PROJECT_ROOT / 'data' / 'salesforce_opportunities.csv')
-df_open = df[~df['StageName'].isin(['Closed Won', 'Closed Lost'])].copy()
-
-# Add risk data
-alert_ids = {alert['id']: alert for alert in alerts}
-df_open['risk_level'] = df_open['Id'].apply(
-    lambda x: alert_ids[x]['risk_level'] if x in alert_ids else 'healthy'
-)
-df_open['risk_score'] = df_open['Id'].apply(
-    lambda x: alert_ids[x]['risk_score'] if x in alert_ids else 0
-)
-
-# Calculate metrics
-total_deals = len(df_open)
-total_pipeline = df_open['Amount'].sum()
-risk_counts = df_open['risk_level'].value_counts()
-risk_values = df_open.groupby('risk_level')['Amount'].sum()
-
-at_risk_value = risk_values.get('at_risk', 0) + risk_values.get('high_risk', 0)
-at_risk_count = risk_counts.get('at_risk', 0) + risk_counts.get('high_risk', 0)
-at_risk_pct = (at_risk_value / total_pipeline * 100)
-avg_risk_at_risk = df_open[df_open['risk_score'] > 0]['risk_score'].mean()
-
-# Sort alerts and enrich with risk factors and actions
-top_alerts = sorted(alerts, key=lambda x: (-x['risk_score'], -x['amount']))[:10]
-
-# Function to generate risk factors and actions
-def get_risk_factors(alert):
-    factors = []
-    if alert['days_in_stage'] > 35:
-        factors.append(f"Stuck in stage for {alert['days_in_stage']} days")
-    if alert['days_since_activity'] > 10:
-        factors.append(f"No activity in {alert['days_since_activity']} days")
-    if alert['days_to_close'] < 0:
-        factors.append(f"Close date passed {abs(alert['days_to_close'])} days ago")
-    elif alert['days_to_close'] <= 14:
-        factors.append(f"Closing in {alert['days_to_close']} days")
-    if alert.get('missing_field_list'):
-        factors.append(f"Missing: {alert['missing_field_list']}")
-    if alert.get('competitor') and alert['competitor'] != 'None identified':
-        factors.append(f"Competing with {alert['competitor']}")
-    return factors
-
-def get_recommended_actions(alert):
-    actions = []
-
-    # Activity-based actions
-    if alert['days_since_activity'] > 15:
-        actions.append("Re-engage immediately - deal may be stalled")
-    elif alert['days_since_activity'] > 10:
-        actions.append("Schedule follow-up call this week")
-
-    # Stage velocity actions
-    if alert['days_in_stage'] > 50:
-        actions.append("Review deal progression with manager")
-
-    # Missing fields actions
-    if alert.get('missing_field_list'):
-        fields = alert['missing_field_list']
-        if 'economic_buyer' in fields:
-            actions.append("Identify and engage economic buyer")
-        if 'technical_champion' in fields:
-            actions.append("Secure technical champion sponsor")
-        if 'security_review' in fields:
-            actions.append("Initiate security review process")
-
-    # Close date actions
-    if alert['days_to_close'] < 0:
-        actions.append("Update close date and verify deal status")
-    elif alert['days_to_close'] <= 14:
-        actions.append("Verify all requirements met for close")
-
-    # Competitor actions
-    if alert.get('competitor') and alert['competitor'] not in ['None identified', None]:
-        actions.append(f"Develop competitive strategy vs {alert['competitor']}")
-
-    # Default action if nothing specific
-    if not actions:
-        actions.append("Review deal status with account executive")
-
-    return actions[:3]  # Limit to top 3 actions
-
-# Enrich alerts
-for alert in top_alerts:
-    alert['risk_factors'] = get_risk_factors(alert)
-    alert['recommended_actions'] = get_recommended_actions(alert)
-
-# Rep performance
-rep_risk = df_open.groupby('Owner.Name')['risk_score'].mean().sort_values(ascending=False).head(8)
-
-# Generate HTML
-html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Pipeline Health Checker - Executive Dashboard</title>
-    <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-    <style>
-        * {{
+# Bins the chart data is grouped into by pipeline_runner.CHART_QUERIES. The
+# counts are fixed, so each chart draws the same number of marks at any size.
+CHART_GRID = {
+    'days_bin': 7,                   # weekly days-in-stage bins...
+    'days_bins': 27,                 # ...the last one open-ended (26 weeks+)
+    'amount_decades': (3, 7),        # $1K to $10M on a log scale; amounts outside land in the end bins
+    'amount_bins_per_decade': 8,
+    'score_bin': 0.5,
+    'score_max': 10,
+    'percentiles': (0.1, 0.25, 0.5, 0.75, 0.9),
+}
+CHART_AMOUNT_BINS = (CHART_GRID['amount_decades'][1] - CHART_GRID['amount_decades'][0]) * CHART_GRID['amount_bins_per_decade']
+
+# SVG drawing area shared by the distribution charts (viewBox units)
+CHART_WIDTH, CHART_HEIGHT = 360, 240
+CHART_PLOT = {'left': 44, 'right': 352, 'top': 10, 'bottom': 212}
+
+# Only the columns the dashboard reads; free-text fields (Description, NextStep,
+# Use_Case__c, ...) are never loaded
+OPPORTUNITY_COLUMNS = ['Id', 'Owner.Name', 'Amount', 'StageName']
+OPPORTUNITY_DTYPES = {
+    'Id': 'string',
+    'Owner.Name': 'category',
+    'Amount': 'float64',
+    'StageName': 'category',
+}
+CLOSED_STAGES = ['Closed Won', 'Closed Lost']
+
+# team_rollups levels from the top of the hierarchy down, and the column naming each node
+ROLLUP_LEVELS = ['segment', 'region', 'manager', 'owner']
+ROLLUP_NAME_COLUMNS = {
+    'segment': 'segment',
+    'region': 'region',
+    'manager': 'manager_name',
+    'owner': 'owner_name',
+}
+
+DEFAULT_HTML = PROJECT_ROOT / 'pipeline_dashboard.html'
+
+# Rows in the at-risk deals table
+TOP_ALERTS = 10
+
+# Flagged deals listed per owner, stage and region in the leaderboards, and
+# the alert column each segment groups by (region comes from the sales
+# hierarchy, so only pipeline_runner.LEADERBOARD_QUERY has it)
+LEADERBOARD_SIZE = 5
+LEADERBOARD_SEGMENTS = {
+    'owner': 'owner_name',
+    'stage': 'stage_name',
+    'region': 'region',
+}
+LEADERBOARD_COLUMNS = ['id', 'account_name', 'owner_name', 'stage_name', 'amount', 'risk_score', 'loss_probability',
+                       'risk_level']
+
+# Files larger than this on disk are aggregated chunk by chunk, and alerts that
+# could outgrow it are not fetched whole (see pipeline_runner.fetch_dashboard_alerts)
+MEMORY_BUDGET_BYTES = int(os.environ.get('PIPELINE_MEMORY_BUDGET_MB', '512')) * 1024 * 1024
+CHUNK_ROWS = 250_000
+
+
+def aggregate_open_deals(chunk, alerts_by_id):
+    """Reduce a frame of opportunities to per-owner, per-risk-level sums"""
+    open_deals = chunk[~chunk['StageName'].isin(CLOSED_STAGES)]
+    risk_level = open_deals['Id'].map(alerts_by_id['risk_level']).fillna('healthy')
+    risk_score = open_deals['Id'].map(alerts_by_id['risk_score']).fillna(0).astype('float64')
+
+    return pd.DataFrame({
+        'owner': open_deals['Owner.Name'].astype('string'),
+        'risk_level': risk_level.astype('string'),
+        'deals': 1,
+        'scored_deals': (risk_score > 0).astype('int64'),
+        'amount': open_deals['Amount'],
+        'risk_score': risk_score,
+    }).groupby(['owner', 'risk_level'], dropna=False).sum()
+
+
+def load_deal_aggregates(csv_path, alerts_by_id, memory_budget=MEMORY_BUDGET_BYTES):
+    """Load open-deal aggregates, streaming the CSV in chunks when it exceeds the budget"""
+    read_kwargs = {'usecols': OPPORTUNITY_COLUMNS, 'dtype': OPPORTUNITY_DTYPES}
+
+    if Path(csv_path).stat().st_size <= memory_budget:
+        return aggregate_open_deals(pd.read_csv(csv_path, **read_kwargs), alerts_by_id)
+
+    totals = None
+    with pd.read_csv(csv_path, chunksize=CHUNK_ROWS, **read_kwargs) as reader:
+        for chunk in reader:
+            partial = aggregate_open_deals(chunk, alerts_by_id)
+            totals = partial if totals is None else totals.add(partial, fill_value=0)
+    return totals.astype({'deals': 'int64', 'scored_deals': 'int64'})
+
+
+def load_alerts_json(json_path):
+    """Load the JSON alert export written by final_analysis_full.sql as an Arrow table"""
+    with open(json_path, 'r') as f:
+        alerts = pa.Table.from_pylist(json.load(f))
+    # Exports written before the learned risk model have no loss_probability
+    if 'loss_probability' not in alerts.column_names:
+        alerts = alerts.append_column('loss_probability', pa.nulls(alerts.num_rows, pa.float64()))
+    return alerts
+
+
+def format_probability(probability):
+    return '–' if probability is None else f"{probability:.0%}"
+
+
+def _rank_keys(alerts):
+    """Per-alert ranking keys, highest risk first: risk score, then amount, then id (as the SQL orders them)"""
+    amounts = [-math.inf if amount is None else amount for amount in alerts['amount'].to_pylist()]
+    return list(zip(alerts['risk_score'].to_pylist(), amounts, alerts['id'].to_pylist()))
+
+
+def top_alerts(alerts, n=TOP_ALERTS):
+    """The n highest-risk alerts, in rank order
+
+    heapq.nlargest keeps a heap of n rows while it scans, instead of sorting
+    every alert to take the first n.
+    """
+    keys = _rank_keys(alerts)
+    return alerts.take(pa.array(heapq.nlargest(n, range(len(keys)), key=keys.__getitem__), type=pa.int64()))
+
+
+def rank_leaderboards(alerts, n=LEADERBOARD_SIZE, segments=LEADERBOARD_SEGMENTS):
+    """Top-n alerts per owner, stage (and region, if alerts has it), in the shape of pipeline_runner.LEADERBOARD_QUERY
+
+    One pass over the alerts, with a bounded min-heap of n rows per segment
+    value: memory and heap work grow with n times the number of segment
+    values, not with the number of alerts.
+    """
+    keys = _rank_keys(alerts)
+    columns = {segment: alerts[column].to_pylist() for segment, column in segments.items()
+               if column in alerts.column_names}
+    heaps = {}
+    for row, key in enumerate(keys):
+        entry = (key, row)
+        for segment, values in columns.items():
+            heap = heaps.setdefault((segment, values[row]), [])
+            if len(heap) < n:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    boards = sorted(heaps.items(), key=lambda item: (item[0][0], item[0][1] is None, item[0][1] or ''))
+    ranked = [(segment, value, rank, row)
+              for (segment, value), heap in boards
+              for rank, (_, row) in enumerate(sorted(heap, reverse=True), start=1)]
+    table = alerts.select(LEADERBOARD_COLUMNS).take(pa.array([row for *_, row in ranked], type=pa.int64()))
+    return pa.table({
+        'segment': pa.array([segment for segment, *_ in ranked], type=pa.string()),
+        'segment_value': pa.array([value for _, value, *_ in ranked], type=pa.string()),
+        'rank': pa.array([rank for *_, rank, _ in ranked], type=pa.int64()),
+        **{name: table[name] for name in LEADERBOARD_COLUMNS},
+    })
+
+
+def dashboard_css():
+    """Stylesheet shared by every dashboard page"""
+    return f"""        * {{
             margin: 0;
             padding: 0;
             box-sizing: border-box;
@@ -360,6 +418,22 @@ html = f"""<!DOCTYPE html>
         .risk-medium {{ background: {COLORS['at_risk']}; }}
         .risk-low {{ background: {COLORS['healthy']}; }}
 
+        /* Leaderboards */
+        .leaderboard summary {{
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            padding: 10px 0;
+            font-size: 13px;
+            font-weight: 500;
+            cursor: pointer;
+            border-bottom: 1px solid {COLORS['border']};
+        }}
+
+        .leaderboard td {{
+            padding: 8px 12px;
+        }}
+
         /* Chart Containers */
         .chart-container {{
             padding: 20px;
@@ -479,14 +553,102 @@ html = f"""<!DOCTYPE html>
                 grid-template-columns: 1fr;
             }}
         }}
-    </style>
+"""
+
+
+def dashboard_js():
+    """Row expansion and bar animation shared by every dashboard page"""
+    return """        // Toggle expandable row details
+        function toggleRow(index) {
+            const detailRow = document.getElementById('detail-' + index);
+            const expandRow = event.currentTarget;
+
+            if (detailRow.classList.contains('show')) {
+                detailRow.classList.remove('show');
+                expandRow.classList.remove('expanded');
+            } else {
+                detailRow.classList.add('show');
+                expandRow.classList.add('expanded');
+            }
+        }
+
+        // Add smooth scroll animation on load
+        document.addEventListener('DOMContentLoaded', function() {
+            const bars = document.querySelectorAll('.bar-fill');
+            bars.forEach((bar, index) => {
+                setTimeout(() => {
+                    bar.style.transition = 'width 0.8s ease-out';
+                }, index * 100);
+            });
+        });
+"""
+
+
+def render_dashboard(alerts, deal_aggregates, scope=None, stylesheet_href=None, script_src=None, rollups=None,
+                     charts=None, flagged=None, leaderboards=None):
+    """Render the dashboard HTML from an Arrow table of alerts and open-deal aggregates
+
+    scope names a filtered view (an owner or team) in the header. With
+    stylesheet_href/script_src the page links shared static assets instead of
+    inlining the CSS and JS. rollups is an Arrow table of team_rollups rows,
+    already filtered to the levels to show and in hierarchy order. charts maps
+    each pipeline_runner.CHART_QUERIES name to its binned Arrow table.
+    flagged is the number of alerts when alerts holds only the top ones.
+    leaderboards is an Arrow table of pipeline_runner.LEADERBOARD_QUERY rows;
+    without it they are ranked from alerts, unless alerts holds only the top ones.
+    """
+    title = escape(f"Pipeline Health Checker - {scope}" if scope else "Pipeline Health Checker")
+    page_title = title if scope else f"{title} - Executive Dashboard"
+    if stylesheet_href:
+        stylesheet_tag = f'<link rel="stylesheet" href="{stylesheet_href}">'
+    else:
+        stylesheet_tag = f"<style>\n{dashboard_css()}    </style>"
+    if script_src:
+        script_tag = f'<script src="{script_src}"></script>'
+    else:
+        script_tag = f"<script>\n{dashboard_js()}    </script>"
+
+    # Calculate metrics
+    by_level = deal_aggregates.groupby(level='risk_level').sum()
+    total_deals = int(deal_aggregates['deals'].sum())
+    total_pipeline = deal_aggregates['amount'].sum()
+    risk_counts = by_level['deals']
+    risk_values = by_level['amount']
+
+    at_risk_value = risk_values.get('at_risk', 0) + risk_values.get('high_risk', 0)
+    at_risk_count = risk_counts.get('at_risk', 0) + risk_counts.get('high_risk', 0)
+    at_risk_pct = (at_risk_value / total_pipeline * 100)
+    scored_deals = deal_aggregates['scored_deals'].sum()
+    avg_risk_at_risk = deal_aggregates['risk_score'].sum() / scored_deals if scored_deals else 0.0
+    avg_risk_overall = deal_aggregates['risk_score'].sum() / total_deals
+
+    # Rank alerts; risk factors and actions come from the risk_rules templates in SQL
+    top_rows = top_alerts(alerts).to_pylist()
+    if leaderboards is None and flagged is None:
+        leaderboards = rank_leaderboards(alerts)
+    # The learned loss probability gets a column when a risk model filled it in
+    show_loss = any(alert.get('loss_probability') is not None for alert in top_rows)
+
+    # Rep performance
+    by_owner = deal_aggregates.groupby(level='owner').sum()
+    rep_risk = (by_owner['risk_score'] / by_owner['deals']).sort_values(ascending=False).head(8)
+
+    # Generate HTML
+    html = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{page_title}</title>
+    <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+    {stylesheet_tag}
 </head>
 <body>
     <div class="container">
         <!-- Header -->
         <div class="header">
             <div>
-                <h1>Pipeline Health Checker</h1>
+                <h1>{title}</h1>
                 <p>Automated Risk Detection Analysis • Powered by SQL + DuckDB</p>
             </div>
         </div>
@@ -508,7 +670,7 @@ html = f"""<!DOCTYPE html>
             <div class="tile metric">
                 <div class="metric-value metric-warning">{avg_risk_at_risk:.1f}</div>
                 <div class="metric-label">Avg Risk Score (At-Risk Deals)</div>
-                <div class="metric-detail">Overall Avg: {df_open['risk_score'].mean():.1f} / 10</div>
+                <div class="metric-detail">Overall Avg: {avg_risk_overall:.1f} / 10</div>
             </div>
         </div>
 
@@ -563,13 +725,13 @@ html = f"""<!DOCTYPE html>
                 <div class="chart-container">
 """
 
-# Add pipeline value bars
-for risk_level in ['high_risk', 'at_risk', 'healthy']:
-    value = risk_values.get(risk_level, 0) / 1e6
-    max_value = risk_values.max() / 1e6
-    percentage = (value / max_value * 100) if max_value > 0 else 0
+    # Add pipeline value bars
+    for risk_level in ['high_risk', 'at_risk', 'healthy']:
+        value = risk_values.get(risk_level, 0) / 1e6
+        max_value = risk_values.max() / 1e6
+        percentage = (value / max_value * 100) if max_value > 0 else 0
 
-    html += f"""
+        html += f"""
                     <div style="margin-bottom: 20px;">
                         <div class="bar-label">
                             <span class="bar-label-name">{risk_level.replace('_', ' ').title()}</span>
@@ -582,7 +744,7 @@ for risk_level in ['high_risk', 'at_risk', 'healthy']:
                     </div>
 """
 
-html += """
+    html += """
                 </div>
             </div>
 
@@ -593,21 +755,21 @@ html += """
                 <div class="chart-container">
 """
 
-# Add rep performance bars
-max_score = 10
-for owner, score in rep_risk.items():
-    percentage = (score / max_score * 100)
-    if score >= 5:
-        color = COLORS['high_risk']
-    elif score >= 3.5:
-        color = COLORS['at_risk']
-    else:
-        color = COLORS['healthy']
+    # Add rep performance bars
+    max_score = 10
+    for owner, score in rep_risk.items():
+        percentage = (score / max_score * 100)
+        if score >= 5:
+            color = COLORS['high_risk']
+        elif score >= 3.5:
+            color = COLORS['at_risk']
+        else:
+            color = COLORS['healthy']
 
-    html += f"""
+        html += f"""
                     <div style="margin-bottom: 16px;">
                         <div class="bar-label">
-                            <span class="bar-label-name">{owner}</span>
+                            <span class="bar-label-name">{escape(str(owner))}</span>
                             <span class="bar-label-value">{score:.1f}</span>
                         </div>
                         <div class="bar">
@@ -617,26 +779,41 @@ for owner, score in rep_risk.items():
                     </div>
 """
 
-html += """
+    html += """
                 </div>
             </div>
         </div>
+"""
 
+    if charts:
+        html += render_charts(charts)
+
+    if rollups is not None and rollups.num_rows:
+        html += render_rollups(rollups)
+
+    if leaderboards is not None and leaderboards.num_rows:
+        html += render_leaderboards(leaderboards)
+
+    html += """
         <!-- At-Risk Deals Table -->
         <div class="tile">
             <div class="tile-title">Top At-Risk Deals Requiring Immediate Attention</div>
             <div class="tile-subtitle">"""
 
-html += f"{len(alerts)} deals flagged"
+    html += f"{len(alerts) if flagged is None else flagged} deals flagged"
 
-html += """</div>
+    html += """</div>
             <table>
                 <thead>
                     <tr>
                         <th>Account</th>
                         <th>Stage</th>
                         <th>Amount</th>
-                        <th>Risk</th>
+                        <th>Risk</th>"""
+    if show_loss:
+        html += """
+                        <th>Loss Prob.</th>"""
+    html += """
                         <th>In Stage</th>
                         <th>Last Activity</th>
                         <th>Owner</th>
@@ -645,44 +822,45 @@ html += """</div>
                 <tbody>
 """
 
-# Add table rows with expandable details
-for idx, alert in enumerate(top_alerts):
-    risk_class = 'risk-high' if alert['risk_level'] == 'high_risk' else 'risk-medium'
+    # Add table rows with expandable details
+    for idx, alert in enumerate(top_rows):
+        risk_class = 'risk-high' if alert['risk_level'] == 'high_risk' else 'risk-medium'
+        loss_cell = f"\n                        <td>{format_probability(alert['loss_probability'])}</td>" if show_loss else ''
 
-    # Main row
-    html += f"""
+        # Main row
+        html += f"""
                     <tr class="expandable-row" onclick="toggleRow({idx})">
-                        <td><span class="expand-icon">▶</span><strong>{alert['account_name']}</strong></td>
+                        <td><span class="expand-icon">▶</span><strong>{escape(str(alert['account_name']))}</strong></td>
                         <td>{alert['stage_name']}</td>
                         <td>${alert['amount']/1000:.0f}K</td>
-                        <td><span class="risk-badge {risk_class}">{alert['risk_score']:.1f}</span></td>
+                        <td><span class="risk-badge {risk_class}">{alert['risk_score']:.1f}</span></td>{loss_cell}
                         <td>{alert['days_in_stage']}d</td>
                         <td>{alert['days_since_activity']}d ago</td>
-                        <td>{alert['owner_name']}</td>
+                        <td>{escape(str(alert['owner_name']))}</td>
                     </tr>
 """
 
-    # Detail row
-    html += f"""
+        # Detail row
+        html += f"""
                     <tr class="detail-row" id="detail-{idx}">
-                        <td colspan="7">
+                        <td colspan="{8 if show_loss else 7}">
                             <div class="detail-content">
                                 <div class="detail-section">
                                     <div class="detail-section-title">Risk Factors</div>
                                     <ul class="detail-list">
 """
 
-    if alert['risk_factors']:
-        for factor in alert['risk_factors']:
-            html += f"""
+        if alert['risk_factors']:
+            for factor in alert['risk_factors']:
+                html += f"""
                                         <li class="risk-factor">{factor}</li>
 """
-    else:
-        html += """
+        else:
+            html += """
                                         <li class="risk-factor">Standard risk monitoring</li>
 """
 
-    html += """
+        html += """
                                     </ul>
                                 </div>
                                 <div class="detail-section">
@@ -690,12 +868,12 @@ for idx, alert in enumerate(top_alerts):
                                     <ul class="detail-list">
 """
 
-    for action in alert['recommended_actions']:
-        html += f"""
+        for action in alert['recommended_actions']:
+            html += f"""
                                         <li class="action-item">• {action}</li>
 """
 
-    html += """
+        html += """
                                     </ul>
                                 </div>
                             </div>
@@ -703,7 +881,7 @@ for idx, alert in enumerate(top_alerts):
                     </tr>
 """
 
-html += """
+    html += f"""
                 </tbody>
             </table>
         </div>
@@ -714,41 +892,304 @@ html += """
         </div>
     </div>
 
-    <script>
-        // Toggle expandable row details
-        function toggleRow(index) {
-            const detailRow = document.getElementById('detail-' + index);
-            const expandRow = event.currentTarget;
-
-            if (detailRow.classList.contains('show')) {
-                detailRow.classList.remove('show');
-                expandRow.classList.remove('expanded');
-            } else {
-                detailRow.classList.add('show');
-                expandRow.classList.add('expanded');
-            }
-        }
-
-        // Add smooth scroll animation on load
-        document.addEventListener('DOMContentLoaded', function() {
-            const bars = document.querySelectorAll('.bar-fill');
-            bars.forEach((bar, index) => {
-                setTimeout(() => {
-                    bar.style.transition = 'width 0.8s ease-out';
-                }, index * 100);
-            });
-        });
-    </script>
+    {script_tag}
 </body>
 </html>
 """
 
-# Save HTML file to project root
-output_file = PROJECT_ROOT / 'pipeline_dashboard.html'
-with open(output_file, 'w') as f:
-    f.write(html)
+    return html
+
+
+def render_rollups(rollups):
+    """Team rollup table: one row per hierarchy node, indented by level"""
+    html = """
+        <!-- Team Rollup -->
+        <div class="tile">
+            <div class="tile-title">Team Rollup</div>
+            <div class="tile-subtitle">Segment → Region → Manager → Rep</div>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Team</th>
+                        <th>Deals</th>
+                        <th>Pipeline</th>
+                        <th>At Risk</th>
+                        <th>At-Risk Value</th>
+                        <th>Avg Risk</th>
+                    </tr>
+                </thead>
+                <tbody>
+"""
+
+    rows = rollups.to_pylist()
+    top_level = ROLLUP_LEVELS.index(rows[0]['rollup_level'])
+    for row in rows:
+        level = ROLLUP_LEVELS.index(row['rollup_level']) - top_level
+        name = escape(str(row[ROLLUP_NAME_COLUMNS[row['rollup_level']]]))
+        label = f"<strong>{name}</strong>" if row['rollup_level'] in ('segment', 'region') else name
+        score = row['avg_risk_score']
+        if score >= 5:
+            color = COLORS['high_risk']
+        elif score >= 3.5:
+            color = COLORS['at_risk']
+        else:
+            color = COLORS['healthy']
+
+        html += f"""
+                    <tr>
+                        <td style="padding-left: {16 + level * 24}px">{label}</td>
+                        <td>{row['deals']}</td>
+                        <td>${row['pipeline_value']/1e6:.1f}M</td>
+                        <td>{row['at_risk_deals']}</td>
+                        <td>${row['at_risk_value']/1e6:.1f}M</td>
+                        <td style="color: {color}; font-weight: 600">{score:.1f}</td>
+                    </tr>
+"""
+
+    html += """
+                </tbody>
+            </table>
+        </div>
+"""
+    return html
+
+
+def render_leaderboards(leaderboards):
+    """One tile per segment (owner, stage, region), each value's top deals folded under it"""
+    html = """
+        <!-- Leaderboards -->
+        <div class="grid grid-3">
+"""
+    rows = leaderboards.to_pylist()
+    show_loss = any(row.get('loss_probability') is not None for row in rows)
+    for segment in LEADERBOARD_SEGMENTS:
+        boards = {}
+        for row in rows:
+            if row['segment'] == segment:
+                boards.setdefault(row['segment_value'], []).append(row)
+        if not boards:
+            continue
+
+        html += f"""
+            <div class="tile">
+                <div class="tile-title">Top Risks by {segment.title()}</div>
+                <div class="tile-subtitle">Highest-risk flagged deals per {segment}</div>
+"""
+        for value, deals in boards.items():
+            lead = deals[0]
+            risk_class = 'risk-high' if lead['risk_level'] == 'high_risk' else 'risk-medium'
+            html += f"""
+                <details class="leaderboard">
+                    <summary>{escape(str(value))}<span class="risk-badge {risk_class}">{lead['risk_score']:.1f}</span></summary>
+                    <table>
+                        <tbody>
+"""
+            for deal in deals:
+                loss_cell = (f"\n                                <td>{format_probability(deal['loss_probability'])}</td>"
+                             if show_loss else '')
+                html += f"""
+                            <tr>
+                                <td>{deal['rank']}. {escape(str(deal['account_name']))}</td>
+                                <td>${deal['amount']/1000:.0f}K</td>
+                                <td>{deal['risk_score']:.1f}</td>{loss_cell}
+                            </tr>
+"""
+            html += """
+                        </tbody>
+                    </table>
+                </details>
+"""
+        html += """
+            </div>
+"""
+
+    html += """
+        </div>
+"""
+    return html
+
+
+def _amount_label(value):
+    if value >= 1e6:
+        return f"${value/1e6:.0f}M"
+    if value >= 1e3:
+        return f"${value/1e3:.0f}K"
+    return f"${value:.0f}"
+
+
+def _days_label(days_bin):
+    days = days_bin * CHART_GRID['days_bin']
+    return f"{days}d+" if days_bin == CHART_GRID['days_bins'] - 1 else f"{days}d"
+
+
+def _amount_bin_edge(amount_bin):
+    return 10 ** (CHART_GRID['amount_decades'][0] + amount_bin / CHART_GRID['amount_bins_per_decade'])
+
+
+def _chart_x(fraction):
+    return CHART_PLOT['left'] + fraction * (CHART_PLOT['right'] - CHART_PLOT['left'])
+
+
+def _chart_y(fraction):
+    return CHART_PLOT['bottom'] - fraction * (CHART_PLOT['bottom'] - CHART_PLOT['top'])
+
+
+def _log_amount_fraction(amount):
+    low, high = CHART_GRID['amount_decades']
+    fraction = (math.log10(max(amount, 1)) - low) / (high - low)
+    return min(max(fraction, 0.0), 1.0)
+
+
+def _chart_axes(x_ticks, y_ticks):
+    """Axis lines and tick labels; ticks are (fraction along the axis, label) pairs"""
+    svg = (f'<line x1="{CHART_PLOT["left"]}" y1="{CHART_PLOT["bottom"]}" x2="{CHART_PLOT["right"]}" '
+           f'y2="{CHART_PLOT["bottom"]}" stroke="{COLORS["border"]}"/>')
+    for fraction, label in x_ticks:
+        svg += (f'<text x="{_chart_x(fraction):.1f}" y="{CHART_PLOT["bottom"] + 16}" font-size="10" '
+                f'text-anchor="middle" fill="{COLORS["text"]}">{label}</text>')
+    for fraction, label in y_ticks:
+        svg += (f'<text x="{CHART_PLOT["left"] - 6}" y="{_chart_y(fraction) + 3:.1f}" font-size="10" '
+                f'text-anchor="end" fill="{COLORS["text"]}">{label}</text>')
+    return svg
+
+
+def _days_ticks():
+    bins = CHART_GRID['days_bins']
+    return [((b + 0.5) / bins, _days_label(b)) for b in range(0, bins, 4)]
+
+
+def _amount_ticks():
+    low, high = CHART_GRID['amount_decades']
+    return [((decade - low) / (high - low), _amount_label(10 ** decade)) for decade in range(low, high + 1)]
+
+
+def _count_label(count, noun):
+    return f"{count:,} {noun}" if count == 1 else f"{count:,} {noun}s"
+
+
+def _chart_svg(body):
+    return (f'<svg viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}" width="100%" role="img" '
+            f'xmlns="http://www.w3.org/2000/svg">{body}</svg>')
+
+
+def render_amount_heatmap(cells):
+    """Deals per (days in stage, amount) bin, shaded on a log scale of the deal count"""
+    rows = cells.to_pylist()
+    if not rows:
+        return _chart_svg(_chart_axes(_days_ticks(), _amount_ticks()))
+    width = (CHART_PLOT['right'] - CHART_PLOT['left']) / CHART_GRID['days_bins']
+    height = (CHART_PLOT['bottom'] - CHART_PLOT['top']) / CHART_AMOUNT_BINS
+    densest = math.log1p(max(row['deals'] for row in rows))
+
+    body = ''
+    for row in rows:
+        opacity = 0.15 + 0.85 * math.log1p(row['deals']) / densest
+        low, high = _amount_bin_edge(row['amount_bin']), _amount_bin_edge(row['amount_bin'] + 1)
+        body += (f'<rect x="{_chart_x(row["days_bin"] / CHART_GRID["days_bins"]):.1f}" '
+                 f'y="{_chart_y((row["amount_bin"] + 1) / CHART_AMOUNT_BINS):.1f}" '
+                 f'width="{width:.1f}" height="{height:.1f}" fill="{COLORS["primary"]}" '
+                 f'fill-opacity="{opacity:.2f}"><title>{_days_label(row["days_bin"])} in stage, '
+                 f'{_amount_label(low)}–{_amount_label(high)}: {_count_label(row["deals"], "deal")}, '
+                 f'${row["amount"]/1e6:.1f}M</title></rect>')
+    return _chart_svg(body + _chart_axes(_days_ticks(), _amount_ticks()))
+
+
+def render_score_histogram(bins):
+    """Deals per risk score bin, stacked by risk level"""
+    score_bin, score_max = CHART_GRID['score_bin'], CHART_GRID['score_max']
+    columns = int(score_max / score_bin) + 1
+    stacks = {}
+    for row in bins.to_pylist():
+        column = min(int(row['score_bin'] / score_bin), columns - 1)
+        stacks.setdefault(column, {})[row['risk_level']] = row['deals']
+    tallest = max((sum(levels.values()) for levels in stacks.values()), default=0)
+    width = (CHART_PLOT['right'] - CHART_PLOT['left']) / columns
+
+    body = ''
+    for column, levels in sorted(stacks.items()):
+        stacked = 0
+        for risk_level in ['healthy', 'at_risk', 'high_risk']:
+            deals = levels.get(risk_level, 0)
+            if not deals:
+                continue
+            top = _chart_y((stacked + deals) / tallest)
+            body += (f'<rect x="{_chart_x(column / columns) + 1:.1f}" y="{top:.1f}" width="{width - 2:.1f}" '
+                     f'height="{_chart_y(stacked / tallest) - top:.1f}" fill="{COLORS[risk_level]}">'
+                     f'<title>Score {column * score_bin:g}: '
+                     f'{_count_label(deals, risk_level.replace("_", " ") + " deal")}</title></rect>')
+            stacked += deals
+    x_ticks = [((s / score_bin + 0.5) / columns, f"{s:g}") for s in range(0, int(score_max) + 1, 2)]
+    y_ticks = [(0, '0'), (1, f"{tallest:,}")] if tallest else []
+    return _chart_svg(body + _chart_axes(x_ticks, y_ticks))
+
+
+def render_amount_bands(bands):
+    """Amount percentile bands by days in stage: P10-P90 and P25-P75 shaded, the median as a line"""
+    rows = bands.to_pylist()
+    points = {
+        column: [(_chart_x((row['days_bin'] + 0.5) / CHART_GRID['days_bins']), _chart_y(_log_amount_fraction(row[column])))
+                 for row in rows]
+        for column in ['p10', 'p25', 'p50', 'p75', 'p90']
+    }
+
+    def band(lower, upper, opacity):
+        outline = points[upper] + points[lower][::-1]
+        return (f'<polygon points="{" ".join(f"{x:.1f},{y:.1f}" for x, y in outline)}" '
+                f'fill="{COLORS["primary"]}" fill-opacity="{opacity}"/>')
+
+    body = ''
+    if rows:
+        body += band('p10', 'p90', 0.15) + band('p25', 'p75', 0.3)
+        body += (f'<polyline points="{" ".join(f"{x:.1f},{y:.1f}" for x, y in points["p50"])}" fill="none" '
+                 f'stroke="{COLORS["primary"]}" stroke-width="2"/>')
+    return _chart_svg(body + _chart_axes(_days_ticks(), _amount_ticks()))
+
+
+def render_charts(charts):
+    """Distribution charts over every scored deal, drawn from pre-binned chart data"""
+    return f"""
+        <!-- Distribution Charts -->
+        <div class="grid grid-3">
+            <div class="tile">
+                <div class="tile-title">Amount vs Days in Stage</div>
+                <div class="tile-subtitle">Deals per bin (darker = more deals)</div>
+                {render_amount_heatmap(charts['amount_by_days'])}
+            </div>
+            <div class="tile">
+                <div class="tile-title">Risk Score Distribution</div>
+                <div class="tile-subtitle">Deals per half point, by risk level</div>
+                {render_score_histogram(charts['risk_score_histogram'])}
+            </div>
+            <div class="tile">
+                <div class="tile-title">Amount Percentiles</div>
+                <div class="tile-subtitle">P10–P90, P25–P75 and median by days in stage</div>
+                {render_amount_bands(charts['amount_bands'])}
+            </div>
+        </div>
+"""
+
+
+def write_dashboard(html, output_file=DEFAULT_HTML):
+    """Save the dashboard HTML (project root by default)"""
+    with open(output_file, 'w') as f:
+        f.write(html)
+
+    print(f"\n✅ Interactive HTML dashboard saved to: {output_file}")
+    print(f"   Open in browser to view interactive dashboard")
+    print(f"   Looker-style design with responsive layout")
+    print(f"\n   Ready to share via email or presentation!")
+
+
+def main():
+    # Load data
+    alerts = load_alerts_json(PROJECT_ROOT / 'data' / 'dashboard_data.json')
+    alerts_by_id = alerts.select(['id', 'risk_level', 'risk_score']).to_pandas().set_index('id')
+    deal_aggregates = load_deal_aggregates(
+        PROJECT_ROOT / 'data' / 'salesforce_opportunities.csv', alerts_by_id
+    )
+
+    write_dashboard(render_dashboard(alerts, deal_aggregates))
+
 
-print(f"\n✅ Interactive HTML dashboard saved to: {output_file}")
-print(f"   Open in browser to view interactive dashboard")
-print(f"   Looker-style design with responsive layout")
-print(f"\n   Ready to share via email or presentation!")
+if __name__ == "__main__":
+    main()
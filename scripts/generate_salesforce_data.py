@@ -1,11 +1,21 @@
+import argparse
 import csv
 import random
 from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 
 # Set seed for reproducibility
 random.seed(42)
 
 # Configuration
+DEFAULT_OUTPUT = Path(__file__).parent.parent / "data" / "salesforce_opportunities.csv"
+
 STAGES = [
     ("Qualification", 10),
     ("Solution Mapping", 25),
@@ -66,6 +76,33 @@ LOSS_REASONS = [
     "Chose Competitor - Google"
 ]
 
+# Stage history simulation (indexes into STAGES)
+CLOSED_WON, CLOSED_LOST = 5, 6
+HISTORY_MEDIAN_DAYS = np.array([(low + high) / 2 for low, high in STAGE_BENCHMARKS.values()])
+HISTORY_DWELL_SIGMA = 0.6
+HISTORY_LOSS_RATE = np.array([0.20, 0.15, 0.12, 0.10, 0.08])   # per move, by stage left
+HISTORY_REGRESSION_RATE = 0.08                                   # per move, from Solution Mapping on
+MAX_TRANSITIONS = 24
+HISTORY_CHUNK_DEALS = 250_000
+DAY_SECONDS = 86_400
+
+# Daily change-data-capture simulation (see write_cdc_deltas). Rates are per
+# open deal per day, except CDC_PUSH_RATE, which applies to open deals closing
+# within CDC_PUSH_WINDOW_DAYS (or already past their close date).
+CDC_ACTIVITY_RATE = 0.25
+CDC_PUSH_RATE = 0.3
+CDC_PUSH_WINDOW_DAYS = 7
+CDC_PUSH_DAYS = (14, 45)
+CDC_NEW_DEAL_RATE = 0.004
+CDC_DELETE_RATE = 0.0005
+CDC_NEW_AMOUNT_RANGE = (50_000, 500_000)
+CDC_OPERATION = "_op"
+CDC_NAMING_COLUMNS = ("Name", "Account.Name", "Use_Case__c")
+
+ID_ALPHABET = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+ID_DIGITS = 10
+ID_MULTIPLIER = 2_654_435_761
+
 def generate_opportunity_id():
     """Generate a realistic Salesforce ID (18 characters)"""
     chars = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
@@ -382,7 +419,249 @@ def generate_closed_deal(idx, company_name, current_date, is_won):
         "Loss_Reason__c": loss_reason
     }
 
-def main():
+def opportunity_ids(start, count):
+    """Unique 18-character Opportunity IDs for deal numbers start..start+count, as an Arrow array
+
+    Deal numbers are scrambled by an odd multiplier coprime with 62**10, which
+    is a bijection, so IDs never collide and don't sort in creation order.
+    """
+    numbers = np.arange(start + 1, start + count + 1, dtype=np.uint64)
+    scrambled = numbers * np.uint64(ID_MULTIPLIER) % np.uint64(62 ** ID_DIGITS)
+    places = np.uint64(62) ** np.arange(ID_DIGITS - 1, -1, -1, dtype=np.uint64)
+    chars = np.full((count, 18), ord("0"), dtype=np.uint8)
+    chars[:, :3] = np.frombuffer(b"006", dtype=np.uint8)
+    chars[:, 18 - ID_DIGITS:] = ID_ALPHABET[(scrambled[:, None] // places % np.uint64(62)).astype(np.intp)]
+    return pa.array(chars.view("S18").ravel(), type=pa.binary(18)).cast(pa.string())
+
+def simulate_stage_history(rng, n_deals, as_of, window_days):
+    """Stage transitions for n_deals synthetic deals: (deal, old stage, new stage, timestamp) arrays
+
+    Every deal enters Qualification when created, then keeps moving until it
+    closes or its next move would land after as_of. Each move advances a
+    stage, slips back one (a regression) or drops to Closed Lost; leaving
+    Contract Negotiation forward is Closed Won. Time in stage is lognormal
+    around the midpoint of the stage benchmark. All deals step together, one
+    transition per iteration.
+    """
+    created = as_of - rng.uniform(0, window_days * DAY_SECONDS, n_deals).astype("timedelta64[s]")
+    stage = np.zeros(n_deals, dtype=np.int8)
+    now = created.copy()
+    deal = np.arange(n_deals)
+
+    events = [(deal, np.full(n_deals, -1, dtype=np.int8), stage.copy(), created)]
+    for _ in range(MAX_TRANSITIONS):
+        dwell = rng.lognormal(np.log(HISTORY_MEDIAN_DAYS[stage]), HISTORY_DWELL_SIGMA)
+        moved_at = now + (np.maximum(dwell, 1) * DAY_SECONDS).astype("timedelta64[s]")
+        moving = moved_at <= as_of
+        deal, stage, moved_at = deal[moving], stage[moving], moved_at[moving]
+        if not len(deal):
+            break
+
+        draw = rng.random(len(deal))
+        lost = draw < HISTORY_LOSS_RATE[stage]
+        regress = ~lost & (stage > 0) & (draw < HISTORY_LOSS_RATE[stage] + HISTORY_REGRESSION_RATE)
+        new_stage = np.where(lost, CLOSED_LOST, np.where(regress, stage - 1, stage + 1)).astype(np.int8)
+        events.append((deal, stage, new_stage, moved_at))
+
+        still_open = new_stage < CLOSED_WON
+        deal, stage, now = deal[still_open], new_stage[still_open], moved_at[still_open]
+
+    deal, old, new, at = (np.concatenate(column) for column in zip(*events))
+    order = np.argsort(deal, kind="stable")
+    return deal[order], old[order], new[order], at[order]
+
+def write_stage_history(output_file, n_deals, as_of=datetime(2025, 10, 30), window_days=730,
+                        chunk_deals=HISTORY_CHUNK_DEALS, seed=42):
+    """Stream an OpportunityFieldHistory-style StageName log for n_deals synthetic deals
+
+    Deals are simulated a chunk at a time and each chunk is appended to the
+    file (a Parquet row group, or CSV rows) before the next is generated, so
+    memory stays flat however many events are written. Returns the event count.
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    stage_names = pa.array([name for name, _ in STAGES])
+    as_of = np.datetime64(as_of, "s")
+    seeds = np.random.SeedSequence(seed).spawn((n_deals + chunk_deals - 1) // chunk_deals)
+
+    writer = None
+    events = 0
+    try:
+        for start, chunk_seed in zip(range(0, n_deals, chunk_deals), seeds):
+            count = min(chunk_deals, n_deals - start)
+            deal, old, new, at = simulate_stage_history(np.random.default_rng(chunk_seed), count, as_of, window_days)
+            table = pa.table({
+                "OpportunityId": opportunity_ids(start, count).take(pa.array(deal)),
+                "Field": pa.array(["StageName"]).take(pa.array(np.zeros(len(deal), dtype=np.int32))),
+                "OldValue": stage_names.take(pa.array(old, mask=old < 0)),
+                "NewValue": stage_names.take(pa.array(new)),
+                "CreatedDate": pa.array(at),
+            })
+            if writer is None:
+                writer = (pq.ParquetWriter(output_file, table.schema) if output_file.suffix == ".parquet"
+                          else pa_csv.CSVWriter(output_file, table.schema))
+            writer.write_table(table)
+            events += len(deal)
+    finally:
+        if writer is not None:
+            writer.close()
+    return events
+
+def read_snapshot(path):
+    """An opportunity snapshot (CSV or Parquet) as an Arrow table with typed amounts and dates"""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        table = pq.read_table(path)
+    else:
+        date_columns = ["CloseDate", "CreatedDate", "LastActivityDate", "LastStageChangeDate"]
+        table = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+            column_types={**{name: pa.date32() for name in date_columns},
+                          "Amount": pa.float64(), "Probability": pa.int32()},
+            strings_can_be_null=False,
+        ))
+    return table.cast(table.schema.set(table.schema.get_field_index("Amount"), pa.field("Amount", pa.float64())))
+
+def write_cdc_deltas(base_file, output_dir, days, start_date=datetime(2025, 10, 31), seed=42,
+                     activity_rate=CDC_ACTIVITY_RATE, push_rate=CDC_PUSH_RATE, new_deal_rate=CDC_NEW_DEAL_RATE,
+                     delete_rate=CDC_DELETE_RATE, final_snapshot=None):
+    """Evolve a snapshot day by day, writing each day's changes as a delta file; returns (upserts, deletes)
+
+    Each day open deals log activity, move stage (advance, slip back or be
+    lost, leaving Contract Negotiation forward is Closed Won; the daily
+    chance of a move is 1 / the stage's median dwell, as in the stage history
+    simulation), and push close dates that are near or past. New deals
+    arrive in Qualification, cloned from random existing ones (owner,
+    region and the like) but named for an account and use case no other new
+    deal has, so they aren't taken for duplicates; a few deals are deleted. output_dir/<YYYY-MM-DD>.parquet holds that day's
+    changed deals as full rows with _op = 'upsert', plus an Id-only row with
+    _op = 'delete' per deleted deal; applying the days in order to the base
+    reproduces the final state, which final_snapshot (Parquet) also receives.
+
+    The state is a set of NumPy columns plus, for the columns that never
+    change, the base row each deal was cloned from, so a day costs a few
+    vector operations over the deals and only changed rows are built.
+    """
+    rng = np.random.default_rng(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    base = read_snapshot(base_file)
+    stage_names = pa.array([name for name, _ in STAGES])
+    stage_probability = np.array([probability for _, probability in STAGES], dtype=np.int32)
+
+    # Mutable columns, one entry per deal ever seen; source is the base row the
+    # rest of a deal's columns come from
+    source = np.arange(base.num_rows)
+    ids = base.column("Id").combine_chunks()
+    stage = pc.index_in(base.column("StageName"), value_set=stage_names).to_numpy().astype(np.int8)
+    amount = base.column("Amount").to_numpy(zero_copy_only=False).astype("float64")
+    dates = {name: base.column(name).to_numpy(zero_copy_only=False).astype("datetime64[D]")
+             for name in ("CloseDate", "CreatedDate", "LastActivityDate", "LastStageChangeDate")}
+    loss_reason = base.column("Loss_Reason__c").to_numpy(zero_copy_only=False).astype(object)
+    naming = {name: base.column(name).to_numpy(zero_copy_only=False).astype(object) for name in CDC_NAMING_COLUMNS}
+    alive = np.ones(base.num_rows, dtype=bool)
+
+    # (account, use case) pairs for new deals, in a seeded order; once every
+    # pair is taken they come round again with a number, e.g. "... 2"
+    pairs = [(company, use_case) for company in COMPANY_NAMES for use_case in USE_CASES]
+    pair_order = rng.permutation(len(pairs))
+    named = 0
+
+    def rows(selected):
+        """Full snapshot rows for the deals at the selected positions"""
+        table = base.take(pa.array(source[selected]))
+        columns = {
+            "Id": ids.take(pa.array(selected)),
+            "StageName": stage_names.take(pa.array(stage[selected])),
+            "Probability": pa.array(stage_probability[stage[selected]]),
+            "Amount": pa.array(amount[selected]),
+            "Loss_Reason__c": pa.array(loss_reason[selected].tolist(), type=pa.string()),
+            **{name: pa.array(values[selected].tolist(), type=pa.string()) for name, values in naming.items()},
+            **{name: pa.array(values[selected], mask=np.isnat(values[selected])) for name, values in dates.items()},
+        }
+        for name, column in columns.items():
+            table = table.set_column(table.schema.get_field_index(name), name, column.cast(table.schema.field(name).type))
+        return table
+
+    upserts = deletes = 0
+    for offset in range(days):
+        day = np.datetime64(start_date.date() + timedelta(days=offset), "D")
+        is_open = alive & (stage < CLOSED_WON)
+        changed = np.zeros(len(stage), dtype=bool)
+
+        # Activity on a share of open deals
+        active = is_open & (rng.random(len(stage)) < activity_rate)
+        dates["LastActivityDate"][active] = day
+        changed |= active
+
+        # Stage moves, with the stage history simulation's loss and regression odds
+        open_stage = np.minimum(stage, CLOSED_WON - 1)
+        moving = is_open & (rng.random(len(stage)) < 1 / HISTORY_MEDIAN_DAYS[open_stage])
+        draw = rng.random(len(stage))
+        lost = moving & (draw < HISTORY_LOSS_RATE[open_stage])
+        regress = moving & ~lost & (stage > 0) & (draw < HISTORY_LOSS_RATE[open_stage] + HISTORY_REGRESSION_RATE)
+        advance = moving & ~lost & ~regress
+        stage[lost] = CLOSED_LOST
+        stage[regress] -= 1
+        stage[advance] += 1
+        closed = moving & (stage >= CLOSED_WON)
+        dates["LastStageChangeDate"][moving] = day
+        dates["LastActivityDate"][moving] = day
+        dates["CloseDate"][closed] = day
+        if lost.any():
+            loss_reason[lost] = rng.choice(LOSS_REASONS, lost.sum())
+        changed |= moving
+
+        # Close dates that are near or past slip
+        due = is_open & ~closed & (dates["CloseDate"] <= day + CDC_PUSH_WINDOW_DAYS)
+        pushed = due & (rng.random(len(stage)) < push_rate)
+        dates["CloseDate"][pushed] = day + rng.integers(*CDC_PUSH_DAYS, pushed.sum(), endpoint=True)
+        changed |= pushed
+
+        # Deletes, then new deals cloned from random live ones
+        deleted = alive & (rng.random(len(stage)) < delete_rate)
+        alive &= ~deleted
+        changed &= alive
+        deleted_ids = ids.filter(pa.array(deleted))
+
+        created = rng.binomial(int(is_open.sum()), new_deal_rate)
+        if created:
+            first = len(stage)
+            templates = rng.choice(np.flatnonzero(alive), created)
+            source = np.concatenate([source, source[templates]])
+            ids = pa.concat_arrays([ids, opportunity_ids(first, created)])
+            stage = np.concatenate([stage, np.zeros(created, dtype=np.int8)])
+            amount = np.concatenate([amount, rng.integers(*CDC_NEW_AMOUNT_RANGE, created, endpoint=True)
+                                     // 1000 * 1000.0])
+            for name, values in dates.items():
+                dates[name] = np.concatenate([values, np.full(created, day)])
+            dates["CloseDate"][first:] = day + rng.integers(60, 150, created, endpoint=True)
+            loss_reason = np.concatenate([loss_reason, np.full(created, "", dtype=object)])
+            new_names = {name: np.empty(created, dtype=object) for name in CDC_NAMING_COLUMNS}
+            for i in range(created):
+                company, use_case = pairs[pair_order[(named + i) % len(pairs)]]
+                round_ = (named + i) // len(pairs)
+                new_names["Name"][i] = f"{company} - {use_case}" + (f" {round_ + 1}" if round_ else "")
+                new_names["Account.Name"][i] = company
+                new_names["Use_Case__c"][i] = use_case
+            named += created
+            naming = {name: np.concatenate([values, new_names[name]]) for name, values in naming.items()}
+            alive = np.concatenate([alive, np.ones(created, dtype=bool)])
+            changed = np.concatenate([changed, np.ones(created, dtype=bool)])
+
+        delta = rows(np.flatnonzero(changed))
+        delta = delta.append_column(CDC_OPERATION, pa.array(["upsert"] * delta.num_rows, type=pa.string()))
+        if len(deleted_ids):
+            removed = pa.table({"Id": deleted_ids, CDC_OPERATION: pa.array(["delete"] * len(deleted_ids))})
+            delta = pa.concat_tables([delta, removed], promote_options="default")
+        pq.write_table(delta, output_dir / f"{day}.parquet")
+        upserts += int(changed.sum())
+        deletes += len(deleted_ids)
+
+    if final_snapshot:
+        pq.write_table(rows(np.flatnonzero(alive)), final_snapshot)
+    return upserts, deletes
+
+def main(output_file=DEFAULT_OUTPUT):
     current_date = datetime(2025, 10, 30)
     opportunities = []
     
@@ -433,8 +712,6 @@ def main():
         "Competitor__c", "Use_Case__c", "Description", "Loss_Reason__c"
     ]
     
-    output_file = "/home/claude/salesforce_opportunities.csv"
-    
     with open(output_file, 'w', newline='') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
@@ -450,4 +727,37 @@ def main():
     print(f"\n💾 Saved to: {output_file}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate synthetic Salesforce opportunities")
+    parser.add_argument("--output", type=Path,
+                        help=f"CSV file to write (default: {DEFAULT_OUTPUT.name}, unless only --history is given)")
+    parser.add_argument("--history", type=Path,
+                        help="Write a StageName history log for synthetic deals (CSV or Parquet)")
+    parser.add_argument("--history-deals", type=int, default=10_000, help="Deals in the history log")
+    parser.add_argument("--cdc", type=Path,
+                        help="Directory for daily change-data-capture deltas (one Parquet file per day)")
+    parser.add_argument("--cdc-base", type=Path, default=DEFAULT_OUTPUT, help="Snapshot the deltas evolve (CSV or Parquet)")
+    parser.add_argument("--cdc-days", type=int, default=30, help="Days to simulate")
+    parser.add_argument("--cdc-final", type=Path, help="Also write the state after the last day (Parquet)")
+    parser.add_argument("--activity-rate", type=float, default=CDC_ACTIVITY_RATE,
+                        help="Daily chance an open deal logs activity")
+    parser.add_argument("--push-rate", type=float, default=CDC_PUSH_RATE,
+                        help=f"Daily chance a deal closing within {CDC_PUSH_WINDOW_DAYS} days pushes its close date")
+    parser.add_argument("--new-deal-rate", type=float, default=CDC_NEW_DEAL_RATE,
+                        help="New deals per open deal per day")
+    parser.add_argument("--delete-rate", type=float, default=CDC_DELETE_RATE,
+                        help="Daily chance a deal is deleted")
+    args = parser.parse_args()
+    # --history or --cdc on their own must not overwrite the snapshot the other scripts read
+    if args.output or not (args.history or args.cdc):
+        main(args.output or DEFAULT_OUTPUT)
+    if args.history:
+        events = write_stage_history(args.history, args.history_deals)
+        print(f"\n✅ Generated {events:,} stage transitions for {args.history_deals:,} deals")
+        print(f"💾 Saved to: {args.history}")
+    if args.cdc:
+        upserts, deletes = write_cdc_deltas(args.cdc_base, args.cdc, args.cdc_days,
+                                            activity_rate=args.activity_rate, push_rate=args.push_rate,
+                                            new_deal_rate=args.new_deal_rate, delete_rate=args.delete_rate,
+                                            final_snapshot=args.cdc_final)
+        print(f"\n✅ Generated {args.cdc_days} daily deltas: {upserts:,} upserts, {deletes:,} deletes")
+        print(f"💾 Saved to: {args.cdc}")
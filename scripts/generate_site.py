@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Static site of filtered dashboards: one page per owner and per team (manager),
+rendered in parallel from a single scoring pass
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pipeline_runner as runner
+import validate_ingest
+from generate_html_dashboard import dashboard_css, dashboard_js, render_dashboard
+
+try:
+    import brotli
+except ImportError:  # optional: gzip assets are always written
+    brotli = None
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_SITE_DIR = PROJECT_ROOT / 'site'
+RENDERER_SOURCE = Path(__file__).parent / 'generate_html_dashboard.py'
+
+MANIFEST_FILE = 'manifest.json'
+SHARED_DIR = '_data'
+ALERTS_FILE = 'alerts.arrow'
+AGGREGATES_FILE = 'aggregates.arrow'
+ROLLUPS_FILE = 'rollups.arrow'
+
+# Page for deals with no owner, as team_rollups files reps with no manager
+UNASSIGNED = 'Unassigned'
+
+# Filled in each worker by _load_shared(); the Arrow files are memory-mapped,
+# so every process reads the same pages of the OS cache
+_shared = {}
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def page_paths(folder, names):
+    """Map each name to its page under folder
+
+    Names that slugify alike ('Ana Lee' and 'Ana-Lee'), or to nothing, get a
+    suffix from a hash of the name instead of overwriting each other's page.
+    """
+    by_slug = {}
+    for name in names:
+        by_slug.setdefault(slugify(name), []).append(name)
+    paths = {}
+    for slug, same in by_slug.items():
+        for name in same:
+            if len(same) > 1 or not slug:
+                slug_name = f"{slug}-{hashlib.sha256(name.encode()).hexdigest()[:8]}".lstrip('-')
+            else:
+                slug_name = slug
+            paths[name] = f'{folder}/{slug_name}.html'
+    return paths
+
+
+def assign_owners(alerts, deal_aggregates):
+    """alerts and deal aggregates with a missing owner filed under UNASSIGNED, as plan_pages lists it"""
+    alerts = alerts.set_column(
+        alerts.schema.get_field_index('owner_name'), 'owner_name', pc.fill_null(alerts['owner_name'], UNASSIGNED)
+    )
+    deal_aggregates = deal_aggregates.reset_index().fillna({'owner': UNASSIGNED}).set_index(['owner', 'risk_level'])
+    return alerts, deal_aggregates
+
+
+def write_arrow(table, path):
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_arrow(path):
+    return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+
+
+def write_assets(site_dir):
+    """Write the shared stylesheet and script with .gz (and .br when brotli is installed) siblings"""
+    assets = site_dir / 'assets'
+    assets.mkdir(parents=True, exist_ok=True)
+    for name, content in (('dashboard.css', dashboard_css()), ('dashboard.js', dashboard_js())):
+        data = content.encode()
+        (assets / name).write_bytes(data)
+        (assets / f'{name}.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli:
+            (assets / f'{name}.br').write_bytes(brotli.compress(data))
+
+
+def plan_pages(con):
+    """Map each page path to (scope label, owners on the page, manager): the org view, every owner and every team
+
+    Deals with no owner get an UNASSIGNED owner page, and reps missing from
+    sales_hierarchy an UNASSIGNED team page, matching team_rollups.
+    """
+    owners = [row[0] for row in con.execute(
+        f"SELECT DISTINCT COALESCE(owner_name, {runner.sql_literal(UNASSIGNED)}) AS owner FROM risk_analysis "
+        f"ORDER BY owner"
+    ).fetchall()]
+    teams = con.execute(f"""
+        SELECT
+            COALESCE(h.manager_name, {runner.sql_literal(UNASSIGNED)}) AS manager,
+            LIST(DISTINCT COALESCE(r.owner_name, {runner.sql_literal(UNASSIGNED)})
+                 ORDER BY COALESCE(r.owner_name, {runner.sql_literal(UNASSIGNED)}))
+        FROM risk_analysis r
+        LEFT JOIN sales_hierarchy h ON r.owner_name = h.owner_name
+        GROUP BY manager
+        ORDER BY manager
+    """).fetchall()
+
+    pages = {'index.html': (None, owners, None)}
+    for owner, page in page_paths('owners', owners).items():
+        pages[page] = (owner, [owner], None)
+    team_pages = page_paths('teams', [manager for manager, _ in teams])
+    for manager, members in teams:
+        pages[team_pages[manager]] = (f"Team {manager}", members, manager)
+    return pages
+
+
+def page_slice(alerts, deal_aggregates, rollups, owners, manager):
+    """The alerts, aggregate rows and rollup rows behind one page
+
+    The org page shows the segment/region/manager rollup, a team page its
+    manager row and reps, and a rep page none.
+    """
+    page_alerts = alerts.filter(pc.is_in(alerts['owner_name'], value_set=pa.array(owners)))
+    page_aggregates = deal_aggregates[deal_aggregates.index.get_level_values('owner').isin(owners)]
+    if manager:
+        page_rollups = rollups.filter(pc.and_(
+            pc.equal(rollups['manager_name'], manager),
+            pc.is_in(rollups['rollup_level'], value_set=pa.array(['manager', 'owner'])),
+        ))
+    elif len(owners) > 1:
+        page_rollups = rollups.filter(
+            pc.is_in(rollups['rollup_level'], value_set=pa.array(list(runner.DASHBOARD_ROLLUP_LEVELS)))
+        )
+    else:
+        page_rollups = None
+    return page_alerts, page_aggregates, page_rollups
+
+
+def _update_table(digest, table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    digest.update(sink.getvalue())
+
+
+def page_fingerprint(page_alerts, page_aggregates, page_rollups, scope, renderer_digest):
+    """Hash of everything a page renders from, so unchanged pages can be skipped"""
+    digest = hashlib.sha256(renderer_digest.encode())
+    digest.update(str(scope).encode())
+    _update_table(digest, page_alerts)
+    digest.update(page_aggregates.sort_index().to_csv().encode())
+    if page_rollups is not None:
+        _update_table(digest, page_rollups)
+    return digest.hexdigest()
+
+
+def _load_shared(shared_dir):
+    _shared['alerts'] = read_arrow(Path(shared_dir) / ALERTS_FILE)
+    _shared['deal_aggregates'] = read_arrow(
+        Path(shared_dir) / AGGREGATES_FILE
+    ).to_pandas().set_index(['owner', 'risk_level'])
+    _shared['rollups'] = read_arrow(Path(shared_dir) / ROLLUPS_FILE)
+
+
+def _render_page(site_dir, page, scope, owners, manager):
+    page_alerts, page_aggregates, page_rollups = page_slice(
+        _shared['alerts'], _shared['deal_aggregates'], _shared['rollups'], owners, manager
+    )
+    depth = page.count('/')
+    prefix = '../' * depth
+    html = render_dashboard(
+        page_alerts, page_aggregates, scope=scope,
+        stylesheet_href=f'{prefix}assets/dashboard.css', script_src=f'{prefix}assets/dashboard.js',
+        rollups=page_rollups,
+    )
+    output_file = Path(site_dir) / page
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_text(html)
+    return page
+
+
+def prune_pages(site_dir, pages):
+    """Delete owner and team pages that are no longer planned (a rep left, a team was merged); returns their paths"""
+    site_dir = Path(site_dir)
+    stale = sorted(
+        path.relative_to(site_dir).as_posix()
+        for folder in ('owners', 'teams')
+        for path in (site_dir / folder).glob('*.html')
+        if path.relative_to(site_dir).as_posix() not in pages
+    )
+    for page in stale:
+        (site_dir / page).unlink()
+    return stale
+
+
+def build_site(input_path=runner.DEFAULT_INPUT, site_dir=DEFAULT_SITE_DIR, workers=None, force=False):
+    """Score once, then render every changed page in a process pool and prune stale ones; returns (rendered, skipped)"""
+    site_dir = Path(site_dir)
+    shared_dir = site_dir / SHARED_DIR
+    shared_dir.mkdir(parents=True, exist_ok=True)
+
+    con = runner.connect()
+    runner.score(con, validate_ingest.validated(input_path))
+    alerts, deal_aggregates = assign_owners(runner.fetch_alerts(con), runner.fetch_deal_aggregates(con))
+    rollups = runner.fetch_rollups(con, levels=runner.DASHBOARD_ROLLUP_LEVELS + ('owner',))
+    pages = plan_pages(con)
+
+    write_arrow(alerts, shared_dir / ALERTS_FILE)
+    write_arrow(pa.Table.from_pandas(deal_aggregates.reset_index(), preserve_index=False),
+                shared_dir / AGGREGATES_FILE)
+    write_arrow(rollups, shared_dir / ROLLUPS_FILE)
+    write_assets(site_dir)
+
+    manifest_path = site_dir / MANIFEST_FILE
+    manifest = {} if force or not manifest_path.exists() else json.loads(manifest_path.read_text())
+    renderer_digest = hashlib.sha256(RENDERER_SOURCE.read_bytes()).hexdigest()
+
+    fingerprints = {}
+    changed = []
+    for page, (scope, owners, manager) in pages.items():
+        fingerprints[page] = page_fingerprint(
+            *page_slice(alerts, deal_aggregates, rollups, owners, manager), scope, renderer_digest
+        )
+        if manifest.get(page) != fingerprints[page] or not (site_dir / page).exists():
+            changed.append(page)
+
+    if changed:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_load_shared,
+                                 initargs=(str(shared_dir),)) as pool:
+            futures = [pool.submit(_render_page, str(site_dir), page, *pages[page]) for page in changed]
+            for future in futures:
+                future.result()
+
+    prune_pages(site_dir, pages)
+    manifest_path.write_text(json.dumps(fingerprints, indent=2, sort_keys=True))
+    return len(changed), len(pages) - len(changed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_SITE_DIR, help='Site directory')
+    parser.add_argument('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Re-render every page')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rendered, skipped = build_site(args.input, args.output, args.workers, args.force)
+    print(f"\n✅ Site built in {time.perf_counter() - started:.2f}s: "
+          f"{rendered} pages rendered, {skipped} unchanged")
+    print(f"   Open {args.output / 'index.html'} for the org view")
+
+
+if __name__ == "__main__":
+    main()
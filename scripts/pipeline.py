@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Pipeline orchestrator: runs generate → ingest → dedup → score → export/aggregate/charts/leaderboard → render
+as a dependency graph, skipping stages whose inputs haven't changed; --watch
+re-runs it whenever an input file changes
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import export_partitions
+import pipeline_runner as runner
+import validate_ingest
+from generate_html_dashboard import render_dashboard, write_dashboard
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+SCRIPTS_DIR = Path(__file__).parent
+
+WORK_DIR = PROJECT_ROOT / '.cache' / 'pipeline'
+STATE_FILE = WORK_DIR / 'state.json'
+
+DEFAULT_HTML = PROJECT_ROOT / 'pipeline_dashboard.html'
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+# Watch mode polls input files this often, and runs once they have been quiet
+# for the debounce interval, so a burst of writes triggers one run
+WATCH_POLL_SECONDS = 0.05
+WATCH_DEBOUNCE_SECONDS = 0.2
+
+
+@dataclass
+class Stage:
+    """One node of the pipeline graph; its fingerprint is the hash of its input files"""
+    name: str
+    run: object
+    inputs: list
+    outputs: list
+    deps: list = field(default_factory=list)
+
+
+class StageError(RuntimeError):
+    """A stage raised; the stages that completed before it keep their recorded fingerprints"""
+
+    def __init__(self, stage, error):
+        super().__init__(f"stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Fingerprints:
+    """Content hashes of files, reused while a file's size and mtime are unchanged
+
+    pinned maps resolved paths to the hash to report whatever is on disk now;
+    the scripts are pinned to the code this process loaded.
+    """
+
+    def __init__(self, known=None, pinned=None):
+        self.known = dict(known or {})
+        self.pinned = pinned or {}
+        self.lock = threading.Lock()
+
+    def file(self, path):
+        path = Path(path)
+        key = str(path.resolve())
+        if key in self.pinned:
+            return self.pinned[key]
+        if not path.exists():
+            return None
+        stat = path.stat()
+        with self.lock:
+            entry = self.known.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while block := f.read(HASH_BLOCK_BYTES):
+                digest.update(block)
+        with self.lock:
+            self.known[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        return digest.hexdigest()
+
+    def stage(self, stage):
+        digest = hashlib.sha256(stage.name.encode())
+        for path in stage.inputs:
+            digest.update(str(self.file(path)).encode())
+        return digest.hexdigest()
+
+
+def load_state(state_file=STATE_FILE):
+    if Path(state_file).exists():
+        return json.loads(Path(state_file).read_text())
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(state, state_file=STATE_FILE):
+    Path(state_file).parent.mkdir(parents=True, exist_ok=True)
+    Path(state_file).write_text(json.dumps(state, indent=2))
+
+
+def scored_view(con, scored_path, alerts_path):
+    con.execute(f"CREATE OR REPLACE VIEW risk_analysis AS SELECT * FROM {runner.source_scan(scored_path)}")
+    con.execute(f"CREATE OR REPLACE VIEW risk_alerts AS SELECT * FROM {runner.source_scan(alerts_path)}")
+
+
+def build_stages(input_csv, json_output, html_output, generate=False, partitions_dir=None,
+                 quarantine=validate_ingest.DEFAULT_QUARANTINE, work_dir=WORK_DIR, limits=None):
+    """Wire up the stage graph for one input export
+
+    limits are the DuckDB resource settings every stage connects with (see
+    runner.RESOURCE_LIMITS).
+    """
+    opportunities = work_dir / 'opportunities.parquet'
+    duplicates = work_dir / 'duplicates.parquet'
+    scored = work_dir / 'risk_analysis.parquet'
+    flagged = work_dir / 'risk_alerts.parquet'
+    aggregates = work_dir / 'deal_aggregates.parquet'
+    rollups = work_dir / 'team_rollups.parquet'
+    charts = {name: work_dir / f'chart_{name}.parquet' for name in runner.CHART_QUERIES}
+    leaderboards = work_dir / 'leaderboards.parquet'
+
+    def run_generate():
+        import generate_salesforce_data
+        generate_salesforce_data.main(input_csv)
+
+    def run_ingest():
+        with runner.connect(limits=limits) as con:
+            valid, rejected = validate_ingest.validate(con, input_csv, opportunities, quarantine)
+        if rejected:
+            print(f"⚠️  Quarantined {rejected} of {valid + rejected} rows: {quarantine}")
+
+    def run_dedup():
+        with runner.connect(limits=limits) as con:
+            runner.score(con, opportunities, model=None)
+            con.execute(
+                f"COPY (SELECT * FROM opportunity_duplicates) TO {runner.sql_literal(duplicates.as_posix())} "
+                f"(FORMAT PARQUET)"
+            )
+            found = runner.source_rows(con, duplicates)
+        if found:
+            print(f"🔁 Collapsed {found} duplicate opportunities: {duplicates}")
+
+    def run_score():
+        with runner.connect(limits=limits) as con:
+            runner.score(con, opportunities, duplicates=duplicates)
+            con.execute(f"COPY (SELECT * FROM risk_analysis) TO {runner.sql_literal(scored.as_posix())} (FORMAT PARQUET)")
+            con.execute(f"COPY (SELECT * FROM risk_alerts) TO {runner.sql_literal(flagged.as_posix())} (FORMAT PARQUET)")
+            # Every hierarchy level, materialized for drill-down
+            con.execute(
+                f"COPY (SELECT * FROM team_rollups ORDER BY {runner.ROLLUP_ORDER}) "
+                f"TO {runner.sql_literal(rollups.as_posix())} (FORMAT PARQUET)"
+            )
+
+    def run_export():
+        with runner.connect(limits=limits) as con:
+            scored_view(con, scored, flagged)
+            runner.export_json(con, json_output)
+
+    def run_partition():
+        with runner.connect(limits=limits) as con:
+            scored_view(con, scored, flagged)
+            export_partitions.export_partitions(con, partitions_dir)
+
+    def run_aggregate():
+        with runner.connect(limits=limits) as con:
+            scored_view(con, scored, flagged)
+            con.execute(
+                f"COPY ({runner.DEAL_AGGREGATES_QUERY}) TO {runner.sql_literal(aggregates.as_posix())} (FORMAT PARQUET)"
+            )
+
+    def run_charts():
+        with runner.connect(limits=limits) as con:
+            scored_view(con, scored, flagged)
+            for name, query in runner.CHART_QUERIES.items():
+                con.execute(f"COPY ({query}) TO {runner.sql_literal(charts[name].as_posix())} (FORMAT PARQUET)")
+
+    def run_leaderboard():
+        with runner.connect(limits=limits) as con:
+            scored_view(con, scored, flagged)
+            runner.create_reference_tables(con)  # sales_hierarchy, for regions
+            con.execute(
+                f"COPY ({runner.LEADERBOARD_QUERY}) TO {runner.sql_literal(leaderboards.as_posix())} (FORMAT PARQUET)"
+            )
+
+    def run_render():
+        with runner.connect(limits=limits) as con:
+            scored_view(con, scored, flagged)
+            alerts, flagged_count = runner.fetch_dashboard_alerts(con, runner.source_rows(con, flagged))
+            deal_aggregates = runner.fetch_arrow(
+                con.execute(f"SELECT * FROM {runner.source_scan(aggregates)}")
+            ).to_pandas().set_index(['owner', 'risk_level'])
+            team_rollups = runner.fetch_rollups(con, source=runner.source_scan(rollups))
+            chart_data = runner.fetch_chart_data(con, sources=charts)
+            html = render_dashboard(alerts, deal_aggregates, rollups=team_rollups, charts=chart_data,
+                                    flagged=flagged_count, leaderboards=runner.fetch_leaderboards(con, leaderboards))
+            write_dashboard(html, html_output)
+
+    stages = [
+        Stage('ingest', run_ingest, [input_csv, SCRIPTS_DIR / 'validate_ingest.py'], [opportunities, quarantine]),
+        Stage('dedup', run_dedup,
+              [opportunities, runner.SCORING_SQL, SCRIPTS_DIR / 'pipeline_runner.py', SCRIPTS_DIR / 'risk_model.py'],
+              [duplicates], ['ingest']),
+        Stage('score', run_score,
+              [opportunities, duplicates, runner.SCORING_SQL, runner.SALES_HIERARCHY,
+               *runner.REFERENCE_OVERRIDES.values(), runner.RISK_MODEL,
+               SCRIPTS_DIR / 'pipeline_runner.py', SCRIPTS_DIR / 'risk_model.py'],
+              [scored, flagged, rollups], ['dedup']),
+        Stage('export', run_export, [flagged, SCRIPTS_DIR / 'pipeline_runner.py'], [json_output], ['score']),
+        Stage('aggregate', run_aggregate, [scored, SCRIPTS_DIR / 'pipeline_runner.py'], [aggregates], ['score']),
+        Stage('charts', run_charts,
+              [scored, SCRIPTS_DIR / 'pipeline_runner.py', SCRIPTS_DIR / 'generate_html_dashboard.py'],
+              list(charts.values()), ['score']),
+        Stage('leaderboard', run_leaderboard, [scored, runner.SALES_HIERARCHY, SCRIPTS_DIR / 'pipeline_runner.py'],
+              [leaderboards], ['score']),
+        Stage('render', run_render,
+              [flagged, aggregates, rollups, *charts.values(), leaderboards,
+               SCRIPTS_DIR / 'generate_html_dashboard.py'],
+              [html_output], ['score', 'aggregate', 'charts', 'leaderboard']),
+    ]
+    if partitions_dir:
+        stages.insert(4, Stage('partition', run_partition, [flagged, SCRIPTS_DIR / 'export_partitions.py'],
+                               [partitions_dir / export_partitions.MANIFEST_FILE], ['score']))
+    if generate:
+        stages.insert(0, Stage('generate', run_generate, [SCRIPTS_DIR / 'generate_salesforce_data.py'], [input_csv]))
+        stages[1].deps.append('generate')
+    return {stage.name: stage for stage in stages}
+
+
+def check_graph(stages):
+    """Raise ValueError if a stage depends on a stage that does not exist, or the dependencies form a cycle"""
+    for stage in stages.values():
+        unknown = [dep for dep in stage.deps if dep not in stages]
+        if unknown:
+            raise ValueError(f"stage '{stage.name}' depends on unknown stage(s): {', '.join(unknown)}")
+
+    ordered = set()
+    remaining = dict(stages)
+    while remaining:
+        ready = [name for name, stage in remaining.items() if all(dep in ordered for dep in stage.deps)]
+        if not ready:
+            raise ValueError(f"dependency cycle between stages: {', '.join(sorted(remaining))}")
+        for name in ready:
+            ordered.add(name)
+            del remaining[name]
+
+
+def run_pipeline(stages, force=False, max_workers=4, state_file=STATE_FILE):
+    """Run stages in dependency order, concurrently where possible; return per-stage (status, seconds)
+
+    If a stage raises, no further stages start; those already running finish,
+    the fingerprints of every completed stage are saved, and StageError is
+    raised naming the stage that failed.
+    """
+    check_graph(stages)
+    state = load_state(state_file)
+    fingerprints = Fingerprints(state['files'], pinned=LOADED_SCRIPTS)
+    report = {}
+
+    def execute(stage):
+        started = time.perf_counter()
+        fingerprint = fingerprints.stage(stage)
+        previous = state['stages'].get(stage.name, {})
+        outputs_intact = all(
+            fingerprints.file(path) == previous.get('outputs', {}).get(str(path))
+            for path in stage.outputs
+        )
+        if not force and previous.get('fingerprint') == fingerprint and outputs_intact:
+            return 'skipped', time.perf_counter() - started, previous
+
+        for path in stage.outputs:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        stage.run()
+        record = {
+            'fingerprint': fingerprint,
+            'outputs': {str(path): fingerprints.file(path) for path in stage.outputs},
+        }
+        return 'ran', time.perf_counter() - started, record
+
+    pending = dict(stages)
+    running = {}
+    failure = None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while running or (pending and failure is None):
+            if failure is None:
+                ready = [s for s in pending.values() if all(dep in report for dep in s.deps)]
+                for stage in ready:
+                    running[pool.submit(execute, stage)] = stage
+                    del pending[stage.name]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    status, seconds, record = future.result()
+                except Exception as e:
+                    failure = failure or StageError(stage.name, e)
+                    state['stages'].pop(stage.name, None)
+                    continue
+                state['stages'][stage.name] = record
+                report[stage.name] = (status, seconds)
+
+    state['files'] = fingerprints.known
+    save_state(state, state_file)
+    if failure is not None:
+        raise failure from failure.error
+    return {name: report[name] for name in stages}
+
+
+def print_report(report, wall_seconds):
+    print("\n⏱️  STAGE TIMINGS")
+    for name, (status, seconds) in report.items():
+        print(f"   {name:<10} {status:<8} {seconds * 1000:>9.1f} ms")
+    print(f"   {'wall time':<19} {wall_seconds * 1000:>9.1f} ms")
+
+
+def watched_files(stages):
+    """Inputs that no stage produces: the export, reference CSVs, SQL and scripts"""
+    produced = {Path(path) for stage in stages.values() for path in stage.outputs}
+    return sorted({Path(path) for stage in stages.values() for path in stage.inputs} - produced)
+
+
+def file_states(paths):
+    states = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            states[path] = None
+        else:
+            states[path] = (stat.st_size, stat.st_mtime_ns)
+    return states
+
+
+# The scripts as this process loaded them. Stages are fingerprinted with these
+# hashes rather than the files on disk, so the state only ever records code
+# that ran; once a script is edited, watch mode restarts to load it.
+LOADED_SCRIPT_STATES = file_states(sorted(SCRIPTS_DIR.glob('*.py')))
+LOADED_SCRIPTS = {str(path.resolve()): hashlib.sha256(path.read_bytes()).hexdigest() for path in LOADED_SCRIPT_STATES}
+
+
+def restart():
+    """Replace this process with a fresh one running the same command"""
+    os.execv(sys.executable, [sys.executable, *sys.argv])
+
+
+def run_watched(stages, max_workers, state_file):
+    """One watch-mode run; a failing stage is reported instead of stopping the watch"""
+    started = time.perf_counter()
+    try:
+        report = run_pipeline(stages, max_workers=max_workers, state_file=state_file)
+    except StageError as e:
+        print(f"❌ Stage '{e.stage}' failed: {type(e.error).__name__}: {e.error}")
+        print("   Stages that finished are kept; waiting for the next change")
+        return False
+    print_report(report, time.perf_counter() - started)
+    return True
+
+
+def watch(stages, max_workers=4, state_file=STATE_FILE, poll_seconds=WATCH_POLL_SECONDS,
+          debounce_seconds=WATCH_DEBOUNCE_SECONDS):
+    """Re-run the pipeline whenever a watched file changes, until interrupted
+
+    Changes are noticed by polling sizes and mtimes, so no watcher package is
+    needed. A run starts once the files have stopped changing for
+    debounce_seconds, and run_pipeline's fingerprints then re-run only the
+    stages downstream of files whose content actually changed. An edit to a
+    script restarts the process so the new code is what runs.
+    """
+    paths = sorted(set(watched_files(stages)) | set(LOADED_SCRIPT_STATES))
+    known = file_states(paths)
+    if file_states(LOADED_SCRIPT_STATES) != LOADED_SCRIPT_STATES:
+        return restart()
+    run_watched(stages, max_workers, state_file)
+    print(f"\n👀 Watching {len(paths)} files (Ctrl+C to stop)")
+
+    while True:
+        time.sleep(poll_seconds)
+        current = file_states(paths)
+        if current == known:
+            continue
+
+        changed = sorted(path.name for path in paths if current[path] != known[path])
+        last_change = time.perf_counter()
+        while time.perf_counter() - last_change < debounce_seconds:
+            time.sleep(poll_seconds)
+            latest = file_states(paths)
+            if latest != current:
+                changed = sorted(set(changed) | {path.name for path in paths if latest[path] != current[path]})
+                current, last_change = latest, time.perf_counter()
+        known = current
+
+        print(f"\n🔄 Changed: {', '.join(changed)}")
+        if file_states(LOADED_SCRIPT_STATES) != LOADED_SCRIPT_STATES:
+            print("   Scripts changed; restarting to load them")
+            return restart()
+        if run_watched(stages, max_workers, state_file):
+            print(f"   ready {time.perf_counter() - last_change:.2f}s after the last write")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV)')
+    parser.add_argument('--generate', action='store_true',
+                        help='Regenerate the synthetic export first (overwrites --input)')
+    parser.add_argument('--json-output', type=Path, default=runner.DEFAULT_JSON_EXPORT)
+    parser.add_argument('--html-output', type=Path, default=DEFAULT_HTML)
+    parser.add_argument('--export-partitions', nargs='?', type=Path, const=export_partitions.DEFAULT_OUTPUT_DIR,
+                        help='Also write owner/stage-partitioned Parquet and NDJSON (default: exports/alerts)')
+    parser.add_argument('--quarantine', type=Path, default=validate_ingest.DEFAULT_QUARANTINE,
+                        help='Where rows failing ingest validation are written, with their reasons')
+    parser.add_argument('--force', action='store_true', help='Run every stage even if unchanged')
+    parser.add_argument('--workers', type=int, default=4, help='Maximum stages to run concurrently')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running, re-running changed stages whenever the export or reference files change')
+    parser.add_argument('--debounce', type=float, default=WATCH_DEBOUNCE_SECONDS,
+                        help='Seconds without further writes before a watch run starts')
+    runner.add_resource_arguments(parser)
+    args = parser.parse_args()
+
+    stages = build_stages(args.input.resolve(), args.json_output.resolve(), args.html_output.resolve(),
+                          generate=args.generate,
+                          partitions_dir=args.export_partitions.resolve() if args.export_partitions else None,
+                          quarantine=args.quarantine.resolve(),
+                          limits=runner.resource_limits(args.memory_limit, args.spill_dir, args.threads))
+    if args.watch:
+        try:
+            watch(stages, max_workers=args.workers, debounce_seconds=args.debounce)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    started = time.perf_counter()
+    report = run_pipeline(stages, force=args.force, max_workers=args.workers)
+    print_report(report, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+In-process pipeline runner: scores opportunities through the DuckDB Python API
+and hands the results to the dashboard as Arrow tables
+"""
+
+import argparse
+import os
+import re
+import duckdb
+import pyarrow as pa
+from datetime import date
+from pathlib import Path
+
+import result_cache
+from generate_html_dashboard import (
+    CHART_AMOUNT_BINS, CHART_GRID, DEFAULT_HTML, LEADERBOARD_COLUMNS, LEADERBOARD_SIZE, MEMORY_BUDGET_BYTES, TOP_ALERTS,
+    render_dashboard, write_dashboard,
+)
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+SCORING_SQL = PROJECT_ROOT / 'sql' / 'final_analysis_full.sql'
+DEFAULT_INPUT = PROJECT_ROOT / 'data' / 'salesforce_opportunities.csv'
+DEFAULT_JSON_EXPORT = PROJECT_ROOT / 'data' / 'dashboard_data.json'
+
+# Statements that build reference tables and the risk_analysis view; the
+# SELECT reports and the COPY export in the SQL file are CLI-only
+SETUP_STATEMENTS = ('CREATE', 'INSERT')
+
+# The CLI script points this view at data/ with a relative path; the runner
+# defines it over its own input instead
+RAW_SOURCE_VIEW = 'CREATE OR REPLACE VIEW opportunity_export'
+
+# Scores every deal in the export, duplicates included (score(keep_duplicates=True))
+KEEP_DUPLICATES_VIEW = 'CREATE OR REPLACE VIEW raw_opportunities AS SELECT * FROM opportunity_export'
+VIEW_STATEMENT = re.compile(r'CREATE\s+(OR\s+REPLACE\s+)?VIEW\b', re.IGNORECASE)
+
+# The date every signal is measured from; score() can move it to rescore an older snapshot
+ANALYSIS_DATE = re.compile(r"DATE '\d{4}-\d{2}-\d{2}' as analysis_date", re.IGNORECASE)
+
+# Reference tables replaced at runtime when the CSV exists (e.g. calibrated
+# benchmarks from calibrate_benchmarks.py); the SQL values are the defaults
+REFERENCE_OVERRIDES = {
+    'stage_benchmarks': PROJECT_ROOT / 'data' / 'stage_benchmarks.csv',
+    'stage_requirements': PROJECT_ROOT / 'data' / 'stage_requirements.csv',
+}
+
+# Coefficients written by risk_model.py; when the file exists, score() fills
+# in risk_analysis.loss_probability (NULL without a model) from the model
+RISK_MODEL = PROJECT_ROOT / 'data' / 'risk_model.json'
+
+# DuckDB resource settings for batch nodes. memory_limit caps each connection's
+# buffer pool, with sorts, joins and aggregates past it spilling to
+# temp_directory; threads caps its parallelism. Unset leaves DuckDB's defaults
+# (80% of RAM, one thread per core, a .tmp directory beside the database).
+RESOURCE_LIMITS = {
+    'memory_limit': os.environ.get('PIPELINE_MEMORY_LIMIT'),
+    'temp_directory': os.environ.get('PIPELINE_SPILL_DIR'),
+    'threads': os.environ.get('PIPELINE_THREADS'),
+}
+
+# Loaded by the scoring SQL itself (data/ paths resolve from the project root)
+SALES_HIERARCHY = PROJECT_ROOT / 'data' / 'sales_hierarchy.csv'
+
+# Same columns and order as the COPY export in final_analysis_full.sql
+ALERTS_SELECT = """
+SELECT
+    id,
+    name,
+    account_name,
+    owner_name,
+    stage_name,
+    CAST(amount AS DOUBLE) AS amount,
+    CAST(ROUND(overall_risk_score, 1) AS DOUBLE) AS risk_score,
+    CAST(ROUND(loss_probability, 3) AS DOUBLE) AS loss_probability,
+    risk_level,
+    days_in_stage,
+    days_since_activity,
+    days_to_close,
+    missing_field_list,
+    next_step,
+    competitor,
+    risk_factors,
+    recommended_actions
+FROM risk_alerts
+"""
+# Ties break on amount then id, as in TOP_ALERTS_QUERY, so the export is the same on every run
+ALERTS_QUERY = ALERTS_SELECT + "ORDER BY overall_risk_score DESC, amount DESC, id DESC\n"
+
+# Arrow bytes per fetched alert, with its risk factors and actions (measured on
+# the sample export); compared against MEMORY_BUDGET_BYTES before fetching
+ALERT_BYTES = 650
+
+# The alerts the dashboard lists, in its order; LIMIT makes this a top-N that
+# keeps only that many rows rather than sorting every alert
+TOP_ALERTS_QUERY = ALERTS_SELECT + f"ORDER BY risk_score DESC, amount DESC, id DESC\nLIMIT {TOP_ALERTS}\n"
+
+# Top LEADERBOARD_SIZE flagged deals per owner, stage and region, in one scan:
+# each deal is unnested into one row per segment and ranked within it. With a
+# single (struct) ORDER BY key, DuckDB turns the QUALIFY into a grouped
+# arg_max(..., n), which keeps n rows per segment value instead of sorting
+# every flagged deal; a multi-key ORDER BY would sort the whole window.
+LEADERBOARD_QUERY = f"""
+SELECT
+    segment,
+    segment_value,
+    row_number() OVER (PARTITION BY segment, segment_value ORDER BY (risk_score, amount, id) DESC) AS rank,
+    {', '.join(LEADERBOARD_COLUMNS)}
+FROM (
+    SELECT
+        r.id,
+        r.account_name,
+        r.owner_name,
+        r.stage_name,
+        CAST(r.amount AS DOUBLE) AS amount,
+        CAST(ROUND(r.overall_risk_score, 1) AS DOUBLE) AS risk_score,
+        CAST(ROUND(r.loss_probability, 3) AS DOUBLE) AS loss_probability,
+        r.risk_level,
+        UNNEST([
+            {{'segment': 'owner', 'segment_value': r.owner_name}},
+            {{'segment': 'stage', 'segment_value': r.stage_name}},
+            {{'segment': 'region', 'segment_value': COALESCE(h.region, 'Unassigned')}}
+        ], recursive := true)
+    FROM risk_analysis r
+    LEFT JOIN sales_hierarchy h ON r.owner_name = h.owner_name
+    WHERE r.risk_level IN ('at_risk', 'high_risk')
+)
+QUALIFY rank <= {LEADERBOARD_SIZE}
+ORDER BY segment, segment_value, rank
+"""
+
+# Per-owner, per-risk-level sums in the shape load_deal_aggregates() returns.
+# Healthy deals contribute a score of 0, as they do in the JSON alert feed.
+DEAL_AGGREGATES_QUERY = """
+SELECT
+    owner_name AS owner,
+    risk_level,
+    COUNT(*) AS deals,
+    COUNT(*) FILTER (WHERE risk_level <> 'healthy' AND overall_risk_score > 0) AS scored_deals,
+    CAST(SUM(amount) AS DOUBLE) AS amount,
+    CAST(SUM(CASE WHEN risk_level <> 'healthy' THEN overall_risk_score ELSE 0 END) AS DOUBLE) AS risk_score
+FROM risk_analysis
+GROUP BY owner_name, risk_level
+"""
+
+_CHART_DAYS_BIN_EXPR = f"LEAST(days_in_stage // {CHART_GRID['days_bin']}, {CHART_GRID['days_bins'] - 1})"
+
+# Binned views of risk_analysis for the dashboard's distribution charts
+CHART_QUERIES = {
+    # Deals and value per (days in stage, amount) cell
+    'amount_by_days': f"""
+SELECT
+    {_CHART_DAYS_BIN_EXPR} AS days_bin,
+    CAST(LEAST(GREATEST(
+        floor((log10(GREATEST(amount, 1)) - {CHART_GRID['amount_decades'][0]}) * {CHART_GRID['amount_bins_per_decade']}), 0
+    ), {CHART_AMOUNT_BINS - 1}) AS INTEGER) AS amount_bin,
+    COUNT(*) AS deals,
+    CAST(SUM(amount) AS DOUBLE) AS amount
+FROM risk_analysis
+WHERE amount IS NOT NULL AND days_in_stage IS NOT NULL
+GROUP BY ALL
+ORDER BY days_bin, amount_bin
+""",
+    # Deals per risk score bin, split by risk level
+    'risk_score_histogram': f"""
+SELECT
+    CAST(floor(overall_risk_score / {CHART_GRID['score_bin']}) * {CHART_GRID['score_bin']} AS DOUBLE) AS score_bin,
+    risk_level,
+    COUNT(*) AS deals,
+    CAST(SUM(amount) AS DOUBLE) AS amount
+FROM risk_analysis
+WHERE overall_risk_score IS NOT NULL
+GROUP BY ALL
+ORDER BY score_bin, risk_level
+""",
+    # Amount percentiles per days-in-stage bin; approx_quantile keeps a
+    # fixed-size digest per bin rather than every amount
+    'amount_bands': f"""
+SELECT
+    days_bin,
+    deals,
+    {', '.join(f'q[{i + 1}] AS p{round(p * 100)}' for i, p in enumerate(CHART_GRID['percentiles']))}
+FROM (
+    SELECT
+        {_CHART_DAYS_BIN_EXPR} AS days_bin,
+        COUNT(*) AS deals,
+        approx_quantile(CAST(amount AS DOUBLE), [{', '.join(str(p) for p in CHART_GRID['percentiles'])}]) AS q
+    FROM risk_analysis
+    WHERE amount IS NOT NULL AND days_in_stage IS NOT NULL
+    GROUP BY ALL
+)
+ORDER BY days_bin
+""",
+}
+
+# Hierarchy order: each node directly after its parent
+ROLLUP_ORDER = "segment NULLS FIRST, region NULLS FIRST, manager_name NULLS FIRST, owner_name NULLS FIRST"
+
+# Levels shown in the org dashboard; rep rows stay in the Parquet/drill-down data
+DASHBOARD_ROLLUP_LEVELS = ('segment', 'region', 'manager')
+
+
+def split_statements(sql_text):
+    """Split a DuckDB CLI script into plain SQL statements, dropping dot-commands and comments"""
+    lines = [
+        line for line in sql_text.splitlines()
+        if not line.lstrip().startswith(('.', '--'))
+    ]
+    return [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+
+
+def load_scoring_sql(sql_path=SCORING_SQL, analysis_date=None):
+    """Return the setup statements (reference tables + risk_analysis view) from the scoring script
+
+    analysis_date is a date or a YYYY-MM-DD string; anything else raises
+    ValueError rather than reaching the SQL.
+    """
+    sql_text = Path(sql_path).read_text()
+    if analysis_date:
+        analysis_date = date.fromisoformat(str(analysis_date))
+        sql_text = ANALYSIS_DATE.sub(f"DATE '{analysis_date.isoformat()}' as analysis_date", sql_text)
+    statements = split_statements(sql_text)
+    return [
+        stmt for stmt in statements
+        if stmt.split(None, 1)[0].upper() in SETUP_STATEMENTS and not stmt.startswith(RAW_SOURCE_VIEW)
+    ]
+
+
+def sql_literal(value):
+    """Quote a path or string for inlining into DDL, which DuckDB can't parameterize"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def fetch_arrow(result):
+    """Materialize a DuckDB result as an Arrow table (older releases return a Table, newer a reader)"""
+    table = result.arrow()
+    return table.read_all() if isinstance(table, pa.RecordBatchReader) else table
+
+
+def arrow_batches(result, batch_rows=1_000_000):
+    """Stream a DuckDB result as Arrow record batches without materializing it"""
+    if hasattr(result, 'to_arrow_reader'):
+        return result.to_arrow_reader(batch_rows)
+    return result.fetch_record_batch(batch_rows)
+
+
+def source_scan(path):
+    """Table function call that reads an opportunity file (CSV export or Parquet)"""
+    path = Path(path)
+    reader = 'read_parquet' if path.suffix == '.parquet' else 'read_csv_auto'
+    return f"{reader}({sql_literal(path.as_posix())})"
+
+
+def source_rows(con, path):
+    """Row count of an opportunity file, read from the footer for Parquet"""
+    if Path(path).suffix == '.parquet':
+        return con.execute(
+            f"SELECT COALESCE(SUM(num_rows), 0) FROM parquet_file_metadata({sql_literal(Path(path).as_posix())})"
+        ).fetchone()[0]
+    return con.execute(f"SELECT COUNT(*) FROM {source_scan(path)}").fetchone()[0]
+
+
+def resource_limits(memory_limit=None, spill_dir=None, threads=None):
+    """RESOURCE_LIMITS with any of the given settings replacing the environment's"""
+    limits = dict(RESOURCE_LIMITS)
+    for name, value in (('memory_limit', memory_limit), ('temp_directory', spill_dir), ('threads', threads)):
+        if value is not None:
+            limits[name] = value
+    return limits
+
+
+def connect(database=':memory:', limits=None):
+    """Open a DuckDB connection that resolves the SQL's relative data/ paths from the project root
+
+    limits holds the RESOURCE_LIMITS settings to apply (default: RESOURCE_LIMITS).
+    With a memory_limit, results may come back out of insertion order, which
+    lets DuckDB write them without buffering the whole result.
+    """
+    limits = RESOURCE_LIMITS if limits is None else limits
+    con = duckdb.connect(str(database))
+    con.execute(f"SET file_search_path = {sql_literal(PROJECT_ROOT.as_posix())}")
+    if limits.get('memory_limit'):
+        con.execute(f"SET memory_limit = {sql_literal(limits['memory_limit'])}")
+        con.execute("SET preserve_insertion_order = false")
+    if limits.get('temp_directory'):
+        Path(limits['temp_directory']).mkdir(parents=True, exist_ok=True)
+        con.execute(f"SET temp_directory = {sql_literal(Path(limits['temp_directory']).as_posix())}")
+    if limits.get('threads'):
+        con.execute(f"SET threads = {int(limits['threads'])}")
+    return con
+
+
+def create_reference_tables(con, overrides=REFERENCE_OVERRIDES):
+    """Create the reference tables from the scoring SQL, then load any CSV overrides over them"""
+    for stmt in load_scoring_sql():
+        if not VIEW_STATEMENT.match(stmt):
+            con.execute(stmt)
+
+    for table, path in overrides.items():
+        if Path(path).exists():
+            con.execute(f"DELETE FROM {table}")
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM {source_scan(path)}")
+
+
+def score(con, input_path=DEFAULT_INPUT, analysis_date=None, model=RISK_MODEL, duplicates=None,
+          keep_duplicates=False):
+    """Create the reference tables and risk_analysis view over the given opportunity export
+
+    analysis_date (a date or YYYY-MM-DD) replaces the SQL's as-of date, for exports taken on another day.
+    model is a risk_model.py coefficients file, applied when it exists (None skips it).
+    Duplicate deals (see opportunity_duplicates in the SQL) are left out of
+    scoring: duplicates is an opportunity_duplicates result already written to
+    a file, e.g. by the pipeline's dedup stage, used instead of detecting them
+    again, and keep_duplicates scores every deal in the export.
+    """
+    con.execute(f"{RAW_SOURCE_VIEW} AS SELECT * FROM {source_scan(input_path)}")
+    create_reference_tables(con)
+    for stmt in load_scoring_sql(analysis_date=analysis_date):
+        if VIEW_STATEMENT.match(stmt):
+            con.execute(stmt)
+    if duplicates is not None:
+        con.execute(f"CREATE OR REPLACE VIEW opportunity_duplicates AS SELECT * FROM {source_scan(duplicates)}")
+    if keep_duplicates:
+        con.execute(KEEP_DUPLICATES_VIEW)
+    if model is not None and Path(model).exists():
+        apply_risk_model(con, model)
+
+
+def apply_risk_model(con, model_file):
+    """Fill in risk_analysis.loss_probability from the learned model
+
+    The rule-based view is renamed risk_scores and risk_analysis re-created on
+    top of it with the model's probability in place of the NULL column. DuckDB
+    binds views by name when they are queried, so risk_alerts and the reports
+    built on risk_analysis carry the probability too.
+    """
+    # Imported here: risk_model builds on this module
+    import risk_model
+    con.execute("ALTER VIEW risk_analysis RENAME TO risk_scores")
+    con.execute(
+        f"CREATE VIEW risk_analysis AS SELECT * REPLACE ("
+        f"{risk_model.model_expression(risk_model.load_model(model_file))} AS loss_probability) FROM risk_scores"
+    )
+
+
+def snapshot_scores(con):
+    """Score every deal once into a table and point risk_analysis at it
+
+    The views above risk_analysis then read stored scores instead of scoring
+    again on every query. Under a memory_limit the table spills to the
+    temp_directory like any other DuckDB data.
+    """
+    con.execute("CREATE OR REPLACE TABLE scored_snapshot AS SELECT * FROM risk_analysis")
+    con.execute("CREATE OR REPLACE VIEW risk_analysis AS SELECT * FROM scored_snapshot")
+
+
+def fetch_alerts(con):
+    return fetch_arrow(con.execute(ALERTS_QUERY))
+
+
+def fetch_dashboard_alerts(con, max_alerts, memory_budget=MEMORY_BUDGET_BYTES):
+    """Alerts for render_dashboard and the number flagged
+
+    max_alerts bounds how many alerts there can be (the rows scored). When
+    that many would take more than memory_budget, only the TOP_ALERTS rows the
+    dashboard lists are fetched and the rest are counted in DuckDB, so the
+    Python side holds a fixed number of rows at any size.
+    """
+    if max_alerts * ALERT_BYTES <= memory_budget:
+        alerts = fetch_alerts(con)
+        return alerts, len(alerts)
+    flagged = con.execute("SELECT COUNT(*) FROM risk_alerts").fetchone()[0]
+    return fetch_arrow(con.execute(TOP_ALERTS_QUERY)), flagged
+
+
+def fetch_deal_aggregates(con):
+    return fetch_arrow(con.execute(DEAL_AGGREGATES_QUERY)).to_pandas().set_index(['owner', 'risk_level'])
+
+
+def fetch_rollups(con, levels=DASHBOARD_ROLLUP_LEVELS, source='team_rollups'):
+    """team_rollups rows for the given levels, in hierarchy order"""
+    return fetch_arrow(con.execute(
+        f"SELECT * FROM {source} WHERE rollup_level IN ({', '.join(sql_literal(l) for l in levels)}) "
+        f"ORDER BY {ROLLUP_ORDER}"
+    ))
+
+
+def fetch_leaderboards(con, source=None):
+    """LEADERBOARD_QUERY rows, queried live or read from the file the pipeline's leaderboard stage wrote"""
+    if source:
+        return fetch_arrow(con.execute(f"SELECT * FROM {source_scan(source)}"))
+    return fetch_arrow(con.execute(LEADERBOARD_QUERY))
+
+
+def fetch_chart_data(con, sources=None):
+    """Binned chart tables keyed by CHART_QUERIES name, queried live or read from files written earlier"""
+    if sources:
+        return {name: fetch_arrow(con.execute(f"SELECT * FROM {source_scan(path)}")) for name, path in sources.items()}
+    return {name: fetch_arrow(con.execute(query)) for name, query in CHART_QUERIES.items()}
+
+
+def export_json(con, output_file=DEFAULT_JSON_EXPORT):
+    """Optional JSON export, identical in shape to the CLI's dashboard_data.json
+
+    Written by DuckDB straight from risk_alerts, so the alerts never have to
+    fit in Python memory.
+    """
+    con.execute(f"COPY ({ALERTS_QUERY}) TO {sql_literal(Path(output_file).as_posix())} (FORMAT JSON, ARRAY true)")
+    print(f"   Exported alerts to: {output_file}")
+
+
+def run(con, input_path=DEFAULT_INPUT, use_cache=True, memory_budget=MEMORY_BUDGET_BYTES, keep_duplicates=False):
+    """Score and render, returning (alerts, flagged, deal_aggregates, html)
+
+    Results come from the result cache when inputs are unchanged; otherwise
+    the deals are scored once (see snapshot_scores) for every query. An input
+    whose alerts could outgrow memory_budget is rendered from only the top
+    alerts (see fetch_dashboard_alerts) and isn't cached, since the cache
+    holds every alert.
+    """
+    score(con, input_path, keep_duplicates=keep_duplicates)
+
+    rows = source_rows(con, input_path)
+    streaming = rows * ALERT_BYTES > memory_budget
+    statements = load_scoring_sql() + ([KEEP_DUPLICATES_VIEW] if keep_duplicates else [])
+    key = result_cache.cache_key(con, input_path, statements, RISK_MODEL) if use_cache and not streaming else None
+    cached = result_cache.load(key) if key else None
+    if cached:
+        print(f"⚡ Cache hit ({key[:12]}): reusing scored results and dashboard")
+        alerts, deal_aggregates, html = cached
+        return alerts, len(alerts), deal_aggregates, html
+
+    snapshot_scores(con)
+    alerts, flagged = fetch_dashboard_alerts(con, rows, memory_budget)
+    deal_aggregates = fetch_deal_aggregates(con)
+    html = render_dashboard(alerts, deal_aggregates, rollups=fetch_rollups(con), charts=fetch_chart_data(con),
+                            flagged=flagged, leaderboards=fetch_leaderboards(con))
+    if key:
+        result_cache.store(key, alerts, deal_aggregates, html)
+    return alerts, flagged, deal_aggregates, html
+
+
+def add_resource_arguments(parser):
+    """--memory-limit, --spill-dir and --threads, each defaulting to its RESOURCE_LIMITS environment variable"""
+    parser.add_argument('--memory-limit',
+                        help="DuckDB memory limit per connection, e.g. 2GB; larger operators spill to disk "
+                             "(env PIPELINE_MEMORY_LIMIT)")
+    parser.add_argument('--spill-dir', type=Path, help='Directory for spilled data (env PIPELINE_SPILL_DIR)')
+    parser.add_argument('--threads', type=int, help='DuckDB threads per connection (env PIPELINE_THREADS)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', type=Path, default=DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV)')
+    parser.add_argument('--export-json', nargs='?', type=Path, const=DEFAULT_JSON_EXPORT,
+                        help='Also write alerts as a JSON array (default: data/dashboard_data.json)')
+    parser.add_argument('--html-output', type=Path, default=DEFAULT_HTML, help='Where to write the dashboard')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-score and re-render, bypassing the result cache')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Score duplicate opportunities too instead of collapsing them into one deal')
+    add_resource_arguments(parser)
+    args = parser.parse_args()
+
+    # Imported here: validate_ingest builds on this module
+    import validate_ingest
+    con = connect(limits=resource_limits(args.memory_limit, args.spill_dir, args.threads))
+    _, flagged, _, html = run(con, validate_ingest.validated(args.input), use_cache=not args.no_cache,
+                              keep_duplicates=args.keep_duplicates)
+    print(f"✅ Scored pipeline: {flagged} deals flagged")
+
+    if args.export_json:
+        export_json(con, args.export_json)
+
+    write_dashboard(html, args.html_output)
+
+
+if __name__ == "__main__":
+    main()
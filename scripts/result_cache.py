@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for pipeline results (scored alerts, aggregates, rendered HTML,
+ad hoc query results)
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import pyarrow as pa
+from pathlib import Path
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+CACHE_DIR = Path(os.environ.get('PIPELINE_CACHE_DIR', PROJECT_ROOT / '.cache' / 'results'))
+MAX_CACHE_BYTES = int(os.environ.get('PIPELINE_CACHE_MB', '256')) * 1024 * 1024
+
+# Rendered HTML depends on the renderer as well as the data, the cached
+# alerts, aggregates and charts on the queries in the runner, and
+# loss_probability on the SQL the risk model builds from its coefficients
+RENDERER_SOURCE = Path(__file__).parent / 'generate_html_dashboard.py'
+QUERIES_SOURCE = Path(__file__).parent / 'pipeline_runner.py'
+MODEL_SOURCE = Path(__file__).parent / 'risk_model.py'
+
+ANALYSIS_DATE_PATTERN = re.compile(r"DATE '(\d{4}-\d{2}-\d{2})' as analysis_date", re.IGNORECASE)
+
+ALERTS_FILE = 'alerts.arrow'
+AGGREGATES_FILE = 'aggregates.arrow'
+HTML_FILE = 'dashboard.html'
+TABLE_FILE = 'table.arrow'
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def _update_file(digest, path):
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+
+
+def _update_rows(digest, con, query):
+    for row in con.execute(query).fetchall():
+        digest.update(repr(row).encode())
+
+
+def cache_key(con, input_path, scoring_statements, model_file=None):
+    """Hash everything that determines the outputs: input bytes, reference tables, hierarchy, rules, analysis date and code
+
+    model_file is the risk_model.py coefficients file scoring applies, if it exists.
+    """
+    digest = hashlib.sha256()
+    _update_file(digest, input_path)
+    _update_rows(digest, con, "SELECT * FROM stage_benchmarks ORDER BY ALL")
+    _update_rows(digest, con, "SELECT * FROM stage_requirements ORDER BY ALL")
+    _update_rows(digest, con, "SELECT * FROM sales_hierarchy ORDER BY ALL")
+
+    scoring_sql = '\n;\n'.join(scoring_statements)
+    digest.update(scoring_sql.encode())
+    for analysis_date in ANALYSIS_DATE_PATTERN.findall(scoring_sql):
+        digest.update(analysis_date.encode())
+
+    if model_file is not None and Path(model_file).exists():
+        _update_file(digest, model_file)
+
+    _update_file(digest, RENDERER_SOURCE)
+    _update_file(digest, QUERIES_SOURCE)
+    _update_file(digest, MODEL_SOURCE)
+    return digest.hexdigest()
+
+
+def _write_arrow(table, path):
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_arrow(path):
+    # Memory-mapped, so a hit doesn't copy the alert buffers
+    return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+
+
+def load(key, cache_dir=CACHE_DIR):
+    """Return (alerts, deal_aggregates, html) for a key, or None on a miss"""
+    entry = Path(cache_dir) / key
+    if not (entry / HTML_FILE).exists():
+        return None
+
+    # Mark as most recently used for LRU eviction
+    os.utime(entry)
+
+    alerts = _read_arrow(entry / ALERTS_FILE)
+    deal_aggregates = _read_arrow(entry / AGGREGATES_FILE).to_pandas().set_index(['owner', 'risk_level'])
+    html = (entry / HTML_FILE).read_text()
+    return alerts, deal_aggregates, html
+
+
+def store(key, alerts, deal_aggregates, html, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Write an entry atomically, then evict least recently used entries over the size budget"""
+    cache_dir = Path(cache_dir)
+    staging = cache_dir / f".{key}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    _write_arrow(alerts, staging / ALERTS_FILE)
+    _write_arrow(pa.Table.from_pandas(deal_aggregates.reset_index(), preserve_index=False),
+                 staging / AGGREGATES_FILE)
+    (staging / HTML_FILE).write_text(html)
+    _publish(staging, cache_dir / key, cache_dir, max_bytes)
+
+
+def query_key(cache_key, sql):
+    """Key for one query's result over the inputs a cache_key() hashes"""
+    return hashlib.sha256(f"{cache_key}\n{sql}".encode()).hexdigest()
+
+
+def load_table(key, cache_dir=CACHE_DIR):
+    """Return a table stored with store_table(), or None on a miss"""
+    entry = Path(cache_dir) / key
+    if not (entry / TABLE_FILE).exists():
+        return None
+    os.utime(entry)
+    return _read_arrow(entry / TABLE_FILE)
+
+
+def store_table(key, table, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Write one Arrow table as an entry, sharing store()'s atomic write and eviction"""
+    cache_dir = Path(cache_dir)
+    staging = cache_dir / f".{key}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    _write_arrow(table, staging / TABLE_FILE)
+    _publish(staging, cache_dir / key, cache_dir, max_bytes)
+
+
+def _publish(staging, entry, cache_dir, max_bytes):
+    shutil.rmtree(entry, ignore_errors=True)
+    staging.rename(entry)
+    evict(cache_dir, max_bytes)
+
+
+def _entry_size(entry):
+    return sum(f.stat().st_size for f in entry.iterdir())
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    entries = [e for e in Path(cache_dir).iterdir() if e.is_dir() and not e.name.startswith('.')]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    sizes = {entry: _entry_size(entry) for entry in entries}
+
+    total = sum(sizes.values())
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= sizes[entry]
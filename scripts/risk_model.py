@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Learned risk model: an L2-regularized logistic regression that predicts Closed
+Lost from the risk signals, trained on labelled deals with NumPy minibatches
+
+Closed deals are snapshotted at close, so their in-flight signals are gone.
+As in sweep_thresholds.py, an earlier export of open deals is scored as of the
+day it was taken and each deal is labelled with its outcome from a later
+export. The fitted model is saved as a handful of coefficients in raw feature
+units, which pipeline_runner.score() turns into a loss_probability column on
+risk_analysis (one arithmetic expression per deal) and predict() applies to
+Arrow or NumPy data.
+"""
+
+import argparse
+import json
+import numpy as np
+from datetime import date
+from pathlib import Path
+
+import pipeline_runner as runner
+
+DEFAULT_OUTPUT = runner.RISK_MODEL
+
+# risk_analysis columns the model reads: the six 0-2 signal scores plus the
+# raw day counts behind the bucketed ones, clipped so a years-stale deal
+# doesn't dominate the fit
+FEATURES = [
+    'time_in_stage_score',
+    'activity_gap_score',
+    'missing_fields_score',
+    'close_date_score',
+    'competitor_score',
+    'next_step_score',
+    'days_in_stage',
+    'days_since_activity',
+    'days_to_close',
+]
+DAY_CLIP = {
+    'days_in_stage': (0, 365),
+    'days_since_activity': (0, 365),
+    'days_to_close': (-365, 365),
+}
+
+# Features and outcome for every snapshot deal that has since closed
+LABELLED_FEATURES_QUERY = """
+SELECT
+    {features},
+    r.overall_risk_score,
+    o."StageName" = 'Closed Lost' AS lost
+FROM risk_analysis r
+JOIN {outcomes} o ON r.id = o."Id"
+WHERE o."StageName" IN ('Closed Won', 'Closed Lost')
+"""
+
+# Training defaults: Adam steps over shuffled minibatches
+EPOCHS = 8
+BATCH_SIZE = 8192
+LEARNING_RATE = 0.05
+L2 = 1e-3
+HOLDOUT = 0.2
+
+
+def feature_matrix(columns):
+    """float64 (deals, features) matrix from name -> array-like, clipped, with NULLs as NaN"""
+    matrix = np.column_stack([np.asarray(columns[name], dtype='float64') for name in FEATURES])
+    for i, name in enumerate(FEATURES):
+        if name in DAY_CLIP:
+            matrix[:, i] = np.clip(matrix[:, i], *DAY_CLIP[name])
+    return matrix
+
+
+def arrow_features(table):
+    """feature_matrix() of an Arrow table (or record batch) holding the FEATURES columns"""
+    return feature_matrix({name: table[name].to_numpy(zero_copy_only=False) for name in FEATURES})
+
+
+def load_labelled(con, outcomes):
+    """(features, overall_risk_score, lost) for scored snapshot deals with a Closed Won / Closed Lost outcome"""
+    table = runner.fetch_arrow(con.execute(LABELLED_FEATURES_QUERY.format(
+        features=', '.join(f'CAST(r.{name} AS DOUBLE) AS {name}' for name in FEATURES),
+        outcomes=runner.source_scan(outcomes),
+    )))
+    return (arrow_features(table), table['overall_risk_score'].to_numpy(zero_copy_only=False).astype('float64'),
+            table['lost'].to_numpy(zero_copy_only=False).astype('float64'))
+
+
+def sigmoid(z):
+    return 0.5 * (1 + np.tanh(0.5 * z))
+
+
+def train(features, lost, epochs=EPOCHS, batch_size=BATCH_SIZE, learning_rate=LEARNING_RATE, l2=L2, seed=42):
+    """Fit the logistic model and return it in raw feature units
+
+    Features are standardized with their means and spreads (a missing value
+    becomes the mean), then the weights are fitted with Adam over shuffled
+    minibatches, each step one matrix-vector product over the batch. The
+    returned weights are folded back through the standardization, so scoring
+    needs only intercept + sum(coefficient * value) with the same mean fill.
+    """
+    rng = np.random.default_rng(seed)
+    fill = np.nanmean(features, axis=0)
+    fill = np.where(np.isnan(fill), 0.0, fill)
+    filled = np.where(np.isnan(features), fill, features)
+    scale = filled.std(axis=0)
+    scale = np.where(scale > 0, scale, 1.0)
+    x = ((filled - fill) / scale).astype('float32')
+    y = lost.astype('float32')
+
+    params = np.zeros(x.shape[1] + 1, dtype='float64')  # weights, then the intercept
+    moment = np.zeros_like(params)
+    velocity = np.zeros_like(params)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(y))
+        for start in range(0, len(y), batch_size):
+            batch = order[start:start + batch_size]
+            error = sigmoid(x[batch] @ params[:-1] + params[-1]) - y[batch]
+            gradient = np.append(x[batch].T @ error / len(batch) + l2 * params[:-1], error.mean())
+            step += 1
+            moment = beta1 * moment + (1 - beta1) * gradient
+            velocity = beta2 * velocity + (1 - beta2) * gradient ** 2
+            params -= (learning_rate * (moment / (1 - beta1 ** step))
+                       / (np.sqrt(velocity / (1 - beta2 ** step)) + eps))
+
+    coefficients = params[:-1] / scale
+    return {
+        'intercept': float(params[-1] - coefficients @ fill),
+        'coefficients': dict(zip(FEATURES, coefficients.tolist())),
+        'fill': dict(zip(FEATURES, fill.tolist())),
+        'clip': DAY_CLIP,
+    }
+
+
+def predict(model, features):
+    """Loss probability per row of a feature_matrix() (see arrow_features for Arrow batches)"""
+    coefficients = np.array([model['coefficients'][name] for name in FEATURES])
+    fill = np.array([model['fill'][name] for name in FEATURES])
+    return sigmoid(np.where(np.isnan(features), fill, features) @ coefficients + model['intercept'])
+
+
+def model_expression(model, prefix=''):
+    """The model as one SQL expression over risk_analysis columns (prefix qualifies them, e.g. 'r.')"""
+    terms = []
+    for name in FEATURES:
+        # Filled before clipping: GREATEST and LEAST skip NULLs, so a NULL
+        # would otherwise come out as the clip bound
+        value = f"COALESCE(CAST({prefix}{name} AS DOUBLE), {model['fill'][name]!r})"
+        if name in model['clip']:
+            low, high = model['clip'][name]
+            value = f"LEAST(GREATEST({value}, {low}), {high})"
+        terms.append(f"{model['coefficients'][name]!r} * {value}")
+    return f"1 / (1 + exp(-({model['intercept']!r} + {' + '.join(terms)})))"
+
+
+def auc(scores, lost):
+    """Area under the ROC curve: the chance a lost deal outranks a won one (ties count half)"""
+    positives = int(lost.sum())
+    negatives = len(lost) - positives
+    if not positives or not negatives:
+        return float('nan')
+    # 1-based ranks, averaged across ties
+    order = np.argsort(scores, kind='stable')
+    ranks = np.empty(len(scores))
+    sorted_scores = scores[order]
+    starts = np.flatnonzero(np.r_[True, sorted_scores[1:] != sorted_scores[:-1]])
+    ends = np.r_[starts[1:], len(scores)]
+    ranks[order] = np.repeat((starts + ends + 1) / 2, ends - starts)
+    return float((ranks[lost.astype(bool)].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def log_loss(probability, lost):
+    probability = np.clip(probability, 1e-12, 1 - 1e-12)
+    return float(-np.mean(lost * np.log(probability) + (1 - lost) * np.log(1 - probability)))
+
+
+def save_model(model, path=DEFAULT_OUTPUT):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(model, indent=2))
+
+
+def load_model(path=DEFAULT_OUTPUT):
+    return json.loads(Path(path).read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('snapshot', type=Path, help='Earlier opportunity export (deals still open)')
+    parser.add_argument('--as-of', required=True, type=date.fromisoformat,
+                        help='Date the snapshot was taken (YYYY-MM-DD)')
+    parser.add_argument('--outcomes', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Later export holding the Closed Won / Closed Lost outcomes')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT,
+                        help='Where to save the coefficients (pipeline_runner scores with this file when it exists)')
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--learning-rate', type=float, default=LEARNING_RATE)
+    parser.add_argument('--l2', type=float, default=L2, help='L2 penalty on the standardized weights')
+    parser.add_argument('--holdout', type=float, default=HOLDOUT, help='Share of deals held out for evaluation')
+    runner.add_resource_arguments(parser)
+    args = parser.parse_args()
+
+    con = runner.connect(limits=runner.resource_limits(args.memory_limit, args.spill_dir, args.threads))
+    runner.score(con, args.snapshot, analysis_date=args.as_of, model=None)
+    features, risk_score, lost = load_labelled(con, args.outcomes)
+    if not len(lost):
+        parser.error("no snapshot deals have a Closed Won / Closed Lost outcome in --outcomes")
+
+    held_out = np.random.default_rng(0).random(len(lost)) < args.holdout
+    model = train(features[~held_out], lost[~held_out], args.epochs, args.batch_size, args.learning_rate, args.l2)
+    probability = predict(model, features[held_out])
+
+    print(f"\n🤖 RISK MODEL: trained on {int((~held_out).sum()):,} closed deals "
+          f"({int(lost[~held_out].sum()):,} lost), evaluated on {int(held_out.sum()):,}")
+    print(f"   AUC: learned {auc(probability, lost[held_out]):.3f}, "
+          f"overall_risk_score {auc(risk_score[held_out], lost[held_out]):.3f}")
+    print(f"   Log loss: {log_loss(probability, lost[held_out]):.4f} "
+          f"(base rate {log_loss(np.full(held_out.sum(), lost[~held_out].mean()), lost[held_out]):.4f})")
+    print("\n   Coefficient per unit (log-odds of Closed Lost):")
+    for name in FEATURES:
+        print(f"   {name:<22} {model['coefficients'][name]:>+9.4f}")
+
+    save_model(model, args.output)
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
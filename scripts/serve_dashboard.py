@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Dashboard server: keeps scored deals in a warm DuckDB connection and serves
+the dashboard plus a JSON API for filtering alerts and drilling into deals
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pipeline_runner as runner
+import validate_ingest
+from generate_html_dashboard import render_dashboard
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_PORT = 8050
+DEFAULT_WORKERS = 32
+DEFAULT_CACHE_ENTRIES = 4096
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Query-string filters and the served_deals column each one matches
+FILTERS = {
+    'owner': 'owner_name',
+    'stage': 'stage_name',
+    'risk_level': 'risk_level',
+}
+
+# Every scored deal, with DECIMALs as DOUBLE so rows serialize straight to JSON
+SERVED_DEALS_QUERY = """
+SELECT * REPLACE (
+    CAST(amount AS DOUBLE) AS amount,
+    CAST(overall_risk_score AS DOUBLE) AS overall_risk_score
+)
+FROM risk_analysis
+"""
+
+ALERTS_PAGE_QUERY = """
+SELECT * FROM served_alerts
+{where}
+ORDER BY risk_score DESC, amount DESC, id
+LIMIT ? OFFSET ?
+"""
+
+SUMMARY_QUERY = """
+SELECT
+    risk_level,
+    COUNT(*) AS deals,
+    SUM(amount) AS amount,
+    ROUND(AVG(overall_risk_score), 2) AS avg_risk_score
+FROM served_deals
+{where}
+GROUP BY risk_level
+ORDER BY risk_level
+"""
+
+DEAL_QUERY = """
+SELECT d.*, a.risk_factors, a.recommended_actions
+FROM served_deals d
+LEFT JOIN served_alerts a USING (id)
+WHERE d.id = ?
+"""
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered responses, keyed by score version and request
+
+    Concurrent misses on one key wait for a single build instead of each
+    running the same query.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.building = {}
+        self.lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            pending = self.building.get(key)
+            if pending is None:
+                pending = self.building[key] = Future()
+                builder = True
+            else:
+                builder = False
+        if not builder:
+            return pending.result()
+
+        try:
+            entry = build()
+        except Exception as e:
+            with self.lock:
+                del self.building[key]
+            pending.set_exception(e)
+            raise
+        with self.lock:
+            del self.building[key]
+            if entry is not None:
+                self.entries[key] = entry
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        pending.set_result(entry)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DashboardData:
+    """Scored tables held in one warm DuckDB connection; each worker thread queries through its own cursor
+
+    rescore() validates and scores the input on a separate connection, then
+    swaps the served tables in one transaction, so requests see either the old
+    or the new scores and never a mix. Each rescore bumps the version that cache
+    keys carry and clears the response cache.
+    """
+
+    def __init__(self, input_path=runner.DEFAULT_INPUT, cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.input_path = Path(input_path)
+        self.con = runner.connect()
+        self.cache = ResponseCache(cache_entries)
+        self.version = 0
+        self.html = ''
+        self.rescore_lock = threading.Lock()
+        self.local = threading.local()
+
+    def rescore(self):
+        with self.rescore_lock:
+            scoring = runner.connect()
+            runner.score(scoring, validate_ingest.validated(self.input_path))
+            # Score once; the alerts, rollups and chart views below read the table
+            runner.snapshot_scores(scoring)
+            deals = runner.fetch_arrow(scoring.execute(SERVED_DEALS_QUERY))
+            alerts = runner.fetch_alerts(scoring)
+            html = render_dashboard(alerts, runner.fetch_deal_aggregates(scoring),
+                                    rollups=runner.fetch_rollups(scoring), charts=runner.fetch_chart_data(scoring),
+                                    leaderboards=runner.fetch_leaderboards(scoring))
+            scoring.close()
+
+            cursor = self.con.cursor()
+            cursor.register('scored_deals', deals)
+            cursor.register('scored_alerts', alerts)
+            cursor.execute("BEGIN TRANSACTION")
+            cursor.execute("CREATE OR REPLACE TABLE served_deals AS SELECT * FROM scored_deals")
+            cursor.execute("CREATE OR REPLACE TABLE served_alerts AS SELECT * FROM scored_alerts")
+            cursor.execute("COMMIT")
+            cursor.close()
+
+            self.html = html
+            self.version += 1
+            self.cache.clear()
+            return deals.num_rows, alerts.num_rows
+
+    def cursor(self):
+        if not hasattr(self.local, 'cursor'):
+            self.local.cursor = self.con.cursor()
+        return self.local.cursor
+
+    def rows(self, query, params=()):
+        return runner.fetch_arrow(self.cursor().execute(query, params)).to_pylist()
+
+    def scalar(self, query, params=()):
+        return self.cursor().execute(query, params).fetchone()[0]
+
+
+def filter_clause(query, columns=FILTERS):
+    """WHERE clause and parameters for the owner/stage/risk_level filters; repeat a filter to match any value"""
+    conditions, params = [], []
+    for name, column in columns.items():
+        values = query.get(name)
+        if values:
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), params
+
+
+def int_param(query, name, default, low, high):
+    value = query.get(name, [default])[-1]
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{name} must be an integer")
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def alerts_page(data, query):
+    where, params = filter_clause(query)
+    page = int_param(query, 'page', 1, 1, 10**9)
+    page_size = int_param(query, 'page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    total = data.scalar(f"SELECT COUNT(*) FROM served_alerts {where}", params)
+    alerts = data.rows(ALERTS_PAGE_QUERY.format(where=where), params + [page_size, (page - 1) * page_size])
+    return {'total': total, 'page': page, 'page_size': page_size, 'alerts': alerts}
+
+
+def summary(data, query):
+    where, params = filter_clause(query)
+    return {'risk_levels': data.rows(SUMMARY_QUERY.format(where=where), params)}
+
+
+def deal(data, deal_id):
+    rows = data.rows(DEAL_QUERY, [deal_id])
+    return rows[0] if rows else None
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """GET / and /api/* (answered from the response cache when possible), POST /api/rescore"""
+
+    server_version = 'PipelineHealthChecker'
+
+    def do_GET(self):
+        data = self.server.data
+        url = urlsplit(self.path)
+        query = tuple(sorted((name, tuple(values)) for name, values in parse_qs(url.query).items()))
+        key = (data.version, url.path, query)
+
+        try:
+            entry = data.cache.get_or_build(key, lambda: self.build(data, url))
+        except BadRequest as e:
+            return self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+        if entry is None:
+            return self.send_json({'error': f"not found: {url.path}"}, HTTPStatus.NOT_FOUND)
+
+        etag, body, content_type = entry
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_body(body, content_type, etag=etag)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/api/rescore':
+            return self.send_json({'error': f"not found: {self.path}"}, HTTPStatus.NOT_FOUND)
+        started = time.perf_counter()
+        try:
+            deals, alerts = self.server.data.rescore()
+        except Exception as e:
+            # The last good snapshot keeps serving; report why this one failed
+            self.log_error("rescore failed: %s", e)
+            return self.send_json({'error': f"rescore failed: {e}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+        self.send_json({'version': self.server.data.version, 'deals': deals, 'alerts': alerts,
+                        'seconds': round(time.perf_counter() - started, 3)})
+
+    def build(self, data, url):
+        """(etag, body, content type) for a GET, or None when nothing is at that path"""
+        query = parse_qs(url.query)
+        if url.path in ('/', '/index.html'):
+            return self.entry(data.html.encode(), 'text/html; charset=utf-8')
+        if url.path == '/api/alerts':
+            payload = alerts_page(data, query)
+        elif url.path == '/api/summary':
+            payload = summary(data, query)
+        elif url.path.startswith('/api/deals/'):
+            payload = deal(data, unquote(url.path[len('/api/deals/'):]))
+            if payload is None:
+                return None
+        else:
+            return None
+        return self.entry(json.dumps(payload, default=str).encode(), 'application/json')
+
+    @staticmethod
+    def entry(body, content_type):
+        return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body, content_type
+
+    def send_json(self, payload, status=HTTPStatus.OK):
+        self.send_body(json.dumps(payload, default=str).encode(), 'application/json', status)
+
+    def send_body(self, body, content_type, status=HTTPStatus.OK, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            # Clients keep the body but revalidate, so a rescore shows up on the next request
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """HTTP server that hands each connection to a fixed pool of worker threads instead of a new thread"""
+
+    # Connections wait in the listen backlog while every worker is busy; the
+    # socketserver default of 5 resets them under a burst
+    request_queue_size = 1024
+
+    def __init__(self, address, handler, data, workers=DEFAULT_WORKERS):
+        super().__init__(address, handler)
+        self.data = data
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV or Parquet)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Request handler threads')
+    parser.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help='Responses kept in the LRU cache')
+    args = parser.parse_args()
+
+    data = DashboardData(args.input, args.cache_entries)
+    started = time.perf_counter()
+    deals, alerts = data.rescore()
+    print(f"✅ Scored {deals} deals ({alerts} flagged) in {time.perf_counter() - started:.2f}s")
+
+    server = PooledHTTPServer((args.host, args.port), DashboardHandler, data, args.workers)
+    print(f"📈 Serving dashboard on http://{args.host}:{args.port}/ ({args.workers} workers)")
+    print("   GET /api/alerts?owner=&stage=&risk_level=&page=&page_size=, /api/summary, /api/deals/<id>")
+    print("   POST /api/rescore to re-score the input")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Stage velocity from StageName history: per-deal time in each stage, stage
+regressions, cycle time and cohort conversion
+
+Reads OpportunityFieldHistory-style logs (OpportunityId, Field, OldValue,
+NewValue, CreatedDate), as written by generate_salesforce_data.py --history.
+Each step is a DuckDB query that writes Parquet. The intervals are split into
+buckets by a hash of the deal Id, and the per-deal steps run one bucket at a
+time; together with DuckDB spilling to disk past its memory limit, this keeps
+logs far larger than memory (100M+ transitions) in bounded memory.
+"""
+
+import argparse
+import math
+import shutil
+import time
+from pathlib import Path
+
+import pipeline_runner as runner
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / 'exports' / 'velocity'
+DEFAULT_SPILL_DIR = PROJECT_ROOT / '.cache' / 'spill'
+
+CLOSED_STAGES = ('Closed Won', 'Closed Lost')
+CHECKPOINT_DAYS = (30, 60, 90, 180, 365)
+
+# Per-deal steps run on buckets of deals holding about this many transitions
+EVENTS_PER_BUCKET = 10_000_000
+
+# Open stages in benchmark order, closed stages after them
+STAGE_ORDER_QUERY = f"""
+CREATE OR REPLACE TEMP TABLE stage_order AS
+SELECT stage_name, sequence_order FROM stage_benchmarks
+UNION ALL
+SELECT stage_name, 1000 FROM (VALUES {', '.join(f'({runner.sql_literal(s)})' for s in CLOSED_STAGES)}) t(stage_name)
+"""
+
+# One row per stage visit: when the deal entered and left it, and where it went
+INTERVALS_QUERY = """
+WITH visits AS (
+    SELECT
+        "OpportunityId" AS opportunity_id,
+        "NewValue" AS stage_name,
+        CAST("CreatedDate" AS TIMESTAMP) AS entered_at,
+        LEAD(CAST("CreatedDate" AS TIMESTAMP)) OVER w AS exited_at,
+        LEAD("NewValue") OVER w AS next_stage,
+        FIRST_VALUE(CAST("CreatedDate" AS TIMESTAMP)) OVER w AS created_at,
+        ROW_NUMBER() OVER w AS visit_number
+    FROM {source}
+    WHERE "Field" = 'StageName'
+    WINDOW w AS (PARTITION BY "OpportunityId" ORDER BY "CreatedDate")
+)
+SELECT
+    v.*,
+    CASE WHEN v.stage_name NOT IN ({closed})
+         THEN date_diff('second', v.entered_at, COALESCE(v.exited_at, {as_of})) / 86400.0
+    END AS days,
+    CASE
+        WHEN v.exited_at IS NULL THEN NULL
+        WHEN v.next_stage = 'Closed Lost' THEN 'lost'
+        WHEN v.next_stage = 'Closed Won' THEN 'won'
+        WHEN nxt.sequence_order < cur.sequence_order THEN 'regressed'
+        ELSE 'advanced'
+    END AS exit_type,
+    hash(v.opportunity_id) % {buckets} AS bucket
+FROM visits v
+LEFT JOIN stage_order cur ON v.stage_name = cur.stage_name
+LEFT JOIN stage_order nxt ON v.next_stage = nxt.stage_name
+"""
+
+# Total time per deal and stage, across repeat visits after regressions
+DEAL_STAGE_DURATIONS_QUERY = """
+SELECT
+    opportunity_id,
+    stage_name,
+    ANY_VALUE(created_at) AS created_at,
+    COUNT(*) AS visits,
+    SUM(days) AS days_in_stage,
+    BOOL_OR(exited_at IS NULL AND stage_name NOT IN ({closed})) AS is_current,
+    COUNT(*) FILTER (WHERE exit_type = 'regressed') AS regressions
+FROM {intervals}
+GROUP BY opportunity_id, stage_name
+"""
+
+STAGE_VELOCITY_QUERY = """
+WITH exits AS (
+    SELECT
+        stage_name,
+        COUNT(exit_type) AS exits,
+        COUNT(*) FILTER (WHERE exit_type IN ('advanced', 'won')) AS advanced,
+        COUNT(*) FILTER (WHERE exit_type = 'regressed') AS regressed,
+        COUNT(*) FILTER (WHERE exit_type = 'lost') AS lost
+    FROM {intervals}
+    GROUP BY stage_name
+),
+durations AS (
+    SELECT
+        stage_name,
+        COUNT(*) AS deals,
+        COUNT(*) FILTER (WHERE is_current) AS open_deals,
+        APPROX_QUANTILE(days_in_stage, 0.5) FILTER (WHERE NOT is_current) AS median_days,
+        APPROX_QUANTILE(days_in_stage, 0.9) FILTER (WHERE NOT is_current) AS p90_days,
+        AVG(visits) AS avg_visits,
+        AVG(CAST(regressions > 0 AS INTEGER)) AS regression_rate
+    FROM {durations}
+    GROUP BY stage_name
+)
+SELECT
+    d.*,
+    e.exits,
+    e.advanced / NULLIF(e.exits, 0) AS advance_rate,
+    e.regressed / NULLIF(e.exits, 0) AS regress_rate,
+    e.lost / NULLIF(e.exits, 0) AS loss_rate
+FROM durations d
+JOIN exits e USING (stage_name)
+JOIN stage_order o USING (stage_name)
+WHERE d.stage_name NOT IN ({closed})
+ORDER BY o.sequence_order
+"""
+
+# Days from creation to close, by outcome
+CYCLE_TIME_QUERY = """
+SELECT
+    stage_name AS outcome,
+    COUNT(*) AS deals,
+    APPROX_QUANTILE(date_diff('second', created_at, entered_at) / 86400.0, 0.5) AS median_days,
+    APPROX_QUANTILE(date_diff('second', created_at, entered_at) / 86400.0, 0.9) AS p90_days
+FROM {intervals}
+WHERE stage_name IN ({closed})
+GROUP BY stage_name
+ORDER BY stage_name DESC
+"""
+
+# Share of each monthly creation cohort that ever reached each stage
+COHORT_CONVERSION_QUERY = """
+WITH reached AS (
+    SELECT date_trunc('month', created_at) AS cohort, stage_name, COUNT(*) AS deals_reached
+    FROM {durations}
+    GROUP BY ALL
+),
+cohorts AS (
+    SELECT date_trunc('month', created_at) AS cohort, COUNT(*) AS cohort_deals
+    FROM {intervals}
+    WHERE visit_number = 1
+    GROUP BY ALL
+)
+SELECT r.cohort, r.stage_name, r.deals_reached, c.cohort_deals, r.deals_reached / c.cohort_deals AS reach_rate
+FROM reached r
+JOIN cohorts c USING (cohort)
+JOIN stage_order o USING (stage_name)
+ORDER BY r.cohort, o.sequence_order
+"""
+
+# Where each cohort's deals stood N days after creation: the stage visit in
+# force at that moment. Visits carry their exit time, so this is an equi-join
+# on the deal with a range filter, which measured ~3x faster than the
+# equivalent ASOF JOIN on entered_at. Checkpoints after the as-of date haven't
+# happened yet and are left out.
+COHORT_PROGRESS_QUERY = """
+WITH checkpoints AS (
+    SELECT
+        opportunity_id,
+        date_trunc('month', created_at) AS cohort,
+        age_days,
+        created_at + to_days(age_days) AS checked_at
+    FROM {intervals}, (SELECT UNNEST({checkpoint_days}) AS age_days)
+    WHERE visit_number = 1 AND created_at + to_days(age_days) <= {as_of}
+)
+SELECT
+    c.cohort,
+    c.age_days,
+    COUNT(*) AS deals,
+    COUNT(*) FILTER (WHERE i.stage_name = 'Closed Won') AS won,
+    COUNT(*) FILTER (WHERE i.stage_name = 'Closed Lost') AS lost
+FROM checkpoints c
+JOIN {intervals} i
+  ON c.opportunity_id = i.opportunity_id
+ AND c.checked_at >= i.entered_at
+ AND (c.checked_at < i.exited_at OR i.exited_at IS NULL)
+GROUP BY ALL
+"""
+
+COHORT_PROGRESS_RATES_QUERY = """
+SELECT
+    cohort,
+    age_days,
+    CAST(SUM(deals) AS BIGINT) AS deals,
+    SUM(won) / SUM(deals) AS won_rate,
+    SUM(lost) / SUM(deals) AS lost_rate,
+    1 - (SUM(won) + SUM(lost)) / SUM(deals) AS open_rate
+FROM cohort_progress_counts
+GROUP BY ALL
+ORDER BY cohort, age_days
+"""
+
+
+def configure(con, spill_dir=DEFAULT_SPILL_DIR, memory_limit=None):
+    """Let DuckDB spill to spill_dir once it reaches memory_limit
+
+    Insertion order stays preserved: without it, COPY from a spilled
+    aggregate buffered its output and ran out of memory.
+    """
+    Path(spill_dir).mkdir(parents=True, exist_ok=True)
+    con.execute(f"SET temp_directory = {runner.sql_literal(Path(spill_dir).as_posix())}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = {runner.sql_literal(memory_limit)}")
+
+
+def history_scan(paths):
+    """Table function call over one or more history files (CSV or Parquet, globs allowed)"""
+    paths = [Path(p).as_posix() for p in paths]
+    if all(p.endswith('.parquet') for p in paths):
+        return f"read_parquet([{', '.join(runner.sql_literal(p) for p in paths)}])"
+    return f"read_csv([{', '.join(runner.sql_literal(p) for p in paths)}], header = true)"
+
+
+def copy_to(con, query, path):
+    con.execute(f"COPY ({query}) TO {runner.sql_literal(Path(path).as_posix())} (FORMAT PARQUET)")
+    return runner.source_scan(path)
+
+
+def bucket_scan(directory, bucket='*'):
+    """read_parquet call over one bucket of a bucketed table, or all of them"""
+    return f"read_parquet({runner.sql_literal((Path(directory) / f'bucket={bucket}' / '*.parquet').as_posix())})"
+
+
+def analyze(con, history, output_dir=DEFAULT_OUTPUT_DIR, as_of=None, checkpoint_days=CHECKPOINT_DAYS,
+            events_per_bucket=EVENTS_PER_BUCKET):
+    """Write the velocity tables to output_dir as Parquet; return {table: path}
+
+    One windowed pass over the log writes the stage visit intervals, split
+    into buckets of deals by Id hash. Per-deal work (durations, checkpoints)
+    then runs one bucket at a time, so each step holds at most a bucket's
+    deals however long the log is. The summaries have few groups and read
+    every bucket at once.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    source = history_scan(history if isinstance(history, (list, tuple)) else [history])
+
+    runner.create_reference_tables(con)
+    con.execute(STAGE_ORDER_QUERY)
+    events, last_event = con.execute(
+        f'SELECT COUNT(*), MAX(CAST("CreatedDate" AS TIMESTAMP)) FROM {source}'
+    ).fetchone()
+    as_of = f"TIMESTAMP {runner.sql_literal(str(as_of or last_event))}"
+    buckets = max(1, math.ceil(events / events_per_bucket))
+    closed = ', '.join(runner.sql_literal(s) for s in CLOSED_STAGES)
+
+    paths = {name: output_dir / name for name in ('stage_intervals', 'deal_stage_durations')}
+    paths.update({name: output_dir / f'{name}.parquet' for name in
+                  ('stage_velocity', 'cycle_time', 'cohort_conversion', 'cohort_progress')})
+    for name in ('stage_intervals', 'deal_stage_durations'):
+        shutil.rmtree(paths[name], ignore_errors=True)
+
+    con.execute(
+        f"COPY ({INTERVALS_QUERY.format(source=source, closed=closed, as_of=as_of, buckets=buckets)}) "
+        f"TO {runner.sql_literal(paths['stage_intervals'].as_posix())} (FORMAT PARQUET, PARTITION_BY (bucket))"
+    )
+
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE cohort_progress_counts
+            (cohort TIMESTAMP, age_days INTEGER, deals BIGINT, won BIGINT, lost BIGINT)
+    """)
+    for bucket_dir in sorted(paths['stage_intervals'].glob('bucket=*')):
+        bucket = bucket_dir.name.split('=', 1)[1]
+        intervals = bucket_scan(paths['stage_intervals'], bucket)
+        target = paths['deal_stage_durations'] / bucket_dir.name
+        target.mkdir(parents=True)
+        copy_to(con, DEAL_STAGE_DURATIONS_QUERY.format(intervals=intervals, closed=closed), target / 'data_0.parquet')
+        con.execute("INSERT INTO cohort_progress_counts " + COHORT_PROGRESS_QUERY.format(
+            intervals=intervals, as_of=as_of, checkpoint_days=list(checkpoint_days)
+        ))
+
+    intervals = bucket_scan(paths['stage_intervals'])
+    durations = bucket_scan(paths['deal_stage_durations'])
+    copy_to(con, STAGE_VELOCITY_QUERY.format(intervals=intervals, durations=durations, closed=closed),
+            paths['stage_velocity'])
+    copy_to(con, CYCLE_TIME_QUERY.format(intervals=intervals, closed=closed), paths['cycle_time'])
+    copy_to(con, COHORT_CONVERSION_QUERY.format(intervals=intervals, durations=durations), paths['cohort_conversion'])
+    copy_to(con, COHORT_PROGRESS_RATES_QUERY, paths['cohort_progress'])
+    return paths
+
+
+def print_summary(con, paths, recent_cohorts=6):
+    velocity = con.execute(f"SELECT * FROM {runner.source_scan(paths['stage_velocity'])}").fetchall()
+    print("\n📈 STAGE VELOCITY (days in stage per deal, across repeat visits)")
+    print(f"   {'Stage':<22} {'Deals':>10} {'Median':>7} {'P90':>7} {'Advance':>8} {'Regress':>8} {'Lost':>7}")
+    for stage, deals, _, median, p90, _, _, _, advance, regress, lost in velocity:
+        print(f"   {stage:<22} {deals:>10,} {median or 0:>7.1f} {p90 or 0:>7.1f} "
+              f"{advance or 0:>8.1%} {regress or 0:>8.1%} {lost or 0:>7.1%}")
+
+    print("\n⏱️  CYCLE TIME (days from creation to close)")
+    for outcome, deals, median, p90 in con.execute(f"SELECT * FROM {runner.source_scan(paths['cycle_time'])}").fetchall():
+        print(f"   {outcome:<22} {deals:>10,} deals  median {median:>6.1f}  p90 {p90:>6.1f}")
+
+    progress = con.execute(f"""
+        SELECT strftime(cohort, '%Y-%m'), age_days, deals, won_rate
+        FROM {runner.source_scan(paths['cohort_progress'])}
+        WHERE cohort IN (
+            SELECT DISTINCT cohort FROM {runner.source_scan(paths['cohort_progress'])}
+            WHERE age_days = 90 ORDER BY cohort DESC LIMIT {recent_cohorts}
+        )
+        ORDER BY cohort, age_days
+    """).fetchall()
+    print("\n🎯 COHORT WIN RATE BY DEAL AGE (latest cohorts with 90 days of history)")
+    by_cohort = {}
+    for cohort, age, _, won_rate in progress:
+        by_cohort.setdefault(cohort, {})[age] = won_rate
+    ages = sorted({age for _, age, _, _ in progress})
+    print(f"   {'Cohort':<10} " + ' '.join(f"{f'{age}d':>7}" for age in ages))
+    for cohort, rates in by_cohort.items():
+        print(f"   {cohort:<10} " + ' '.join(f"{rates[a]:>7.1%}" if a in rates else f"{'':>7}" for a in ages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('history', nargs='+', type=Path, help='Stage history files (CSV or Parquet)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT_DIR, help='Directory for the Parquet tables')
+    parser.add_argument('--as-of', help='Timestamp open stages are measured to (default: last event in the log)')
+    parser.add_argument('--memory-limit', help="DuckDB memory limit, e.g. '2GB'; the rest spills to --spill-dir")
+    parser.add_argument('--spill-dir', type=Path, default=DEFAULT_SPILL_DIR)
+    args = parser.parse_args()
+
+    con = runner.connect()
+    configure(con, args.spill_dir, args.memory_limit)
+    started = time.perf_counter()
+    paths = analyze(con, args.history, args.output, args.as_of)
+    print_summary(con, paths)
+    print(f"\n💾 Saved to: {args.output} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
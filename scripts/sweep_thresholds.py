@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Threshold sweep: rank alternative scoring thresholds by how well they predict
+Closed Lost outcomes
+
+Closed deals are snapshotted at close, so their in-flight signals (days in
+stage, activity gap, close date) are gone. The sweep therefore scores an
+earlier export of open deals as of the day it was taken, labels each deal with
+its outcome from a later export, and evaluates every threshold combination on
+those labelled deals at once with broadcasted array arithmetic.
+"""
+
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from datetime import date
+from pathlib import Path
+
+import pipeline_runner as runner
+
+# Candidate values per threshold, paired as (lower cut, upper cut). The
+# current final_analysis_full.sql values are among them.
+STAGE_CUTS = [1.0, 1.25, 1.5, 2.0, 2.5, 3.0]      # x benchmark max days: 1 pt / 2 pts
+ACTIVITY_CUTS = [3, 5, 7, 10, 14, 21, 30]         # days since activity: 1 pt / 2 pts
+CLOSE_CUTS = [3, 7, 14, 21, 29, 45, 60]           # days to close: 2 pts below / 1 pt up to
+LEVEL_CUTOFFS = [2, 3, 4, 5, 6]                   # flag as at risk above this score
+
+CURRENT = {'stage_low': 1.0, 'stage_high': 2.0, 'activity_low': 7, 'activity_high': 14,
+           'close_low': 7, 'close_high': 29, 'cutoff': 3}
+
+# A missing activity or close date falls through to the SQL CASE's ELSE branch
+# (2 points for activity, 0 for close date); a day count beyond every cut
+# scores the same way
+MISSING_DAYS = np.iinfo('int32').max
+
+# Deals scored block by block so the (configs x deals) score tensor stays small
+BLOCK_DEALS = 2048
+
+# Raw signal inputs from a scored snapshot, labelled by a later outcome
+LABELLED_DEALS_QUERY = """
+SELECT
+    r.id,
+    CAST(r.days_in_stage AS FLOAT) / r.benchmark_max AS stage_ratio,
+    r.days_since_activity,
+    r.days_to_close,
+    r.missing_fields_score + r.competitor_score + r.next_step_score AS fixed_score,
+    o."StageName" = 'Closed Lost' AS lost,
+    COALESCE(o."Loss_Reason__c", '') AS loss_reason
+FROM risk_analysis r
+JOIN {outcomes} o ON r.id = o."Id"
+WHERE o."StageName" IN ('Closed Won', 'Closed Lost')
+"""
+
+
+def day_counts(deals, column):
+    """int32 day counts with NULLs (no activity or close date) replaced by MISSING_DAYS"""
+    return deals[column].fillna(MISSING_DAYS).to_numpy('int32')
+
+
+def pairs(cuts):
+    return [(low, high) for low, high in itertools.combinations(cuts, 2)]
+
+
+def stage_points(ratio, stage_pairs):
+    """(pairs, deals) points for time in stage; a missing benchmark scores 2 as in SQL"""
+    low = np.array([p[0] for p in stage_pairs])[:, None]
+    high = np.array([p[1] for p in stage_pairs])[:, None]
+    points = (ratio > low).astype('int8') + (ratio > high)
+    return np.where(np.isnan(ratio), np.int8(2), points)
+
+
+def activity_points(days, activity_pairs):
+    low = np.array([p[0] for p in activity_pairs])[:, None]
+    high = np.array([p[1] for p in activity_pairs])[:, None]
+    return (days > low).astype('int8') + (days > high)
+
+
+def close_points(days, close_pairs):
+    low = np.array([p[0] for p in close_pairs])[:, None]
+    high = np.array([p[1] for p in close_pairs])[:, None]
+    return np.where(days < low, np.int8(2), (days <= high).astype('int8'))
+
+
+def sweep(deals, block_deals=BLOCK_DEALS):
+    """Confusion counts for every threshold combination, one row per configuration
+
+    Per block of deals, each signal's points are computed once per candidate
+    pair, then broadcast to a (stage, activity, close, deals) score tensor;
+    each level cutoff turns it into predictions that are summed against the
+    Closed Lost labels.
+    """
+    stage_pairs, activity_pairs, close_pairs = pairs(STAGE_CUTS), pairs(ACTIVITY_CUTS), pairs(CLOSE_CUTS)
+    cutoffs = np.array(LEVEL_CUTOFFS)
+    shape = (len(stage_pairs), len(activity_pairs), len(close_pairs), len(cutoffs))
+    true_pos = np.zeros(shape, dtype='int64')
+    flagged = np.zeros(shape, dtype='int64')
+
+    ratio = deals['stage_ratio'].to_numpy('float32')
+    activity = day_counts(deals, 'days_since_activity')
+    close = day_counts(deals, 'days_to_close')
+    fixed = deals['fixed_score'].to_numpy('int8')
+    lost = deals['lost'].to_numpy(bool)
+
+    for start in range(0, len(deals), block_deals):
+        block = slice(start, start + block_deals)
+        score = (
+            stage_points(ratio[block], stage_pairs)[:, None, None, :]
+            + activity_points(activity[block], activity_pairs)[None, :, None, :]
+            + close_points(close[block], close_pairs)[None, None, :, :]
+            + fixed[block]
+        )
+        for i, cutoff in enumerate(cutoffs):
+            predicted = score > cutoff
+            flagged[..., i] += predicted.sum(axis=-1)
+            true_pos[..., i] += predicted[..., lost[block]].sum(axis=-1)
+
+    # Same C order as the count arrays, so ravel() lines up row for row
+    results = pd.DataFrame(
+        [(*stage, *activity, *close, cutoff)
+         for stage, activity, close, cutoff in itertools.product(stage_pairs, activity_pairs, close_pairs, cutoffs)],
+        columns=list(CURRENT),
+    )
+    results['flagged'] = flagged.ravel()
+    results['true_positives'] = true_pos.ravel()
+    losses = int(lost.sum())
+    results['precision'] = results['true_positives'] / results['flagged'].where(results['flagged'] > 0)
+    results['recall'] = results['true_positives'] / losses if losses else np.nan
+    results['f1'] = 2 * results['precision'] * results['recall'] / (results['precision'] + results['recall'])
+    return results
+
+
+def is_current(results):
+    return np.logical_and.reduce([results[column] == value for column, value in CURRENT.items()])
+
+
+def recall_by_reason(deals, config):
+    """Share of each loss reason the configuration would have flagged"""
+    score = (
+        stage_points(deals['stage_ratio'].to_numpy('float32'), [(config['stage_low'], config['stage_high'])])[0]
+        + activity_points(day_counts(deals, 'days_since_activity'), [(config['activity_low'], config['activity_high'])])[0]
+        + close_points(day_counts(deals, 'days_to_close'), [(config['close_low'], config['close_high'])])[0]
+        + deals['fixed_score'].to_numpy()
+    )
+    lost = deals[deals['lost']].assign(flagged=score[deals['lost'].to_numpy()] > config['cutoff'])
+    return lost.groupby('loss_reason')['flagged'].agg(['mean', 'size'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('snapshot', type=Path, help='Earlier opportunity export (deals still open)')
+    parser.add_argument('--as-of', required=True, type=date.fromisoformat,
+                        help='Date the snapshot was taken (YYYY-MM-DD)')
+    parser.add_argument('--outcomes', type=Path, default=runner.DEFAULT_INPUT,
+                        help='Later export holding the Closed Won / Closed Lost outcomes')
+    parser.add_argument('--rank-by', choices=['f1', 'precision', 'recall'], default='f1')
+    parser.add_argument('--min-recall', type=float, default=0.0, help='Ignore configurations below this recall')
+    parser.add_argument('--top', type=int, default=10, help='Configurations to print')
+    parser.add_argument('--output', type=Path, help='Also write the ranked configurations as CSV')
+    args = parser.parse_args()
+
+    con = runner.connect()
+    runner.score(con, args.snapshot, analysis_date=args.as_of)
+    deals = runner.fetch_arrow(con.execute(
+        LABELLED_DEALS_QUERY.format(outcomes=runner.source_scan(args.outcomes))
+    )).to_pandas()
+    if deals.empty:
+        parser.error("no snapshot deals have a Closed Won / Closed Lost outcome in --outcomes")
+
+    results = sweep(deals)
+    ranked = results[results['recall'] >= args.min_recall].sort_values(
+        [args.rank_by, 'precision', 'recall'], ascending=False
+    )
+    ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+
+    print(f"\n🎯 THRESHOLD SWEEP: {len(results):,} configurations x {len(deals):,} closed deals "
+          f"({int(deals['lost'].sum())} lost)")
+    columns = ['rank'] + list(CURRENT) + ['flagged', 'precision', 'recall', 'f1']
+    print(ranked[columns].head(args.top).to_string(index=False, float_format='{:.3f}'.format))
+
+    current = results[is_current(results)].iloc[0]
+    current_rank = ranked.loc[is_current(ranked), 'rank']
+    rank = f"#{current_rank.iloc[0]}" if len(current_rank) else 'below --min-recall'
+    print(f"\n   Current thresholds ({rank}): precision {current['precision']:.3f}, "
+          f"recall {current['recall']:.3f}, f1 {current['f1']:.3f}")
+
+    if not ranked.empty:
+        print("\n   Losses flagged by the top configuration, by Loss_Reason__c:")
+        for reason, row in recall_by_reason(deals, ranked.iloc[0]).iterrows():
+            print(f"   {reason or '(none)':<40} {row['mean']:>6.0%} of {int(row['size'])}")
+
+    if args.output:
+        ranked.to_csv(args.output, index=False)
+        print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Ingest validation: load an opportunity export into Parquet, moving rows that
+fail type, date, stage, security-status or duplicate-Id checks to a quarantine
+file with the reasons they failed
+"""
+
+import argparse
+import csv
+import os
+import time
+from pathlib import Path
+
+import duckdb
+
+import pipeline_runner as runner
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_OUTPUT = PROJECT_ROOT / 'exports' / 'opportunities.parquet'
+DEFAULT_QUARANTINE = PROJECT_ROOT / 'exports' / 'quarantine.csv'
+
+# Columns the scoring SQL and the checks below read; an export missing any of
+# them is refused before anything is loaded
+REQUIRED_COLUMNS = (
+    'Id', 'Name', 'Account.Name', 'Owner.Name', 'Amount', 'StageName', 'Probability', 'CloseDate', 'CreatedDate',
+    'LastActivityDate', 'LastStageChangeDate', 'NextStep', 'Economic_Buyer__c', 'Technical_Champion__c',
+    'Security_Review_Status__c', 'Competitor__c',
+)
+
+# Parsed at read time; a value that doesn't parse rejects its row. Every other
+# column stays text so the sniffer can't guess a type a later row breaks.
+COLUMN_TYPES = {
+    'Amount': 'DECIMAL(12,2)',
+    'Probability': 'INTEGER',
+    'CloseDate': 'DATE',
+    'CreatedDate': 'DATE',
+    'LastActivityDate': 'DATE',
+    'LastStageChangeDate': 'DATE',
+}
+DATE_RANGE = ("DATE '2000-01-01'", "DATE '2100-12-31'")
+CLOSED_STAGES = ('Closed Won', 'Closed Lost')
+SECURITY_STATUSES = ('Not Started', 'In Progress', 'Complete')
+
+
+def failed_checks(stage_names):
+    """(condition, reason) pairs; a row fails a check when its condition is true
+
+    Conditions on a missing value are NULL and so pass; missing values that
+    matter have their own checks. stage_names are the stage_benchmarks stages,
+    written out as literals so Parquet statistics can rule a check out.
+    """
+    known_stages = ", ".join(runner.sql_literal(s) for s in [*stage_names, *CLOSED_STAGES])
+    checks = [
+        ('"Id" IS NULL', 'missing Id'),
+        ('"CloseDate" IS NULL', 'missing CloseDate'),
+        ('"Amount" < 0', 'negative Amount'),
+        ('"Probability" NOT BETWEEN 0 AND 100', 'Probability outside 0-100'),
+    ]
+    checks += [
+        (f'"{column}" NOT BETWEEN {DATE_RANGE[0]} AND {DATE_RANGE[1]}', f'{column} out of range')
+        for column, column_type in COLUMN_TYPES.items() if column_type == 'DATE'
+    ]
+    checks += [
+        ('"CloseDate" < "CreatedDate"', 'CloseDate before CreatedDate'),
+        ('"LastActivityDate" < "CreatedDate"', 'LastActivityDate before CreatedDate'),
+        (f'"StageName" IS NULL OR "StageName" NOT IN ({known_stages})', 'unknown StageName'),
+        (f'"Security_Review_Status__c" NOT IN ({", ".join(runner.sql_literal(s) for s in SECURITY_STATUSES)})',
+         'unknown Security_Review_Status__c'),
+    ]
+    return checks
+
+
+def failure_probe_query(source, checks):
+    """One row per check some row of source fails, plus one if an Id repeats
+
+    Each check is its own filtered scan stopping at the first match, so
+    Parquet min/max statistics skip the row groups that cannot fail it, and a
+    clean export costs little more than grouping its Ids. Ids are grouped by
+    hash; a collision only costs the exact pass over the rows.
+    """
+    probes = [f"(SELECT {runner.sql_literal(reason)} FROM {source} WHERE {condition} LIMIT 1)"
+              for condition, reason in checks]
+    probes.append(f"""(SELECT 'duplicate Id' FROM {source} WHERE "Id" IS NOT NULL """
+                  f"""GROUP BY hash("Id") HAVING COUNT(*) > 1 LIMIT 1)""")
+    return ' UNION ALL '.join(probes)
+
+
+def rejected_rows_query(source, checks):
+    """Rows of source failing any of checks or sharing an Id, with their reasons
+
+    The checks run as one filter over the typed columns, so reason strings are
+    only built for the rows it keeps.
+    """
+    reasons = ', '.join(f"CASE WHEN {condition} THEN {runner.sql_literal(reason)} END" for condition, reason in checks)
+    return f"""
+        SELECT *, concat_ws('; ', {reasons},
+                            CASE WHEN "Id" IN (SELECT "Id" FROM duplicate_ids) THEN 'duplicate Id' END) AS _reasons
+        FROM {source}
+        WHERE {' OR '.join(f'({condition})' for condition, _ in checks)}
+           OR "Id" IN (SELECT "Id" FROM duplicate_ids)
+    """
+
+
+# Rows the reader couldn't parse, one per line however many of its values failed
+PARSE_ERRORS_QUERY = """
+SELECT
+    string_agg(
+        CASE WHEN error_type = 'CAST' THEN column_name || ' could not be parsed' ELSE lower(error_type) END,
+        '; ' ORDER BY column_idx
+    ) AS _reasons,
+    any_value(csv_line) AS _raw_line
+FROM ingest_reject_errors
+GROUP BY line
+ORDER BY line
+"""
+
+
+def csv_scan(input_path, store_rejects=True):
+    """read_csv call that types COLUMN_TYPES and reads everything else as text
+
+    With store_rejects, lines that fail to parse are set aside in
+    ingest_reject_errors; without it the first such line raises. Raises
+    ValueError naming the missing columns when the header lacks any of
+    REQUIRED_COLUMNS.
+    """
+    with open(input_path, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), [])
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"{input_path} is missing required column(s): {', '.join(missing)}")
+    types = ', '.join(
+        f"{runner.sql_literal(name)}: {runner.sql_literal(COLUMN_TYPES.get(name, 'VARCHAR'))}" for name in header
+    )
+    scan = f"read_csv({runner.sql_literal(Path(input_path).as_posix())}, header = true, types = {{{types}}}"
+    if store_rejects:
+        scan += ", store_rejects = true, rejects_table = 'ingest_reject_errors', rejects_scan = 'ingest_reject_scans'"
+    return scan + ")"
+
+
+def validate(con, input_path, output=DEFAULT_OUTPUT, quarantine=DEFAULT_QUARANTINE):
+    """Write valid rows to output and rejected rows to quarantine; return (valid, rejected) counts
+
+    The export is parsed and written once, as it would be without validation.
+    Only if a line fails to parse is it read again with the reader setting
+    such lines aside, since tracking rejects slows every read. The remaining
+    checks then probe the written Parquet (see failure_probe_query). Only when
+    something fails are the reasons worked out and the output rewritten
+    without those rows. Every copy of a duplicated Id is rejected, since
+    there's no telling which one is right.
+    Output files are written under temporary names and renamed into place, so
+    a reader never sees a partial file.
+    """
+    output, quarantine = Path(output), Path(quarantine)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    quarantine.parent.mkdir(parents=True, exist_ok=True)
+    loaded = output.with_name(f".{output.stem}.{os.getpid()}.loading.parquet")
+
+    def load(scan):
+        con.execute(f"COPY (SELECT * FROM {scan}) TO {runner.sql_literal(loaded.as_posix())} (FORMAT PARQUET)")
+
+    runner.create_reference_tables(con)
+    checks = failed_checks([row[0] for row in con.execute("SELECT stage_name FROM stage_benchmarks").fetchall()])
+    rejected_sources = []
+    try:
+        load(csv_scan(input_path, store_rejects=False))
+    except (duckdb.ConversionException, duckdb.InvalidInputException):
+        load(csv_scan(input_path))
+        con.execute(f"CREATE OR REPLACE TEMP TABLE parse_errors AS {PARSE_ERRORS_QUERY}")
+        rejected_sources.append("SELECT * FROM parse_errors")
+
+    loaded_scan = runner.source_scan(loaded)
+    failures = con.execute(f"SELECT COUNT(*) FROM ({failure_probe_query(loaded_scan, checks)})").fetchone()[0]
+    if failures:
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE duplicate_ids AS
+            SELECT "Id" FROM {loaded_scan} WHERE "Id" IS NOT NULL GROUP BY "Id" HAVING COUNT(*) > 1
+        """)
+        con.execute(f"CREATE OR REPLACE TEMP TABLE rejected_rows AS {rejected_rows_query(loaded_scan, checks)}")
+        rejected_sources.insert(0, "SELECT * FROM rejected_rows")
+
+    if rejected_sources:
+        if failures:
+            # Lines that failed to parse never reached the loaded file, so it
+            # only needs rewriting when the checks failed rows of it too
+            valid_rows = output.with_name(f".{output.stem}.{os.getpid()}.valid.parquet")
+            failed = ' OR '.join(f'({condition})' for condition, _ in checks)
+            con.execute(f"""
+                COPY (
+                    SELECT * FROM {loaded_scan}
+                    WHERE NOT COALESCE({failed}, false) AND "Id" NOT IN (SELECT "Id" FROM duplicate_ids)
+                ) TO {runner.sql_literal(valid_rows.as_posix())} (FORMAT PARQUET)
+            """)
+            valid_rows.replace(output)
+            loaded.unlink()
+        else:
+            loaded.replace(output)
+        con.execute(f"""
+            COPY ({' UNION ALL BY NAME '.join(rejected_sources)})
+            TO {runner.sql_literal(quarantine.as_posix())} (FORMAT CSV, HEADER)
+        """)
+        rejected = con.execute(
+            f"SELECT COUNT(*) FROM ({' UNION ALL BY NAME '.join(rejected_sources)})"
+        ).fetchone()[0]
+    else:
+        loaded.replace(output)
+        quarantine.unlink(missing_ok=True)
+        rejected = 0
+
+    valid = con.execute(f"SELECT COUNT(*) FROM {runner.source_scan(output)}").fetchone()[0]
+    return valid, rejected
+
+
+def validated(input_path, output=DEFAULT_OUTPUT, quarantine=DEFAULT_QUARANTINE):
+    """Validate an export for a script that scores it and return the path of its valid rows
+
+    Parquet input is taken to be validated already (the pipeline's ingest
+    stage writes it) and is returned unchanged.
+    """
+    if Path(input_path).suffix == '.parquet':
+        return Path(input_path)
+    with runner.connect() as con:
+        valid, rejected = validate(con, input_path, output, quarantine)
+    if rejected:
+        print(f"⚠️  Quarantined {rejected} of {valid + rejected} rows: {quarantine}")
+    return Path(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('input', type=Path, nargs='?', default=runner.DEFAULT_INPUT,
+                        help='Salesforce opportunity export (CSV)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='Valid rows (Parquet)')
+    parser.add_argument('--quarantine', type=Path, default=DEFAULT_QUARANTINE,
+                        help='Rejected rows with their reasons (CSV)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        valid, rejected = validate(runner.connect(), args.input, args.output, args.quarantine)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"✅ Validated {valid + rejected} rows in {time.perf_counter() - started:.2f}s: "
+          f"{valid} valid, {rejected} quarantined")
+    if rejected:
+        print(f"   Quarantine: {args.quarantine}")
+
+
+if __name__ == "__main__":
+    main()
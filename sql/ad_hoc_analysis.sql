@@ -2,10 +2,12 @@
 
 
 -- Overview: Total deals, pipeline value, weighted value, avg risk
+-- (risk-adjusted weighting matches scripts/forecast.py: a score of 10 halves the stage probability)
 SELECT
     COUNT(*) AS total_deals,
     '$' || ROUND(SUM(amount) / 1000000.0, 1) || 'M' AS total_pipeline_value,
     '$' || ROUND(SUM(amount * probability / 100.0) / 1000000.0, 1) || 'M' AS weighted_pipeline_value,
+    '$' || ROUND(SUM(amount * probability / 100.0 * (1 - 0.5 * overall_risk_score / 10)) / 1000000.0, 1) || 'M' AS risk_adjusted_value,
     ROUND(AVG(overall_risk_score), 1) AS avg_risk_score
 FROM risk_analysis;
 
@@ -55,13 +57,26 @@ GROUP BY owner_name
 ORDER BY avg_risk_score DESC;
 
 
+-- Overview: Pipeline health up the sales hierarchy (segment → region → manager → rep)
+SELECT
+    rollup_level,
+    COALESCE(owner_name, manager_name, region, segment, 'All') AS team,
+    deals,
+    '$' || ROUND(pipeline_value / 1000000.0, 1) || 'M' AS total_pipeline,
+    at_risk_deals,
+    '$' || ROUND(at_risk_value / 1000000.0, 1) || 'M' AS at_risk_value,
+    ROUND(avg_risk_score, 1) AS avg_risk_score
+FROM team_rollups
+ORDER BY segment NULLS FIRST, region NULLS FIRST, manager_name NULLS FIRST, owner_name NULLS FIRST;
+
+
 -- Overview: Deal velocity and health by stage
 SELECT
     r.stage_name,
     b.max_days AS benchmark_days,
     COUNT(*) AS deal_count,
     ROUND(AVG(r.days_in_stage), 0) AS avg_days_in_stage,
-    ROUND(AVG(r.pct_of_benchmark), 0) AS pct_of_benchmark,
+    ROUND(AVG(r.days_in_stage * 100.0 / NULLIF(r.benchmark_max, 0)), 0) AS pct_of_benchmark,
     SUM(CASE WHEN r.days_in_stage > b.max_days THEN 1 ELSE 0 END) AS deals_over_benchmark,
     '$' || ROUND(SUM(r.amount) / 1000000.0, 1) || 'M' AS stage_value,
     ROUND(AVG(r.overall_risk_score), 1) AS avg_risk_score
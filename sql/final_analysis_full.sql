@@ -40,7 +40,236 @@ INSERT INTO stage_requirements VALUES
     ('EB Sign Off', 'next_step', NULL, 'critical'),
     ('Contract Negotiation', 'next_step', NULL, 'critical');
 
--- Main risk analysis view
+-- Sales hierarchy: owner -> manager -> region -> segment
+CREATE TABLE sales_hierarchy AS
+SELECT * FROM read_csv('data/sales_hierarchy.csv', header = true, columns = {
+    'owner_name': 'VARCHAR',
+    'manager_name': 'VARCHAR',
+    'region': 'VARCHAR',
+    'segment': 'VARCHAR'
+});
+
+CREATE TABLE risk_rules (
+    rule_id VARCHAR PRIMARY KEY,
+    rule_type VARCHAR,
+    threshold_low DECIMAL(6,1),
+    threshold_med DECIMAL(6,1),
+    threshold_high DECIMAL(6,1),
+    score_low DECIMAL(3,1),
+    score_med DECIMAL(3,1),
+    score_high DECIMAL(3,1),
+    message_template VARCHAR,
+    action_template VARCHAR
+);
+
+-- A rule fires when its signal scores above 0, and close_date rules also need
+-- days_to_close in [threshold_low, threshold_med)
+INSERT INTO risk_rules VALUES
+    ('time_in_stage', 'time_in_stage', 1.0, 1.5, 2.0, 0, 4, 8,
+     'Stuck in {stage} for {days} days (benchmark: {benchmark_max} days max)',
+     'Review deal progression - this deal has been in {stage} for {pct_over_benchmark}% of benchmark time'),
+    ('activity_gap', 'activity_gap', 5, 10, 15, 0, 3, 7,
+     'No activity in {days} days',
+     'Re-engage immediately - {days} days without activity suggests deal may be stalled'),
+    ('missing_fields', 'missing_field', 1, 2, 2, 0, 1, 2,
+     'Missing: {missing_fields}',
+     'Capture {missing_fields} before advancing past {stage}'),
+    ('close_date_past', 'close_date', -999, 0, 999, 5, 0, 0,
+     'Close date passed {days} days ago',
+     'Update close date and verify deal status - this may be a lost opportunity'),
+    ('close_date_soon', 'close_date', 0, 30, 999, 2, 0, 0,
+     'Closing in {days} days',
+     'Verify all requirements are met - deal closes in {days} days'),
+    ('competitor', 'competitor', 0, 1, 2, 0, 1, 2,
+     'Active competitor: {competitor}',
+     'Develop competitive strategy against {competitor}'),
+    ('next_step', 'next_step', 0, 1, 2, 0, 1, 2,
+     'Weak next step: "{next_step}"',
+     'Replace the next step with a dated, specific commitment from the buyer');
+
+-- Next step vocabulary, matched on lowercased text with punctuation folded to
+-- spaces. Each category compiles to one alternation that RE2 matches in a
+-- single pass: stalled outranks vague, and a specific term or a dated
+-- commitment keeps a vague phrase from counting
+CREATE TABLE next_step_patterns (
+    pattern VARCHAR,
+    category VARCHAR
+);
+
+INSERT INTO next_step_patterns VALUES
+    ('no response', 'stalled'),
+    ('no reply', 'stalled'),
+    ('not responding', 'stalled'),
+    ('unresponsive', 'stalled'),
+    ('went dark', 'stalled'),
+    ('ghosted', 'stalled'),
+    ('follow up', 'vague'),
+    ('check in', 'vague'),
+    ('touch base', 'vague'),
+    ('circle back', 'vague'),
+    ('reach out', 'vague'),
+    ('waiting on', 'vague'),
+    ('tbd', 'vague'),
+    ('demo', 'specific'),
+    ('roi', 'specific'),
+    ('msa', 'specific'),
+    ('contract', 'specific'),
+    ('proposal', 'specific'),
+    ('pricing', 'specific'),
+    ('poc', 'specific'),
+    ('legal', 'specific'),
+    ('finance', 'specific'),
+    ('procurement', 'specific'),
+    ('security', 'specific'),
+    ('executive', 'specific'),
+    ('technical', 'specific'),
+    ('requirements', 'specific'),
+    ('deep dive', 'specific'),
+    ('onboarding', 'specific');
+
+-- Turn a risk_rules template into a positional format() string, so each deal
+-- renders in one call: {0} stage, {1} days, {2} benchmark_max,
+-- {3} pct_over_benchmark, {4} competitor, {5} missing_fields, {6} next_step
+CREATE OR REPLACE MACRO risk_template_format(template) AS
+    replace(replace(replace(replace(replace(replace(replace(template,
+        '{stage}', '{0}'),
+        '{days}', '{1}'),
+        '{benchmark_max}', '{2}'),
+        '{pct_over_benchmark}', '{3}'),
+        '{competitor}', '{4}'),
+        '{missing_fields}', '{5}'),
+        '{next_step}', '{6}');
+
+-- Opportunity export (scripts/pipeline_runner.py swaps in its own source)
+CREATE OR REPLACE VIEW opportunity_export AS
+SELECT * FROM read_csv_auto('data/salesforce_opportunities.csv');
+
+-- Account and opportunity names folded for matching: lowercase, punctuation
+-- and legal suffixes dropped, so 'ACME, Inc.' and 'Acme' share a key
+CREATE OR REPLACE MACRO dedup_key(name) AS
+    trim(regexp_replace(
+        lower(COALESCE(name, '')),
+        '(\b(inc|llc|ltd|limited|corp|corporation|co|company|gmbh|plc|the)\b|[^a-z0-9])+', ' ', 'g'
+    ));
+
+-- Open deals entered more than once, e.g. the same '<Account> - Enterprise AI'
+-- deal created by two reps, possibly under a misspelled copy of the account.
+-- Comparing every pair is O(n²), so candidates come from a sorted-neighbourhood
+-- blocking index instead:
+--   1. Distinct account keys are sorted as written and reversed, and each is
+--      compared with the 4 keys before it in both orders (a typo early in a
+--      name still leaves the end in place). Close matches (jaro_winkler >= 0.95
+--      and at most one edit per 10 characters) join the group of the smallest
+--      key they match.
+--   2. Deals are sorted by (account group, deal name) and each is compared with
+--      the 4 deals before it. Deals in the same group whose names, minus the
+--      account, score jaro_winkler >= 0.9 with the same numbers in them
+--      ('Renewal 2025' is not 'Renewal 2026') are the same deal.
+-- Of each pair, the deal with the most recent activity (then the lowest Id) is
+-- kept, so every duplicate points at a kept deal that ranks above it.
+CREATE OR REPLACE VIEW opportunity_duplicates AS
+WITH
+
+deals AS (
+    SELECT
+        id,
+        account_key,
+        CASE
+            WHEN starts_with(name_key, account_key) THEN ltrim(name_key[length(account_key) + 1:])
+            ELSE name_key
+        END AS deal_key,
+        keep_order
+    FROM (
+        SELECT
+            "Id" AS id,
+            dedup_key("Account.Name") AS account_key,
+            dedup_key("Name") AS name_key,
+            {'staleness': COALESCE(DATE '9999-12-31' - CAST("LastActivityDate" AS DATE), 9999999), 'id': "Id"}
+                AS keep_order
+        FROM opportunity_export
+        WHERE "StageName" NOT IN ('Closed Won', 'Closed Lost')
+    )
+    WHERE account_key <> ''
+),
+
+accounts AS (
+    SELECT DISTINCT account_key FROM deals
+),
+
+account_candidates AS (
+    SELECT
+        account_key,
+        UNNEST([
+            lag(account_key, 1) OVER by_key, lag(account_key, 2) OVER by_key,
+            lag(account_key, 3) OVER by_key, lag(account_key, 4) OVER by_key,
+            lag(account_key, 1) OVER by_reversed_key, lag(account_key, 2) OVER by_reversed_key,
+            lag(account_key, 3) OVER by_reversed_key, lag(account_key, 4) OVER by_reversed_key
+        ]) AS candidate
+    FROM accounts
+    WINDOW by_key AS (ORDER BY account_key), by_reversed_key AS (ORDER BY reverse(account_key))
+),
+
+account_groups AS (
+    SELECT account_key, MIN(account_group) AS account_group
+    FROM (
+        SELECT account_key, account_key AS account_group FROM accounts
+        UNION ALL
+        SELECT greatest(account_key, candidate), least(account_key, candidate)
+        FROM account_candidates
+        WHERE jaro_winkler_similarity(account_key, candidate) >= 0.95
+          AND damerau_levenshtein(account_key, candidate) <= greatest(1, length(account_key) // 10)
+    )
+    GROUP BY account_key
+),
+
+deal_candidates AS (
+    SELECT
+        d.*,
+        g.account_group,
+        UNNEST([
+            lag({'id': id, 'account_key': d.account_key, 'account_group': account_group,
+                 'deal_key': deal_key, 'keep_order': keep_order}, 1) OVER by_deal,
+            lag({'id': id, 'account_key': d.account_key, 'account_group': account_group,
+                 'deal_key': deal_key, 'keep_order': keep_order}, 2) OVER by_deal,
+            lag({'id': id, 'account_key': d.account_key, 'account_group': account_group,
+                 'deal_key': deal_key, 'keep_order': keep_order}, 3) OVER by_deal,
+            lag({'id': id, 'account_key': d.account_key, 'account_group': account_group,
+                 'deal_key': deal_key, 'keep_order': keep_order}, 4) OVER by_deal
+        ]) AS candidate
+    FROM deals d
+    JOIN account_groups g ON d.account_key = g.account_key
+    WINDOW by_deal AS (ORDER BY account_group, deal_key, keep_order)
+),
+
+matches AS (
+    SELECT
+        CASE WHEN candidate.keep_order < keep_order THEN id ELSE candidate.id END AS id,
+        CASE WHEN candidate.keep_order < keep_order THEN candidate.id ELSE id END AS duplicate_of,
+        least(keep_order, candidate.keep_order) AS kept_order,
+        jaro_winkler_similarity(account_key, candidate.account_key) AS account_similarity,
+        jaro_winkler_similarity(deal_key, candidate.deal_key) AS name_similarity
+    FROM deal_candidates
+    WHERE candidate.account_group = account_group
+      AND regexp_extract_all(deal_key, '\d+') = regexp_extract_all(candidate.deal_key, '\d+')
+)
+
+SELECT
+    id,
+    arg_min(duplicate_of, kept_order) AS duplicate_of,
+    MAX(account_similarity) AS account_similarity,
+    MAX(name_similarity) AS name_similarity
+FROM matches
+WHERE name_similarity >= 0.9
+GROUP BY id;
+
+-- Deals to score: the export with each duplicate collapsed into the deal it
+-- duplicates, so totals count a deal once
+CREATE OR REPLACE VIEW raw_opportunities AS
+SELECT * FROM opportunity_export
+WHERE "Id" NOT IN (SELECT id FROM opportunity_duplicates);
+
+-- Main risk analysis view. It is unordered, so a query that only counts or
+-- aggregates it never pays for a sort; reports order their own results.
 .print ''
 .print '═══════════════════════════════════════════════════════════════════════════════'
 .print '  PIPELINE HEALTH CHECKER - Analysis Results'
@@ -50,7 +279,7 @@ INSERT INTO stage_requirements VALUES
 CREATE OR REPLACE VIEW risk_analysis AS
 WITH
 
-opportunities AS (
+opportunities AS NOT MATERIALIZED (
     SELECT
         "Id" as id,
         "Name" as name,
@@ -67,7 +296,7 @@ opportunities AS (
         "Technical_Champion__c" as technical_champion,
         "Security_Review_Status__c" as security_review_status,
         "Competitor__c" as competitor
-    FROM read_csv_auto('data/salesforce_opportunities.csv')
+    FROM raw_opportunities
     WHERE "StageName" NOT IN ('Closed Won', 'Closed Lost')
 ),
 
@@ -75,138 +304,296 @@ current_date AS (
     SELECT DATE '2025-10-30' as analysis_date
 ),
 
-time_in_stage AS (
+critical_requirements AS (
+    -- Newest requirement first, the order missing_field_list has always used
     SELECT
-        o.id,
-        o.stage_name,
-        DATE_DIFF('day', o.last_stage_change_date, c.analysis_date) AS days_in_stage,
-        b.max_days AS benchmark_max,
-        CASE
-            WHEN DATE_DIFF('day', o.last_stage_change_date, c.analysis_date) <= b.max_days THEN 0
-            WHEN DATE_DIFF('day', o.last_stage_change_date, c.analysis_date) <= b.max_days * 2.0 THEN 1
-            ELSE 2
-        END AS time_in_stage_score
-    FROM opportunities o
-    CROSS JOIN current_date c
-    LEFT JOIN stage_benchmarks b ON o.stage_name = b.stage_name
+        stage_name,
+        LIST({'field': required_field, 'value': required_value} ORDER BY rowid DESC) AS requirements
+    FROM stage_requirements
+    WHERE severity = 'critical'
+    GROUP BY stage_name
 ),
 
-activity_gaps AS (
+next_step_matchers AS (
     SELECT
-        o.id,
-        DATE_DIFF('day', o.last_activity_date, c.analysis_date) AS days_since_activity,
-        CASE
-            WHEN DATE_DIFF('day', o.last_activity_date, c.analysis_date) <= 7 THEN 0
-            WHEN DATE_DIFF('day', o.last_activity_date, c.analysis_date) <= 14 THEN 1
-            ELSE 2
-        END AS activity_gap_score
-    FROM opportunities o
-    CROSS JOIN current_date c
+        '\b(' || string_agg(pattern, '|') FILTER (WHERE category = 'stalled') || ')\b' AS stalled,
+        '\b(' || string_agg(pattern, '|') FILTER (WHERE category = 'vague') || ')\b' AS vague,
+        '\b(' || string_agg(pattern, '|') FILTER (WHERE category = 'specific') || ')\b' AS specific
+    FROM next_step_patterns
 ),
 
-missing_fields AS (
+next_step_quality AS (
+    -- Scored once per distinct NextStep, since values repeat heavily, then
+    -- hash-joined back to every deal that uses it. Empty next steps are
+    -- already counted by missing_fields.
     SELECT
-        o.id,
+        next_step,
         CASE
-            WHEN COUNT(*) = 0 THEN 0
-            WHEN COUNT(*) = 1 THEN 1
-            ELSE 2
-        END AS missing_fields_score,
-        STRING_AGG(sr.required_field, ', ') AS missing_field_list
-    FROM opportunities o
-    INNER JOIN stage_requirements sr ON o.stage_name = sr.stage_name
-    WHERE sr.severity = 'critical'
-      AND (
-          (sr.required_field = 'economic_buyer' AND (o.economic_buyer IS NULL OR o.economic_buyer = ''))
-          OR (sr.required_field = 'technical_champion' AND (o.technical_champion IS NULL OR o.technical_champion = ''))
-          OR (sr.required_field = 'security_review_status' AND sr.required_value = 'Complete' AND o.security_review_status != 'Complete')
-          OR (sr.required_field = 'next_step' AND (o.next_step IS NULL OR o.next_step = ''))
-      )
-    GROUP BY o.id
+            WHEN is_stalled OR committed_date < analysis_date THEN 2
+            WHEN committed_date IS NULL AND NOT is_specific
+                 AND (is_vague OR len(string_split(normalized, ' ')) <= 2) THEN 1
+            ELSE 0
+        END AS next_step_score
+    FROM (
+        SELECT
+            t.next_step,
+            t.normalized,
+            c.analysis_date,
+            regexp_matches(t.normalized, m.stalled) AS is_stalled,
+            regexp_matches(t.normalized, m.vague) AS is_vague,
+            regexp_matches(t.normalized, m.specific) AS is_specific,
+            -- Earliest m/d date mentioned, read as the next such date within
+            -- six months (so a December step stays in December)
+            list_min(list_transform(
+                regexp_extract_all(t.normalized, '\b\d{1,2}/\d{1,2}\b'),
+                d -> CASE
+                    WHEN CAST(try_strptime(year(c.analysis_date) || '/' || d, '%Y/%m/%d') AS DATE) < c.analysis_date - INTERVAL 180 DAY
+                    THEN CAST(try_strptime(year(c.analysis_date) + 1 || '/' || d, '%Y/%m/%d') AS DATE)
+                    ELSE CAST(try_strptime(year(c.analysis_date) || '/' || d, '%Y/%m/%d') AS DATE)
+                END
+            )) AS committed_date
+        FROM (
+            SELECT
+                next_step,
+                trim(regexp_replace(lower(next_step), '[^a-z0-9/]+', ' ', 'g')) AS normalized
+            FROM (SELECT DISTINCT next_step FROM opportunities WHERE trim(next_step) <> '')
+        ) t
+        CROSS JOIN next_step_matchers m
+        CROSS JOIN current_date c
+    )
 ),
 
-close_date_risk AS (
+-- Every signal comes from the deal's own row and small lookup tables (stage
+-- benchmarks, requirements, distinct next steps), so scoring streams through
+-- the export once instead of joining per-deal subqueries back on id.
+deal_signals AS (
     SELECT
-        o.id,
+        o.*,
+        DATE_DIFF('day', o.last_stage_change_date, c.analysis_date) AS days_in_stage,
+        b.max_days AS benchmark_max,
+        DATE_DIFF('day', o.last_activity_date, c.analysis_date) AS days_since_activity,
         DATE_DIFF('day', c.analysis_date, o.close_date) AS days_to_close,
-        CASE
-            WHEN DATE_DIFF('day', c.analysis_date, o.close_date) < 7 OR DATE_DIFF('day', c.analysis_date, o.close_date) < 0 THEN 2
-            WHEN DATE_DIFF('day', c.analysis_date, o.close_date) <= 29 THEN 1
-            ELSE 0
-        END AS close_date_score
+        list_transform(
+            list_filter(r.requirements, req -> COALESCE(CASE req.field
+                WHEN 'economic_buyer' THEN o.economic_buyer IS NULL OR o.economic_buyer = ''
+                WHEN 'technical_champion' THEN o.technical_champion IS NULL OR o.technical_champion = ''
+                WHEN 'security_review_status' THEN req.value = 'Complete' AND o.security_review_status != 'Complete'
+                WHEN 'next_step' THEN o.next_step IS NULL OR trim(o.next_step) = ''
+            END, false)),
+            req -> req.field
+        ) AS missing_fields,
+        q.next_step_score
     FROM opportunities o
     CROSS JOIN current_date c
+    LEFT JOIN stage_benchmarks b ON o.stage_name = b.stage_name
+    LEFT JOIN critical_requirements r ON o.stage_name = r.stage_name
+    LEFT JOIN next_step_quality q ON o.next_step = q.next_step
 ),
 
-competitor_threat AS (
+deal_scores AS (
     SELECT
-        id,
+        *,
+        CASE
+            WHEN days_in_stage <= benchmark_max THEN 0
+            WHEN days_in_stage <= benchmark_max * 2.0 THEN 1
+            ELSE 2
+        END AS time_in_stage_score,
+        CASE
+            WHEN days_since_activity <= 7 THEN 0
+            WHEN days_since_activity <= 14 THEN 1
+            ELSE 2
+        END AS activity_gap_score,
+        CASE
+            WHEN len(missing_fields) IS NULL OR len(missing_fields) = 0 THEN 0
+            WHEN len(missing_fields) = 1 THEN 1
+            ELSE 2
+        END AS missing_fields_score,
+        CASE
+            WHEN days_to_close < 7 OR days_to_close < 0 THEN 2
+            WHEN days_to_close <= 29 THEN 1
+            ELSE 0
+        END AS close_date_score,
         CASE
             WHEN competitor IN ('OpenAI', 'Google Vertex AI') THEN 2
             ELSE 0
         END AS competitor_score
-    FROM opportunities
+    FROM deal_signals
 )
 
 SELECT
-    o.id,
-    o.name,
-    o.account_name,
-    o.owner_name,
-    o.stage_name,
-    o.amount,
-    o.close_date,
-
-    COALESCE(t.time_in_stage_score, 0) AS time_in_stage_score,
-    COALESCE(a.activity_gap_score, 0) AS activity_gap_score,
-    COALESCE(m.missing_fields_score, 0) AS missing_fields_score,
-    COALESCE(c.close_date_score, 0) AS close_date_score,
-    COALESCE(ct.competitor_score, 0) AS competitor_score,
+    id,
+    name,
+    account_name,
+    owner_name,
+    stage_name,
+    amount,
+    probability,
+    close_date,
+
+    time_in_stage_score,
+    activity_gap_score,
+    missing_fields_score,
+    close_date_score,
+    competitor_score,
+    COALESCE(next_step_score, 0) AS next_step_score,
 
     LEAST(
-        COALESCE(t.time_in_stage_score, 0) +
-        COALESCE(a.activity_gap_score, 0) +
-        COALESCE(m.missing_fields_score, 0) +
-        COALESCE(c.close_date_score, 0) +
-        COALESCE(ct.competitor_score, 0),
+        time_in_stage_score +
+        activity_gap_score +
+        missing_fields_score +
+        close_date_score +
+        competitor_score +
+        COALESCE(next_step_score, 0),
         10.0
     ) AS overall_risk_score,
 
     CASE
         WHEN LEAST(
-            COALESCE(t.time_in_stage_score, 0) +
-            COALESCE(a.activity_gap_score, 0) +
-            COALESCE(m.missing_fields_score, 0) +
-            COALESCE(c.close_date_score, 0) +
-            COALESCE(ct.competitor_score, 0),
+            time_in_stage_score +
+            activity_gap_score +
+            missing_fields_score +
+            close_date_score +
+            competitor_score +
+            COALESCE(next_step_score, 0),
             10.0
         ) <= 3 THEN 'healthy'
         WHEN LEAST(
-            COALESCE(t.time_in_stage_score, 0) +
-            COALESCE(a.activity_gap_score, 0) +
-            COALESCE(m.missing_fields_score, 0) +
-            COALESCE(c.close_date_score, 0) +
-            COALESCE(ct.competitor_score, 0),
+            time_in_stage_score +
+            activity_gap_score +
+            missing_fields_score +
+            close_date_score +
+            competitor_score +
+            COALESCE(next_step_score, 0),
             10.0
         ) <= 6 THEN 'at_risk'
         ELSE 'high_risk'
     END AS risk_level,
 
-    t.days_in_stage,
-    t.benchmark_max,
-    a.days_since_activity,
-    m.missing_field_list,
-    c.days_to_close,
-    o.next_step,
-    o.competitor
-
-FROM opportunities o
-LEFT JOIN time_in_stage t ON o.id = t.id
-LEFT JOIN activity_gaps a ON o.id = a.id
-LEFT JOIN missing_fields m ON o.id = m.id
-LEFT JOIN close_date_risk c ON o.id = c.id
-LEFT JOIN competitor_threat ct ON o.id = ct.id
-ORDER BY overall_risk_score DESC, amount DESC;
+    days_in_stage,
+    benchmark_max,
+    days_since_activity,
+    NULLIF(array_to_string(missing_fields, ', '), '') AS missing_field_list,
+    days_to_close,
+    next_step,
+    competitor,
+
+    -- Learned chance the deal is lost: scripts/pipeline_runner.py fills it in
+    -- from data/risk_model.json when that file exists (see risk_model.py)
+    CAST(NULL AS DOUBLE) AS loss_probability
+
+FROM deal_scores;
+
+-- Alert feed: every flagged deal with its risk factors and recommended actions,
+-- rendered from risk_rules (strongest signal first, at most 3 actions). The
+-- rules are gathered into one list that each deal renders its own reasons from,
+-- so nothing groups or joins the flagged deals and the view streams in
+-- constant memory at any pipeline size.
+CREATE OR REPLACE VIEW risk_alerts AS
+WITH rule_formats AS (
+    SELECT LIST({
+        'rule_id': rule_id,
+        'rule_type': rule_type,
+        'threshold_low': threshold_low,
+        'threshold_med': threshold_med,
+        'message_format': risk_template_format(message_template),
+        'action_format': risk_template_format(action_template)
+    }) AS rules
+    FROM risk_rules
+),
+
+explained AS (
+    SELECT
+        f.*,
+        -- Sorting the (rank, rule_id, ...) structs puts the strongest signal first
+        list_sort(list_transform(
+            list_filter(
+                list_transform(rr.rules, rule -> {
+                    'rule': rule,
+                    'signal_score': CASE rule.rule_type
+                        WHEN 'time_in_stage' THEN f.time_in_stage_score
+                        WHEN 'activity_gap' THEN f.activity_gap_score
+                        WHEN 'missing_field' THEN f.missing_fields_score
+                        WHEN 'close_date' THEN f.close_date_score
+                        WHEN 'competitor' THEN f.competitor_score
+                        WHEN 'next_step' THEN f.next_step_score
+                    END,
+                    'days': COALESCE(CAST(CASE rule.rule_type
+                        WHEN 'time_in_stage' THEN f.days_in_stage
+                        WHEN 'activity_gap' THEN f.days_since_activity
+                        WHEN 'close_date' THEN ABS(f.days_to_close)
+                    END AS VARCHAR), '')
+                }),
+                r -> r.signal_score > 0
+                     AND (r.rule.rule_type <> 'close_date'
+                          OR (f.days_to_close >= r.rule.threshold_low AND f.days_to_close < r.rule.threshold_med))
+            ),
+            r -> {
+                'rank': -r.signal_score,
+                'rule_id': r.rule.rule_id,
+                'message': format(r.rule.message_format, COALESCE(f.stage_name, ''), r.days,
+                                  COALESCE(CAST(f.benchmark_max AS VARCHAR), ''),
+                                  COALESCE(CAST(CAST(ROUND(f.days_in_stage * 100.0 / f.benchmark_max) AS INTEGER) AS VARCHAR), ''),
+                                  COALESCE(f.competitor, ''), COALESCE(f.missing_field_list, ''), COALESCE(f.next_step, '')),
+                'action': format(r.rule.action_format, COALESCE(f.stage_name, ''), r.days,
+                                 COALESCE(CAST(f.benchmark_max AS VARCHAR), ''),
+                                 COALESCE(CAST(CAST(ROUND(f.days_in_stage * 100.0 / f.benchmark_max) AS INTEGER) AS VARCHAR), ''),
+                                 COALESCE(f.competitor, ''), COALESCE(f.missing_field_list, ''), COALESCE(f.next_step, ''))
+            }
+        )) AS reasons
+    FROM risk_analysis f
+    CROSS JOIN rule_formats rr
+    WHERE f.risk_level IN ('at_risk', 'high_risk')
+)
+
+SELECT
+    * EXCLUDE (reasons),
+    list_transform(reasons, r -> r.message) AS risk_factors,
+    CASE
+        WHEN len(reasons) > 0 THEN list_transform(reasons, r -> r.action)[1:3]
+        ELSE ['Review deal status with account executive']
+    END AS recommended_actions
+FROM explained;
+
+-- Just the reasons, by deal
+CREATE OR REPLACE VIEW risk_explanations AS
+SELECT id, risk_factors, recommended_actions
+FROM risk_alerts;
+
+-- Every level of the sales hierarchy (rep, manager, region, segment and the org
+-- total) in one pass with ROLLUP. Reps missing from sales_hierarchy roll up
+-- under 'Unassigned'. Healthy deals count as 0 towards avg_risk_score, as in
+-- the dashboard's deal aggregates.
+CREATE OR REPLACE VIEW team_rollups AS
+SELECT
+    CASE GROUPING(segment, region, manager_name, owner_name)
+        WHEN 0 THEN 'owner'
+        WHEN 1 THEN 'manager'
+        WHEN 3 THEN 'region'
+        WHEN 7 THEN 'segment'
+        ELSE 'total'
+    END AS rollup_level,
+    segment,
+    region,
+    manager_name,
+    owner_name,
+    COUNT(*) AS deals,
+    CAST(SUM(amount) AS DOUBLE) AS pipeline_value,
+    COUNT(*) FILTER (WHERE risk_level IN ('at_risk', 'high_risk')) AS at_risk_deals,
+    CAST(COALESCE(SUM(amount) FILTER (WHERE risk_level IN ('at_risk', 'high_risk')), 0) AS DOUBLE) AS at_risk_value,
+    CAST(ROUND(AVG(CASE WHEN risk_level <> 'healthy' THEN overall_risk_score ELSE 0 END), 2) AS DOUBLE) AS avg_risk_score
+FROM (
+    SELECT
+        r.owner_name,
+        COALESCE(h.manager_name, 'Unassigned') AS manager_name,
+        COALESCE(h.region, 'Unassigned') AS region,
+        COALESCE(h.segment, 'Unassigned') AS segment,
+        r.amount,
+        r.risk_level,
+        r.overall_risk_score
+    FROM risk_analysis r
+    LEFT JOIN sales_hierarchy h ON r.owner_name = h.owner_name
+)
+GROUP BY ROLLUP (segment, region, manager_name, owner_name);
 
 -- Display results
 .print '📊 PIPELINE OVERVIEW'
@@ -218,6 +605,23 @@ SELECT
     ROUND(AVG(overall_risk_score), 1) AS avg_risk_score
 FROM risk_analysis;
 
+.print ''
+.print '🔁 DUPLICATE OPPORTUNITIES (collapsed before scoring)'
+.print ''
+
+SELECT
+    o."Account.Name" AS account_name,
+    o."Name" AS name,
+    o."Owner.Name" AS owner_name,
+    '$' || CAST(CAST(o."Amount" AS INTEGER) AS VARCHAR) AS amount,
+    k."Owner.Name" AS kept_owner,
+    d.duplicate_of AS kept_id,
+    ROUND(d.name_similarity, 2) AS name_similarity
+FROM opportunity_duplicates d
+JOIN opportunity_export o ON o."Id" = d.id
+JOIN opportunity_export k ON k."Id" = d.duplicate_of
+ORDER BY o."Amount" DESC;
+
 .print ''
 .print '⚠️  RISK BREAKDOWN'
 .print ''
@@ -246,6 +650,7 @@ SELECT
     stage_name,
     '$' || CAST(CAST(amount AS INTEGER) AS VARCHAR) AS amount,
     ROUND(overall_risk_score, 1) AS risk_score,
+    ROUND(loss_probability, 2) AS loss_probability,
     days_in_stage,
     days_since_activity || 'd ago' as last_activity,
     owner_name
@@ -254,6 +659,25 @@ WHERE risk_level IN ('at_risk', 'high_risk')
 ORDER BY overall_risk_score DESC, amount DESC
 LIMIT 10;
 
+.print ''
+.print '🏆 TOP 3 AT-RISK DEALS PER OWNER'
+.print ''
+
+-- One struct ORDER BY key lets DuckDB keep 3 rows per owner (a grouped
+-- arg_max) instead of sorting every flagged deal
+SELECT
+    owner_name,
+    row_number() OVER (PARTITION BY owner_name ORDER BY (overall_risk_score, amount, id) DESC) AS rank,
+    account_name,
+    stage_name,
+    '$' || CAST(CAST(amount AS INTEGER) AS VARCHAR) AS amount,
+    ROUND(overall_risk_score, 1) AS risk_score,
+    ROUND(loss_probability, 2) AS loss_probability
+FROM risk_analysis
+WHERE risk_level IN ('at_risk', 'high_risk')
+QUALIFY rank <= 3
+ORDER BY owner_name, rank;
+
 -- Export to JSON
 .print ''
 .print 'Exporting dashboard data to dashboard_data.json...'
@@ -267,16 +691,18 @@ COPY (
         stage_name,
         amount,
         ROUND(overall_risk_score, 1) as risk_score,
+        ROUND(loss_probability, 3) as loss_probability,
         risk_level,
         days_in_stage,
         days_since_activity,
         days_to_close,
         missing_field_list,
         next_step,
-        competitor
-    FROM risk_analysis
-    WHERE risk_level IN ('at_risk', 'high_risk')
-    ORDER BY overall_risk_score DESC
+        competitor,
+        risk_factors,
+        recommended_actions
+    FROM risk_alerts
+    ORDER BY overall_risk_score DESC, amount DESC, id DESC
 ) TO 'data/dashboard_data.json' (FORMAT JSON, ARRAY true);
 
 .print ''
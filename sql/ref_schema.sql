@@ -18,16 +18,30 @@ CREATE TABLE IF NOT EXISTS stage_requirements (
     PRIMARY KEY (stage_name, required_field)
 );
 
+-- Sales hierarchy reference table (loaded from data/sales_hierarchy.csv)
+CREATE TABLE IF NOT EXISTS sales_hierarchy (
+    owner_name VARCHAR PRIMARY KEY,
+    manager_name VARCHAR,
+    region VARCHAR,
+    segment VARCHAR
+);
+
 -- Risk scoring rules configuration
 CREATE TABLE IF NOT EXISTS risk_rules (
     rule_id VARCHAR PRIMARY KEY,
-    rule_type VARCHAR,  -- 'time_in_stage', 'activity_gap', 'missing_field', etc.
-    threshold_low DECIMAL(3,1),
-    threshold_med DECIMAL(3,1),
-    threshold_high DECIMAL(3,1),
+    rule_type VARCHAR,  -- 'time_in_stage', 'activity_gap', 'missing_field', 'close_date', 'competitor', 'next_step'
+    threshold_low DECIMAL(6,1),
+    threshold_med DECIMAL(6,1),
+    threshold_high DECIMAL(6,1),
     score_low DECIMAL(3,1),
     score_med DECIMAL(3,1),
     score_high DECIMAL(3,1),
-    message_template VARCHAR,
+    message_template VARCHAR,  -- placeholders: {stage} {days} {benchmark_max} {pct_over_benchmark} {competitor} {missing_fields} {next_step}
     action_template VARCHAR
 );
+
+-- Next step quality vocabulary (matched as whole words on normalized text)
+CREATE TABLE IF NOT EXISTS next_step_patterns (
+    pattern VARCHAR,
+    category VARCHAR  -- 'stalled', 'vague' or 'specific'
+);
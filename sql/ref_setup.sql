@@ -1,6 +1,7 @@
 -- Reference data setup for Pipeline Health Checker
 
 -- Insert stage benchmarks (from generate_salesforce_data.py)
+-- Defaults only: data/stage_benchmarks.csv from scripts/calibrate_benchmarks.py overrides them at runtime
 INSERT INTO stage_benchmarks VALUES
     ('Qualification', 7, 14, 1),
     ('Solution Mapping', 14, 21, 2),
@@ -32,7 +33,9 @@ INSERT INTO stage_requirements VALUES
     ('EB Sign Off', 'next_step', NULL, 'critical'),
     ('Contract Negotiation', 'next_step', NULL, 'critical');
 
--- Insert risk scoring rules
+-- Insert risk scoring rules (keep in sync with final_analysis_full.sql)
+-- A rule fires when its signal scores above 0, and close_date rules also need
+-- days_to_close in [threshold_low, threshold_med)
 INSERT INTO risk_rules VALUES
     ('time_in_stage', 'time_in_stage', 1.0, 1.5, 2.0, 0, 4, 8,
      'Stuck in {stage} for {days} days (benchmark: {benchmark_max} days max)',
@@ -42,14 +45,59 @@ INSERT INTO risk_rules VALUES
      'No activity in {days} days',
      'Re-engage immediately - {days} days without activity suggests deal may be stalled'),
 
+    ('missing_fields', 'missing_field', 1, 2, 2, 0, 1, 2,
+     'Missing: {missing_fields}',
+     'Capture {missing_fields} before advancing past {stage}'),
+
     ('close_date_past', 'close_date', -999, 0, 999, 5, 0, 0,
-     'Close date has passed',
+     'Close date passed {days} days ago',
      'Update close date and verify deal status - this may be a lost opportunity'),
 
-    ('close_date_soon', 'close_date', 0, 14, 999, 2, 0, 0,
+    ('close_date_soon', 'close_date', 0, 30, 999, 2, 0, 0,
      'Closing in {days} days',
      'Verify all requirements are met - deal closes in {days} days'),
 
     ('competitor', 'competitor', 0, 1, 2, 0, 1, 2,
      'Active competitor: {competitor}',
-     'Develop competitive strategy against {competitor}');
+     'Develop competitive strategy against {competitor}'),
+
+    ('next_step', 'next_step', 0, 1, 2, 0, 1, 2,
+     'Weak next step: "{next_step}"',
+     'Replace the next step with a dated, specific commitment from the buyer');
+
+-- Insert next step vocabulary (keep in sync with final_analysis_full.sql)
+INSERT INTO next_step_patterns VALUES
+    -- Stalled: the buyer has stopped engaging
+    ('no response', 'stalled'),
+    ('no reply', 'stalled'),
+    ('not responding', 'stalled'),
+    ('unresponsive', 'stalled'),
+    ('went dark', 'stalled'),
+    ('ghosted', 'stalled'),
+
+    -- Vague: no owner, deliverable or date
+    ('follow up', 'vague'),
+    ('check in', 'vague'),
+    ('touch base', 'vague'),
+    ('circle back', 'vague'),
+    ('reach out', 'vague'),
+    ('waiting on', 'vague'),
+    ('tbd', 'vague'),
+
+    -- Specific: a concrete deliverable or stakeholder
+    ('demo', 'specific'),
+    ('roi', 'specific'),
+    ('msa', 'specific'),
+    ('contract', 'specific'),
+    ('proposal', 'specific'),
+    ('pricing', 'specific'),
+    ('poc', 'specific'),
+    ('legal', 'specific'),
+    ('finance', 'specific'),
+    ('procurement', 'specific'),
+    ('security', 'specific'),
+    ('executive', 'specific'),
+    ('technical', 'specific'),
+    ('requirements', 'specific'),
+    ('deep dive', 'specific'),
+    ('onboarding', 'specific');
@@ -0,0 +1,85 @@
+import pyarrow as pa
+import pytest
+from rich.console import Console
+
+import ad_hoc_report
+import pipeline_runner as runner
+
+
+@pytest.fixture(scope='module')
+def queries():
+    return ad_hoc_report.load_queries()
+
+
+def test_every_ad_hoc_query_is_titled_and_read_only(queries):
+    titles = [title for title, _ in queries]
+    assert len(queries) == 8
+    assert titles[0] == 'Total deals, pipeline value, weighted value, avg risk'
+    assert titles[-1] == 'Highest priority deals requiring intervention'
+    assert all(sql.lstrip().upper().startswith('SELECT') for _, sql in queries)
+
+
+def test_statements_that_write_are_refused(tmp_path):
+    sql = tmp_path / 'ad_hoc.sql'
+    sql.write_text('-- Count\nSELECT COUNT(*) FROM risk_analysis;\n\n-- Wipe\nDELETE FROM scored_snapshot;\n')
+    with pytest.raises(ValueError, match='got: DELETE'):
+        ad_hoc_report.load_queries(sql)
+
+
+def test_concurrent_results_match_running_each_query_alone(queries):
+    with runner.connect() as con:
+        runner.score(con)
+        runner.snapshot_scores(con)
+        expected = [runner.fetch_arrow(con.execute(sql)) for _, sql in queries]
+        concurrent = ad_hoc_report.run_queries(con, queries, max_rows=1000)
+    for (table, truncated, seconds), alone in zip(concurrent, expected):
+        assert table.equals(alone) and not truncated and seconds >= 0
+
+
+def test_long_results_keep_only_the_first_rows(queries):
+    listing = [(title, sql) for title, sql in queries if title.startswith('Deals closing soon')]
+    with runner.connect() as con:
+        runner.score(con)
+        runner.snapshot_scores(con)
+        everything = runner.fetch_arrow(con.execute(listing[0][1]))
+        [(head, truncated, _)] = ad_hoc_report.run_queries(con, listing, max_rows=2)
+    assert everything.num_rows > 2
+    assert truncated and head.equals(everything.slice(0, 2))
+
+
+def test_second_report_is_served_from_the_cache_without_scoring(queries, tmp_path, monkeypatch):
+    with runner.connect() as con:
+        first = ad_hoc_report.build_report(con, queries=queries, max_rows=2, cache_dir=tmp_path)
+    assert not any(result['cached'] for result in first)
+
+    def no_snapshot(con):
+        raise AssertionError('scored again on a full cache hit')
+
+    monkeypatch.setattr(runner, 'snapshot_scores', no_snapshot)
+    with runner.connect() as con:
+        second = ad_hoc_report.build_report(con, queries=queries, max_rows=2, cache_dir=tmp_path)
+    assert all(result['cached'] for result in second)
+    for before, after in zip(first, second):
+        assert after['table'].to_pylist() == before['table'].to_pylist()
+        assert after['truncated'] == before['truncated']
+    assert any(result['truncated'] for result in second)
+
+
+def test_report_renders_a_rich_table_per_query(queries, tmp_path):
+    with runner.connect() as con:
+        results = ad_hoc_report.build_report(con, queries=queries, use_cache=False, cache_dir=tmp_path)
+    console = Console(record=True, width=250)
+    ad_hoc_report.print_report(results, console)
+    text = console.export_text()
+    for title, _ in queries:
+        assert title in text
+    assert 'total_pipeline_value' in text and 'owner_name' in text
+
+
+def test_names_that_look_like_markup_print_as_written():
+    table = pa.table({'name': ['Foo [/bar]', '[bold]Acme[/bold]'], 'amount': [1.0, 2.0]})
+    console = Console(record=True, width=120)
+    console.print(ad_hoc_report.rich_table('Deals [/named]', table))
+    text = console.export_text()
+    assert 'Deals [/named] (2 rows, 0.00s)' in text
+    assert 'Foo [/bar]' in text and '[bold]Acme[/bold]' in text
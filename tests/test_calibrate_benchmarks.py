@@ -0,0 +1,57 @@
+import json
+import shutil
+import sys
+
+import pytest
+
+import calibrate_benchmarks
+from generate_salesforce_data import write_stage_history
+
+
+@pytest.fixture
+def shards(tmp_path):
+    """Two different nightly shards that share a file name"""
+    first, second = tmp_path / 'night1' / 'history.csv', tmp_path / 'night2' / 'history.csv'
+    write_stage_history(first, 200, seed=1)
+    write_stage_history(second, 200, seed=2)
+    return first, second
+
+
+def calibrate(tmp_path, monkeypatch, *shards):
+    monkeypatch.setattr(sys, 'argv', ['calibrate_benchmarks.py', *map(str, shards),
+                                      '--state', str(tmp_path / 'state.json'),
+                                      '--output', str(tmp_path / 'stage_benchmarks.csv')])
+    calibrate_benchmarks.main()
+    state = json.loads((tmp_path / 'state.json').read_text())
+    return state['shards'], sum(calibrate_benchmarks.QuantileSketch.from_dict(s).count
+                                for s in state['sketches'].values())
+
+
+def test_shards_with_the_same_name_are_both_summarized(tmp_path, monkeypatch, shards):
+    calibrate(tmp_path, monkeypatch, shards[0])
+    processed, visits = calibrate(tmp_path, monkeypatch, shards[1])
+    assert len(processed) == 2
+    assert visits > calibrate(tmp_path / 'only_first', monkeypatch, shards[0])[1] > 0
+
+
+def test_renamed_shard_is_not_folded_in_twice(tmp_path, monkeypatch, shards):
+    renamed = tmp_path / 'renamed.csv'
+    shutil.copy(shards[0], renamed)
+    _, visits = calibrate(tmp_path, monkeypatch, shards[0])
+    processed, visits_after = calibrate(tmp_path, monkeypatch, renamed)
+    assert processed == [calibrate_benchmarks.shard_digest(shards[0])]
+    assert visits_after == visits
+
+
+def test_summary_reports_stage_visits(tmp_path, monkeypatch, shards, capsys):
+    calibrate(tmp_path, monkeypatch, shards[0])
+    out = capsys.readouterr().out
+    assert 'visits)' in out and 'deals)' not in out
+
+
+def test_sketch_quantiles_stay_within_relative_accuracy():
+    sketch = calibrate_benchmarks.QuantileSketch(0.01)
+    sketch.add(range(1, 1001))
+    for q in (0.25, 0.5, 0.75):
+        expected = 1 + q * 999
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected + 1
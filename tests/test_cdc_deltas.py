@@ -0,0 +1,88 @@
+import duckdb
+import pyarrow.parquet as pq
+import pytest
+
+import generate_salesforce_data as generator
+import pipeline_runner as runner
+import validate_ingest
+
+# Applies one day's delta to the snapshot table: drop every Id the delta
+# touches, then insert its upserts
+APPLY_DELTA = """
+CREATE OR REPLACE TABLE snapshot AS
+SELECT * FROM snapshot WHERE "Id" NOT IN (SELECT "Id" FROM read_parquet($delta))
+UNION ALL BY NAME
+SELECT * EXCLUDE (_op) FROM read_parquet($delta) WHERE _op = 'upsert'
+"""
+
+
+@pytest.fixture(scope='module')
+def deltas(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('cdc')
+    base = tmp_path / 'base.parquet'
+    final = tmp_path / 'final.parquet'
+    base_table = generator.read_snapshot(runner.DEFAULT_INPUT)
+    pq.write_table(base_table, base)
+    counts = generator.write_cdc_deltas(base, tmp_path / 'deltas', 60, new_deal_rate=0.05, delete_rate=0.01,
+                                        final_snapshot=final)
+    return base, sorted((tmp_path / 'deltas').glob('*.parquet')), final, counts
+
+
+def test_one_delta_file_per_day(deltas):
+    base, files, final, (upserts, deletes) = deltas
+    assert [f.stem for f in files[:2]] == ['2025-10-31', '2025-11-01'] and len(files) == 60
+    ops = duckdb.sql(f"SELECT _op, COUNT(*) FROM read_parquet({[str(f) for f in files]}) GROUP BY ALL").fetchall()
+    assert dict(ops) == {'upsert': upserts, 'delete': deletes}
+    assert deletes > 0
+
+
+def test_applying_the_deltas_reproduces_the_final_state(deltas):
+    base, files, final, _ = deltas
+    con = duckdb.connect()
+    con.execute(f"CREATE TABLE snapshot AS SELECT * FROM read_parquet('{base}')")
+    for delta in files:
+        con.execute(APPLY_DELTA, {'delta': str(delta)})
+    replayed = con.execute("SELECT * FROM snapshot ORDER BY \"Id\"").fetchall()
+    assert replayed == con.execute(f"SELECT * FROM read_parquet('{final}') ORDER BY \"Id\"").fetchall()
+    assert len({row[0] for row in replayed}) == len(replayed)
+
+
+def test_deals_evolve_consistently(deltas):
+    base, files, final, _ = deltas
+    con = duckdb.connect()
+    changes = con.execute(f"""
+        SELECT
+            COUNT(*) FILTER (WHERE "StageName" IN ('Closed Won', 'Closed Lost')) AS closed,
+            COUNT(*) FILTER (WHERE "StageName" = 'Closed Won' AND "Probability" <> 100) AS bad_won,
+            COUNT(*) FILTER (WHERE "StageName" = 'Closed Lost' AND "Loss_Reason__c" = '') AS lost_without_reason,
+            COUNT(*) FILTER (WHERE "LastActivityDate" > CAST(regexp_extract(filename, '(\\d{{4}}-\\d{{2}}-\\d{{2}})', 1) AS DATE))
+                AS from_the_future,
+            COUNT(*) FILTER (WHERE "CreatedDate" = CAST(regexp_extract(filename, '(\\d{{4}}-\\d{{2}}-\\d{{2}})', 1) AS DATE)
+                             AND "StageName" = 'Qualification') AS created
+        FROM read_parquet({[str(f) for f in files]}, filename = true)
+        WHERE _op = 'upsert'
+    """).fetchone()
+    closed, bad_won, lost_without_reason, from_the_future, created = changes
+    assert closed > 0 and created > 0
+    assert bad_won == lost_without_reason == from_the_future == 0
+
+
+def test_final_state_passes_ingest_validation(deltas, tmp_path):
+    base, files, final, _ = deltas
+    export = tmp_path / 'final.csv'
+    duckdb.sql(f"COPY (SELECT * FROM read_parquet('{final}')) TO '{export}' (HEADER)")
+    with runner.connect() as con:
+        valid, rejected = validate_ingest.validate(con, export, tmp_path / 'valid.parquet', tmp_path / 'rejected.csv')
+    assert rejected == 0 and valid == pq.read_metadata(final).num_rows
+
+
+def test_new_deals_are_not_taken_for_duplicates(deltas):
+    base, files, final, _ = deltas
+    with runner.connect() as con:
+        runner.score(con, final)
+        created, names = con.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT \"Name\") FROM opportunity_export WHERE \"CreatedDate\" > DATE '2025-10-30'"
+        ).fetchone()
+        duplicates = con.execute("SELECT COUNT(*) FROM opportunity_duplicates").fetchone()[0]
+    assert created > 0 and names == created
+    assert duplicates == 0
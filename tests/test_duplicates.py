@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+import benchmark_out_of_core
+import pipeline_runner as runner
+
+CLOSED = ['Closed Won', 'Closed Lost']
+
+
+@pytest.fixture(scope='module')
+def export(tmp_path_factory):
+    """The sample export plus re-entered deals: returns (path, base rows by Id)"""
+    sample = pd.read_csv(runner.DEFAULT_INPUT)
+    open_deals = sample[~sample['StageName'].isin(CLOSED)].reset_index(drop=True)
+    first, second, third = (open_deals.iloc[i].copy() for i in range(3))
+
+    # Same deal under a reformatted account, entered by another rep with older activity
+    reformatted = first.copy()
+    reformatted['Id'] = 'DUP-REFORMATTED'
+    reformatted['Account.Name'] = first['Account.Name'].upper() + ', Inc.'
+    reformatted['Name'] = reformatted['Account.Name'] + ' - Enterprise AI'
+    reformatted['Owner.Name'] = 'Jordan Blake'
+    reformatted['LastActivityDate'] = '2025-09-01'
+
+    # Misspelled account with newer activity: this copy is kept and the original collapses into it
+    account = second['Account.Name']
+    misspelled = second.copy()
+    misspelled['Id'] = 'DUP-MISSPELLED'
+    misspelled['Account.Name'] = account[0] + account[2] + account[1] + account[3:]
+    misspelled['Name'] = misspelled['Account.Name'] + ' - Enterprise AI'
+    misspelled['LastActivityDate'] = '2025-10-29'
+
+    # Other deals on the same account are not duplicates, nor are renewals for different years
+    renewals = []
+    for year in (2025, 2026):
+        renewal = first.copy()
+        renewal['Id'] = f'RENEWAL-{year}'
+        renewal['Name'] = f"{first['Account.Name']} - Renewal {year}"
+        renewals.append(renewal)
+
+    # Closed deals aren't in the pipeline, so they are left alone
+    closed = third.copy()
+    closed['Id'] = 'CLOSED-COPY'
+    closed['StageName'] = 'Closed Lost'
+
+    path = tmp_path_factory.mktemp('dedup') / 'export.csv'
+    pd.concat([sample, pd.DataFrame([reformatted, misspelled, *renewals, closed])]).to_csv(path, index=False)
+    return path, {'first': first['Id'], 'second': second['Id']}
+
+
+def test_duplicates_point_at_the_kept_deal(export):
+    path, base = export
+    with runner.connect() as con:
+        runner.score(con, path)
+        duplicates = dict(con.execute("SELECT id, duplicate_of FROM opportunity_duplicates").fetchall())
+    assert duplicates == {'DUP-REFORMATTED': base['first'], base['second']: 'DUP-MISSPELLED'}
+
+
+def test_duplicates_are_collapsed_before_aggregation(export):
+    path, base = export
+    totals = "SELECT COUNT(*), SUM(amount) FROM risk_analysis"
+    with runner.connect() as con:
+        runner.score(con, path)
+        collapsed = con.execute(totals).fetchone()
+        scored_ids = {row[0] for row in con.execute("SELECT id FROM risk_analysis").fetchall()}
+        amounts = dict(con.execute('SELECT "Id", CAST("Amount" AS DECIMAL(12,2)) FROM opportunity_export').fetchall())
+    with runner.connect() as con:
+        runner.score(con, path, keep_duplicates=True)
+        kept = con.execute(totals).fetchone()
+
+    assert 'DUP-REFORMATTED' not in scored_ids and base['second'] not in scored_ids
+    assert {'DUP-MISSPELLED', 'RENEWAL-2025', 'RENEWAL-2026'} <= scored_ids
+    assert kept[0] == collapsed[0] + 2
+    assert kept[1] == collapsed[1] + amounts['DUP-REFORMATTED'] + amounts[base['second']]
+
+
+def test_score_reuses_detected_duplicates(export, tmp_path):
+    path, base = export
+    duplicates = tmp_path / 'duplicates.parquet'
+    with runner.connect() as con:
+        runner.score(con, path)
+        con.execute(f"COPY (SELECT * FROM opportunity_duplicates WHERE id = 'DUP-REFORMATTED') "
+                    f"TO {runner.sql_literal(duplicates.as_posix())} (FORMAT PARQUET)")
+    with runner.connect() as con:
+        runner.score(con, path, duplicates=duplicates)
+        scored_ids = {row[0] for row in con.execute("SELECT id FROM risk_analysis").fetchall()}
+    assert 'DUP-REFORMATTED' not in scored_ids and base['second'] in scored_ids
+
+
+def test_repeated_deals_collapse_to_one_without_pairing_every_copy(tmp_path):
+    # 100 copies of each sample deal share a blocking key; each copy is only
+    # compared with its sorted neighbours, never all pairs
+    scaled = tmp_path / 'scaled.parquet'
+    with runner.connect() as con:
+        benchmark_out_of_core.scale_export(con, runner.DEFAULT_INPUT, 5000, scaled)
+        runner.score(con, scaled)
+        plan = con.execute("EXPLAIN SELECT * FROM opportunity_duplicates").fetchall()[0][1]
+        scored_ids = {row[0] for row in con.execute("SELECT id FROM risk_analysis").fetchall()}
+        open_ids = {row[0] for row in con.execute(
+            f'SELECT "Id" FROM {runner.source_scan(runner.DEFAULT_INPUT)} WHERE "StageName" NOT IN {tuple(CLOSED)}'
+        ).fetchall()}
+    assert 'NESTED_LOOP_JOIN' not in plan and 'CROSS_PRODUCT' not in plan
+    # Copies tie on activity, so the lowest Id (copy 0) is kept
+    assert scored_ids == {f'{id}-0' for id in open_ids}
@@ -0,0 +1,69 @@
+import json
+
+import pandas as pd
+import pytest
+
+import export_partitions
+import pipeline_runner as runner
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    """(output dir, manifest, alerts) for the sample export"""
+    output = tmp_path_factory.mktemp('alerts')
+    with runner.connect() as con:
+        runner.score(con)
+        alerts = runner.fetch_arrow(con.execute(runner.ALERTS_QUERY)).to_pandas()
+        manifest = export_partitions.export_partitions(con, output, max_workers=2)
+    return output, manifest, alerts
+
+
+def test_files_are_laid_out_by_owner_and_stage(exported):
+    output, manifest, alerts = exported
+    expected = {(owner, stage) for owner, stage in alerts[['owner_name', 'stage_name']].itertuples(index=False)}
+    for fmt, suffix in (('parquet', '.parquet'), ('ndjson', '.json')):
+        files = [f for f in manifest['files'] if f['format'] == fmt]
+        assert {(f['owner_name'], f['stage_name']) for f in files} == expected
+        for f in files:
+            path = output / f['path']
+            assert path.exists() and path.suffix == suffix
+            assert path.parent.name.startswith('stage_name=')
+            assert path.parent.parent.name.startswith('owner_name=')
+    assert json.loads((output / export_partitions.MANIFEST_FILE).read_text()) == manifest
+
+
+def test_manifest_counts_match_the_alerts(exported):
+    _, manifest, alerts = exported
+    parquet = pd.DataFrame([f for f in manifest['files'] if f['format'] == 'parquet'])
+    assert parquet['rows'].sum() == len(alerts)
+    counted = parquet.groupby(['owner_name', 'stage_name'])['rows'].sum()
+    assert counted.to_dict() == alerts.groupby(['owner_name', 'stage_name']).size().to_dict()
+    assert parquet['amount'].sum() == pytest.approx(alerts['amount'].sum())
+
+
+def test_ndjson_matches_its_parquet_partition(exported):
+    output, manifest, _ = exported
+    by_partition = {}
+    for f in manifest['files']:
+        by_partition.setdefault((f['owner_name'], f['stage_name']), {})[f['format']] = output / f['path']
+    with runner.connect() as con:
+        for paths in by_partition.values():
+            parquet = con.execute(
+                f"SELECT * FROM read_parquet({runner.sql_literal(paths['parquet'].as_posix())}, "
+                f"hive_partitioning = true) ORDER BY id"
+            ).df()
+            ndjson = pd.read_json(paths['ndjson'], lines=True).sort_values('id').reset_index(drop=True)
+            assert list(ndjson.columns) == list(parquet.columns)
+            assert ndjson['id'].tolist() == parquet['id'].tolist()
+            assert ndjson['risk_score'].tolist() == pytest.approx(parquet['risk_score'].tolist())
+
+
+def test_no_alerts_writes_an_empty_manifest(tmp_path):
+    sample = pd.read_csv(runner.DEFAULT_INPUT)
+    closed = tmp_path / 'closed.csv'
+    sample[sample['StageName'].isin(['Closed Won', 'Closed Lost'])].to_csv(closed, index=False)
+    with runner.connect() as con:
+        runner.score(con, closed)
+        manifest = export_partitions.export_partitions(con, tmp_path / 'alerts')
+    assert manifest == {'partition_by': list(export_partitions.PARTITION_COLUMNS), 'files': []}
+    assert json.loads((tmp_path / 'alerts' / export_partitions.MANIFEST_FILE).read_text()) == manifest
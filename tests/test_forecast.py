@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast
+import pipeline_runner as runner
+
+
+def deals_frame(probability, risk_score=0.0, n=4):
+    return pd.DataFrame({
+        'owner': [f'rep{i % 2}' for i in range(n)],
+        'risk_level': ['healthy'] * n,
+        'month': ['2025-11'] * n,
+        'amount': np.full(n, 1000, dtype='float32'),
+        'probability': np.full(n, probability, dtype='float32'),
+        'risk_score': np.full(n, risk_score, dtype='float32'),
+    })
+
+
+def test_certain_and_impossible_deals_are_deterministic():
+    won = forecast.run_forecast(deals_frame(1.0), simulations=200)
+    lost = forecast.run_forecast(deals_frame(0.0), simulations=200)
+    month = lambda f: f[f['grouping'] == 'month'].iloc[0]
+    assert month(won)[['p10', 'p50', 'p90']].tolist() == [4000, 4000, 4000]
+    assert month(lost)[['p10', 'p50', 'p90']].tolist() == [0, 0, 0]
+
+
+def test_risk_discount_halves_probability_at_max_score():
+    assert forecast.win_probability(np.array([0.8]), np.array([10.0]))[0] == pytest.approx(0.4)
+    assert forecast.win_probability(np.array([0.8]), np.array([0.0]))[0] == pytest.approx(0.8)
+
+
+def test_mean_tracks_the_expected_value():
+    deals = deals_frame(0.5, n=2000)
+    result = forecast.run_forecast(deals, simulations=2048, block_simulations=512)
+    total = result[result['grouping'] == 'month'].iloc[0]
+    assert total['mean'] == pytest.approx(1000 * 2000 * 0.5, rel=0.01)
+    assert total['weighted'] == pytest.approx(1000 * 2000 * 0.5)
+    assert total['p10'] < total['p50'] < total['p90']
+
+
+def test_same_seed_gives_the_same_forecast_whatever_the_thread_count():
+    deals = deals_frame(0.3, n=500)
+    one = forecast.run_forecast(deals, simulations=2048, block_simulations=256, workers=1)
+    four = forecast.run_forecast(deals, simulations=2048, block_simulations=256, workers=4)
+    pd.testing.assert_frame_equal(one, four)
+
+
+def test_groups_cover_every_owner_month_and_risk_level():
+    con = runner.connect()
+    runner.score(con)
+    deals = runner.fetch_arrow(con.execute(forecast.OPEN_DEALS_QUERY)).to_pandas()
+    result = forecast.run_forecast(deals, simulations=256)
+    for grouping in forecast.GROUPINGS:
+        rows = result[result['grouping'] == grouping]
+        assert set(rows['group']) == set(deals[grouping])
+        assert rows['weighted'].sum() == pytest.approx((deals['amount'] * deals['probability']).sum(), rel=1e-4)
+
+
+def test_deals_without_an_owner_are_forecast_as_unassigned(tmp_path):
+    opportunities = pd.read_csv(runner.DEFAULT_INPUT)
+    opportunities.loc[opportunities['Owner.Name'] == 'James Kim', 'Owner.Name'] = None
+    export = tmp_path / 'opportunities.csv'
+    opportunities.to_csv(export, index=False)
+    con = runner.connect()
+    runner.score(con, export)
+    deals = runner.fetch_arrow(con.execute(forecast.OPEN_DEALS_QUERY)).to_pandas()
+    result = forecast.run_forecast(deals, simulations=256)
+    owners = result[result['grouping'] == 'owner']
+    assert 'Unassigned' in set(owners['group']) and 'James Kim' not in set(owners['group'])
+    assert owners['weighted'].sum() == pytest.approx((deals['amount'] * deals['probability']).sum(), rel=1e-4)
@@ -0,0 +1,35 @@
+import pandas as pd
+import pyarrow as pa
+
+import generate_html_dashboard as dashboard
+
+EXPORT = """Id,Owner.Name,Amount,StageName
+1,Ana,100,Qualification
+2,,200,Qualification
+3,Ana,50,Closed Won
+"""
+
+
+def alerts_by_id():
+    return pd.DataFrame({'risk_level': ['at_risk'], 'risk_score': [5.0]}, index=pd.Index(['2'], name='id'))
+
+
+def test_unowned_open_deals_are_counted(tmp_path):
+    export = tmp_path / 'opportunities.csv'
+    export.write_text(EXPORT)
+
+    for budget in (dashboard.MEMORY_BUDGET_BYTES, 0):  # in one read, then chunked
+        aggregates = dashboard.load_deal_aggregates(export, alerts_by_id(), memory_budget=budget)
+        assert aggregates['deals'].sum() == 2
+        assert aggregates['amount'].sum() == 300
+        assert aggregates['scored_deals'].sum() == 1
+
+
+def test_chart_tooltips_pluralize_deal_counts():
+    heatmap = dashboard.render_amount_heatmap(pa.table({'days_bin': [0, 1], 'amount_bin': [8, 9], 'deals': [1, 2],
+                                                        'amount': [5e4, 1.2e5]}))
+    assert ': 1 deal, ' in heatmap and ': 2 deals, ' in heatmap
+
+    histogram = dashboard.render_score_histogram(pa.table({'score_bin': [4.0, 4.0],
+                                                           'risk_level': ['at_risk', 'high_risk'], 'deals': [1, 3]}))
+    assert '1 at risk deal<' in histogram and '3 high risk deals<' in histogram
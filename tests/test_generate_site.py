@@ -0,0 +1,64 @@
+import pandas as pd
+
+import generate_site
+import pipeline_runner as runner
+
+UNSAFE_OWNER = 'Amanda <b>Singh</b> & Co'
+
+
+def export_with_owners(path, renames):
+    opportunities = pd.read_csv(runner.DEFAULT_INPUT)
+    opportunities['Owner.Name'] = opportunities['Owner.Name'].replace(renames)
+    opportunities.to_csv(path, index=False)
+    return path
+
+
+def test_scoped_pages_are_titled_and_escaped(tmp_path):
+    export = export_with_owners(tmp_path / 'opportunities.csv', {'Amanda Singh': UNSAFE_OWNER})
+    generate_site.build_site(export, tmp_path / 'site', workers=1)
+
+    page = (tmp_path / 'site' / 'owners' / f'{generate_site.slugify(UNSAFE_OWNER)}.html').read_text()
+    assert '<title>Pipeline Health Checker - Amanda &lt;b&gt;Singh&lt;/b&gt; &amp; Co</title>' in page
+    assert '<b>Singh</b>' not in page
+    team = (tmp_path / 'site' / 'teams' / 'priya-natarajan.html').read_text()
+    assert '<title>Pipeline Health Checker - Team Priya Natarajan</title>' in team
+    index = (tmp_path / 'site' / 'index.html').read_text()
+    assert '<title>Pipeline Health Checker - Executive Dashboard</title>' in index
+
+
+def test_pages_for_departed_owners_are_pruned(tmp_path):
+    site = tmp_path / 'site'
+    generate_site.build_site(runner.DEFAULT_INPUT, site, workers=1)
+    assert (site / 'owners' / 'james-kim.html').exists()
+
+    export = export_with_owners(tmp_path / 'opportunities.csv', {'James Kim': 'Sarah Chen'})
+    generate_site.build_site(export, site, workers=1)
+    assert not (site / 'owners' / 'james-kim.html').exists()
+    assert (site / 'owners' / 'sarah-chen.html').exists()
+    assert 'owners/james-kim.html' not in (site / generate_site.MANIFEST_FILE).read_text()
+
+
+def test_deals_without_an_owner_get_an_unassigned_page(tmp_path):
+    opportunities = pd.read_csv(runner.DEFAULT_INPUT)
+    opportunities.loc[opportunities['Owner.Name'] == 'James Kim', 'Owner.Name'] = None
+    export = tmp_path / 'opportunities.csv'
+    opportunities.to_csv(export, index=False)
+    generate_site.build_site(export, tmp_path / 'site', workers=1)
+
+    page = (tmp_path / 'site' / 'owners' / 'unassigned.html').read_text()
+    assert '<title>Pipeline Health Checker - Unassigned</title>' in page
+    assert '<title>Pipeline Health Checker - Team Unassigned</title>' in (
+        tmp_path / 'site' / 'teams' / 'unassigned.html').read_text()
+    assert not (tmp_path / 'site' / 'owners' / 'james-kim.html').exists()
+
+
+def test_names_that_slugify_alike_get_their_own_pages(tmp_path):
+    export = export_with_owners(tmp_path / 'opportunities.csv', {'James Kim': 'Sarah-Chen'})
+    generate_site.build_site(export, tmp_path / 'site', workers=1)
+
+    pages = generate_site.page_paths('owners', ['Sarah Chen', 'Sarah-Chen', 'Ali'])
+    assert pages['Ali'] == 'owners/ali.html'
+    assert len(set(pages.values())) == 3
+    for owner in ('Sarah Chen', 'Sarah-Chen'):
+        page = (tmp_path / 'site' / pages[owner]).read_text()
+        assert f'<title>Pipeline Health Checker - {owner}</title>' in page
@@ -0,0 +1,69 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+import generate_html_dashboard as dashboard
+import pipeline_runner as runner
+
+
+@pytest.fixture(scope='module')
+def scored():
+    """Leaderboards and alerts for the sample export, from the scored snapshot as in runner.run()"""
+    with runner.connect() as con:
+        runner.score(con)
+        runner.snapshot_scores(con)
+        leaderboards = runner.fetch_leaderboards(con)
+        alerts = runner.fetch_alerts(con)
+        plan = con.execute(f"EXPLAIN {runner.LEADERBOARD_QUERY}").fetchall()[0][1]
+    return leaderboards, alerts, plan
+
+
+def test_sql_leaderboards_rank_each_segment(scored):
+    leaderboards, alerts, _ = scored
+    assert set(leaderboards['segment'].to_pylist()) == {'owner', 'stage', 'region'}
+    for segment, column in (('owner', 'owner_name'), ('stage', 'stage_name')):
+        board = leaderboards.filter(pc.equal(leaderboards['segment'], segment))
+        assert set(board['segment_value'].to_pylist()) == set(alerts[column].to_pylist())
+        for value in set(board['segment_value'].to_pylist()):
+            deals = board.filter(pc.equal(board['segment_value'], value)).to_pylist()
+            expected = sorted(
+                (row for row in alerts.to_pylist() if row[column] == value),
+                key=lambda row: (row['risk_score'], row['amount'], row['id']), reverse=True,
+            )[:dashboard.LEADERBOARD_SIZE]
+            assert [deal['id'] for deal in deals] == [row['id'] for row in expected]
+            assert [deal['rank'] for deal in deals] == list(range(1, len(expected) + 1))
+
+
+def test_sql_leaderboards_keep_n_rows_per_segment_instead_of_sorting(scored):
+    _, _, plan = scored
+    assert 'arg_max' in plan and 'WINDOW' not in plan
+
+
+def test_python_heaps_match_sql(scored):
+    leaderboards, alerts, _ = scored
+    ranked = dashboard.rank_leaderboards(alerts)
+    assert ranked.schema == leaderboards.schema
+    sql_rows = leaderboards.filter(pc.invert(pc.equal(leaderboards['segment'], 'region')))
+    assert ranked.to_pylist() == sql_rows.to_pylist()
+
+
+def test_top_alerts_break_ties_like_the_sql():
+    alerts = pa.table({
+        'id': ['a', 'b', 'c', 'd'],
+        'risk_score': [7.0, 9.0, 7.0, 7.0],
+        'amount': [100.0, 50.0, 100.0, None],
+    })
+    assert dashboard.top_alerts(alerts, 3)['id'].to_pylist() == ['b', 'c', 'a']
+    assert dashboard.top_alerts(alerts.slice(0, 0), 3).num_rows == 0
+
+
+def test_dashboard_renders_leaderboards(scored):
+    leaderboards, alerts, _ = scored
+    deal_aggregates = pa.table({'owner': ['Ana'], 'risk_level': ['at_risk'], 'deals': [1], 'scored_deals': [1],
+                                'amount': [1.0], 'risk_score': [5.0]}).to_pandas().set_index(['owner', 'risk_level'])
+    html = dashboard.render_dashboard(alerts, deal_aggregates, leaderboards=leaderboards)
+    assert 'Top Risks by Owner' in html and 'Top Risks by Region' in html
+
+    # Rendering only the top alerts without leaderboards leaves the tiles out
+    top_only = dashboard.render_dashboard(alerts.slice(0, 2), deal_aggregates, flagged=len(alerts))
+    assert 'Top Risks by' not in top_only
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import pipeline_runner as runner
+
+CLOSED = ['Closed Won', 'Closed Lost']
+
+# NextStep text and the next_step_score it should get (analysis date 2025-10-30)
+SCORED_NEXT_STEPS = {
+    'Follow up with team next week': 1,         # vague
+    'Waiting on customer': 1,                   # vague
+    'No response from champion': 2,             # stalled
+    'Ghosted after the pricing call': 2,        # stalled outranks a specific term
+    'Demo custom use case on 10/15': 2,         # dated, and the date has passed
+    'Check in on 11/5': 0,                      # vague but dated
+    'Kickoff on 12/15': 0,                      # read as this December
+    'Renewal call 5/1': 0,                      # more than six months back, so next May
+    'Send pricing proposal to procurement': 0,  # specific
+    'Follow up on contract redlines': 0,        # vague but specific
+    'Call': 1,                                  # two words or fewer
+    'Meeting Tuesday': 1,
+    'Demo': 0,                                  # short but specific
+}
+# Left to the missing-fields signal
+UNSCORED_NEXT_STEPS = ['', '   ', None]
+
+
+@pytest.fixture(scope='module')
+def scored(tmp_path_factory):
+    """(risk_analysis rows by NextStep, template deal's score without the signal) for copies of one open deal
+
+    The template scores 3 without the signal, in a stage that requires a next step.
+    """
+    with runner.connect() as con:
+        runner.score(con)
+        template_id, base = con.execute(
+            "SELECT id, overall_risk_score - next_step_score FROM risk_analysis "
+            "WHERE overall_risk_score - next_step_score = 3 AND stage_name IN "
+            "(SELECT stage_name FROM stage_requirements WHERE required_field = 'next_step') ORDER BY id LIMIT 1"
+        ).fetchone()
+
+    sample = pd.read_csv(runner.DEFAULT_INPUT)
+    template = sample[sample['Id'] == template_id].iloc[0]
+    copies = []
+    for i, next_step in enumerate([*SCORED_NEXT_STEPS, *UNSCORED_NEXT_STEPS]):
+        copy = template.copy()
+        copy['Id'] = f'NEXT-STEP-{i}'
+        copy['NextStep'] = next_step
+        copies.append(copy)
+    # Parquet keeps '' and NULL apart
+    export = tmp_path_factory.mktemp('next_step') / 'export.parquet'
+    pd.concat([sample[sample['StageName'].isin(CLOSED)], pd.DataFrame(copies)]).to_parquet(export, index=False)
+
+    with runner.connect() as con:
+        runner.score(con, export, keep_duplicates=True)
+        rows = con.execute("SELECT * FROM risk_analysis WHERE id LIKE 'NEXT-STEP-%' ORDER BY id").df()
+    by_step = {next_step: rows[rows['id'] == f'NEXT-STEP-{i}'].iloc[0]
+               for i, next_step in enumerate([*SCORED_NEXT_STEPS, *UNSCORED_NEXT_STEPS])}
+    return by_step, float(base)
+
+
+@pytest.mark.parametrize('next_step', list(SCORED_NEXT_STEPS))
+def test_each_next_step_class_scores_as_documented(scored, next_step):
+    by_step, _ = scored
+    assert by_step[next_step]['next_step_score'] == SCORED_NEXT_STEPS[next_step]
+
+
+@pytest.mark.parametrize('next_step', UNSCORED_NEXT_STEPS)
+def test_empty_and_missing_next_steps_are_not_scored(scored, next_step):
+    by_step, _ = scored
+    assert by_step[next_step]['next_step_score'] == 0
+    # The template's stage requires a next step, so each counts as a missing field instead
+    assert 'next_step' in by_step[next_step]['missing_field_list']
+    assert by_step[next_step]['overall_risk_score'] == by_step[None]['overall_risk_score']
+
+
+def test_next_step_score_moves_the_overall_score_and_level(scored):
+    by_step, base = scored
+    levels = {}
+    for next_step, points in SCORED_NEXT_STEPS.items():
+        row = by_step[next_step]
+        assert float(row['overall_risk_score']) == base + points
+        levels[points] = row['risk_level']
+    # A weak next step tips the template from healthy into at_risk
+    assert levels == {0: 'healthy', 1: 'at_risk', 2: 'at_risk'}
@@ -0,0 +1,64 @@
+import pyarrow.compute as pc
+import pytest
+
+import benchmark_out_of_core
+import pipeline_runner as runner
+
+
+@pytest.fixture(scope='module')
+def scaled_export(tmp_path_factory):
+    """5,000 opportunities repeated from the sample export (scored with keep_duplicates, like the benchmark)"""
+    path = tmp_path_factory.mktemp('export') / 'opportunities.parquet'
+    with runner.connect() as con:
+        benchmark_out_of_core.scale_export(con, runner.DEFAULT_INPUT, 5000, path)
+    return path
+
+
+def test_connect_applies_resource_limits(tmp_path):
+    limits = runner.resource_limits(memory_limit='300MB', spill_dir=tmp_path / 'spill', threads=1)
+    with runner.connect(limits=limits) as con:
+        settings = dict(con.execute(
+            "SELECT name, value FROM duckdb_settings() "
+            "WHERE name IN ('memory_limit', 'temp_directory', 'threads', 'preserve_insertion_order')"
+        ).fetchall())
+    assert settings['memory_limit'] == '286.1 MiB'
+    assert settings['temp_directory'] == (tmp_path / 'spill').as_posix()
+    assert settings['threads'] == '1'
+    assert settings['preserve_insertion_order'] == 'false'
+
+
+def test_resource_limits_keep_unset_settings(monkeypatch):
+    monkeypatch.setitem(runner.RESOURCE_LIMITS, 'threads', '2')
+    limits = runner.resource_limits(memory_limit='1GB')
+    assert limits['memory_limit'] == '1GB' and limits['threads'] == '2'
+
+
+def test_over_budget_dashboard_fetches_only_the_top_alerts(scaled_export):
+    with runner.connect() as con:
+        runner.score(con, scaled_export, keep_duplicates=True)
+        alerts, flagged = runner.fetch_dashboard_alerts(con, max_alerts=1, memory_budget=10 ** 12)
+        top, streamed_flagged = runner.fetch_dashboard_alerts(con, max_alerts=1, memory_budget=0)
+
+    assert len(alerts) == flagged == streamed_flagged
+    assert len(top) == runner.TOP_ALERTS
+    in_memory = alerts.sort_by([('risk_score', 'descending'), ('amount', 'descending')]).slice(0, runner.TOP_ALERTS)
+    assert top.select(['risk_score', 'amount']).to_pylist() == in_memory.select(['risk_score', 'amount']).to_pylist()
+    assert pc.all(pc.greater(pc.list_value_length(top['risk_factors']), 0)).as_py()
+
+
+def test_run_over_budget_renders_the_full_flagged_count(scaled_export):
+    with runner.connect(limits=runner.resource_limits(memory_limit='256MB', threads=1)) as con:
+        alerts, flagged, _, html = runner.run(con, scaled_export, use_cache=False, memory_budget=0,
+                                               keep_duplicates=True)
+        total = con.execute("SELECT COUNT(*) FROM risk_alerts").fetchone()[0]
+    assert len(alerts) == runner.TOP_ALERTS
+    assert flagged == total > runner.TOP_ALERTS
+    assert f"{total} deals flagged" in html
+
+
+def test_benchmark_stays_under_its_cap(tmp_path):
+    rows, seconds, peak, output = benchmark_out_of_core.run_benchmark(20_000, '256MB', 1, tmp_path)
+    assert rows == 20_000
+    assert 'deals flagged' in output
+    assert peak < benchmark_out_of_core.parse_bytes('1GB')
+    assert (tmp_path / 'dashboard.html').exists()
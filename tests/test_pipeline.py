@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+
+import pipeline
+import pipeline_runner as runner
+
+
+def copy_stage(name, source, target, deps=(), log=None):
+    """A stage that copies source to target, recording each run in log"""
+    def run():
+        if log is not None:
+            log.append(name)
+        target.write_text(source.read_text())
+    return pipeline.Stage(name, run, [source], [target], list(deps))
+
+
+@pytest.fixture
+def chain(tmp_path):
+    """raw -> a -> b, with a log of the stages that actually ran"""
+    raw, a, b = tmp_path / 'raw.txt', tmp_path / 'a.txt', tmp_path / 'b.txt'
+    raw.write_text('v1')
+    log = []
+    stages = {
+        'a': copy_stage('a', raw, a, log=log),
+        'b': copy_stage('b', a, b, deps=['a'], log=log),
+    }
+    return stages, raw, log, tmp_path / 'state.json'
+
+
+def test_unchanged_stages_are_skipped(chain):
+    stages, raw, log, state_file = chain
+    pipeline.run_pipeline(stages, state_file=state_file)
+    report = pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == ['a', 'b']
+    assert {name: status for name, (status, _) in report.items()} == {'a': 'skipped', 'b': 'skipped'}
+
+
+def test_changed_input_reruns_downstream(chain):
+    stages, raw, log, state_file = chain
+    pipeline.run_pipeline(stages, state_file=state_file)
+    raw.write_text('v2')
+    pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == ['a', 'b', 'a', 'b']
+
+
+def test_deleted_output_reruns_its_stage(chain):
+    stages, raw, log, state_file = chain
+    pipeline.run_pipeline(stages, state_file=state_file)
+    stages['b'].outputs[0].unlink()
+    pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == ['a', 'b', 'b']
+
+
+def test_failed_stage_keeps_completed_fingerprints(chain):
+    stages, raw, log, state_file = chain
+    run_b = stages['b'].run
+
+    def fail():
+        raise RuntimeError('boom')
+    stages['b'].run = fail
+
+    with pytest.raises(pipeline.StageError, match="stage 'b' failed: boom"):
+        pipeline.run_pipeline(stages, state_file=state_file)
+    state = pipeline.load_state(state_file)
+    assert 'a' in state['stages'] and 'b' not in state['stages']
+
+    stages['b'].run = run_b
+    report = pipeline.run_pipeline(stages, state_file=state_file)
+    assert report['a'][0] == 'skipped' and report['b'][0] == 'ran'
+
+
+def test_stages_after_a_failure_do_not_start(chain, tmp_path):
+    stages, raw, log, state_file = chain
+    stages['a'].run = lambda: 1 / 0
+    with pytest.raises(pipeline.StageError, match="stage 'a'"):
+        pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == []
+
+
+def test_unknown_dependency_fails_fast(chain):
+    stages, raw, log, state_file = chain
+    stages['b'].deps.append('missing')
+    with pytest.raises(ValueError, match="unknown stage.*missing"):
+        pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == []
+
+
+def test_dependency_cycle_fails_fast(chain):
+    stages, raw, log, state_file = chain
+    stages['a'].deps.append('b')
+    with pytest.raises(ValueError, match="cycle between stages: a, b"):
+        pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == []
+
+
+def test_full_pipeline_skips_everything_on_rerun(tmp_path):
+    stages = pipeline.build_stages(runner.DEFAULT_INPUT, tmp_path / 'alerts.json', tmp_path / 'dashboard.html',
+                                   quarantine=tmp_path / 'rejected.csv', work_dir=tmp_path / 'work')
+    state_file = tmp_path / 'state.json'
+    first = pipeline.run_pipeline(stages, state_file=state_file)
+    second = pipeline.run_pipeline(stages, state_file=state_file)
+    assert {status for status, _ in first.values()} == {'ran'}
+    assert {status for status, _ in second.values()} == {'skipped'}
+    assert 'Distribution Charts' in (tmp_path / 'dashboard.html').read_text()
+    assert 'Top Risks by Region' in (tmp_path / 'dashboard.html').read_text()
+
+
+def test_fingerprints_record_the_loaded_script(chain, monkeypatch):
+    stages, raw, log, state_file = chain
+    script = raw.parent / 'stage.py'
+    script.write_text('v2')
+    stages['a'].inputs.append(script)
+    monkeypatch.setattr(pipeline, 'LOADED_SCRIPTS', {str(script.resolve()): 'digest of v1'})
+    pipeline.run_pipeline(stages, state_file=state_file)
+
+    # A fresh process loads v2, which never ran, so the stage runs again
+    monkeypatch.setattr(pipeline, 'LOADED_SCRIPTS', {})
+    pipeline.run_pipeline(stages, state_file=state_file)
+    assert log == ['a', 'b', 'a']
+
+
+class Restarted(Exception):
+    pass
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_watch_keeps_going_after_a_failure_and_restarts_on_script_edits(chain, monkeypatch, capsys):
+    stages, raw, log, state_file = chain
+    copy_a = stages['a'].run
+    failures = []
+
+    def run_a():
+        if raw.read_text() == 'bad':
+            failures.append('a')
+            raise ValueError('bad input')
+        copy_a()
+    stages['a'].run = run_a
+
+    script = raw.parent / 'stage.py'
+    script.write_text('v1')
+    monkeypatch.setattr(pipeline, 'LOADED_SCRIPT_STATES', pipeline.file_states([script]))
+    restarts = []
+
+    def restart():
+        restarts.append(True)
+        raise Restarted()
+    monkeypatch.setattr(pipeline, 'restart', restart)
+
+    raw.write_text('bad')
+    errors = []
+
+    def run():
+        try:
+            pipeline.watch(stages, state_file=state_file, poll_seconds=0.01, debounce_seconds=0.05)
+        except Exception as e:
+            errors.append(e)
+    watcher = threading.Thread(target=run, daemon=True)
+    watcher.start()
+
+    wait_until(lambda: failures)
+    raw.write_text('good')
+    wait_until(lambda: log.count('b') == 1)
+    assert stages['b'].outputs[0].read_text() == 'good'
+
+    script.write_text('v2 with more code')
+    watcher.join(timeout=10)
+    assert not watcher.is_alive()
+    assert restarts and isinstance(errors[0], Restarted)
+    out = capsys.readouterr().out
+    assert "Stage 'a' failed: ValueError: bad input" in out
+    assert 'Scripts changed; restarting' in out
+
+
+def test_stages_fingerprint_the_scripts_they_run(tmp_path):
+    stages = pipeline.build_stages(runner.DEFAULT_INPUT, tmp_path / 'alerts.json', tmp_path / 'dashboard.html',
+                                   quarantine=tmp_path / 'rejected.csv', work_dir=tmp_path / 'work')
+    runner_source, model_source = pipeline.SCRIPTS_DIR / 'pipeline_runner.py', pipeline.SCRIPTS_DIR / 'risk_model.py'
+    for name in ('dedup', 'score'):
+        assert {runner_source, model_source} <= set(stages[name].inputs), name
+    for name in ('export', 'aggregate'):
+        assert runner_source in stages[name].inputs, name
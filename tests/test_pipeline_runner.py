@@ -0,0 +1,93 @@
+import functools
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import pipeline_runner as runner
+import result_cache
+
+
+@pytest.fixture(scope='module')
+def tied_export(tmp_path_factory):
+    """The sample export plus copies of its top alert: same score, some with the same amount"""
+    sample = pd.read_csv(runner.DEFAULT_INPUT)
+    with runner.connect() as con:
+        runner.score(con)
+        top_id = con.execute(runner.TOP_ALERTS_QUERY).fetchone()[0]
+    top = sample[sample['Id'] == top_id].iloc[0]
+    copies = [top.copy() for _ in range(4)]
+    for i, copy in enumerate(copies):
+        copy['Id'] = f'TIE-{i}'
+        copy['Amount'] = top['Amount'] if i % 2 else top['Amount'] - 1000
+    path = tmp_path_factory.mktemp('ties') / 'export.csv'
+    # Copies first, so insertion order disagrees with the tie-break
+    pd.concat([pd.DataFrame(copies), sample]).to_csv(path, index=False)
+    return path
+
+
+def rank_key(alert):
+    return alert['risk_score'], alert['amount'], alert['id']
+
+
+def test_alerts_break_ties_on_amount_then_id(tied_export):
+    with runner.connect() as con:
+        runner.score(con, tied_export, keep_duplicates=True)
+        alerts = runner.fetch_alerts(con).to_pylist()
+    keys = [rank_key(alert) for alert in alerts]
+    assert keys == sorted(keys, reverse=True)
+    assert len({key[:2] for key in keys}) < len(keys)  # the export really has ties
+
+
+def test_run_hands_the_scored_alerts_to_the_renderer_as_arrow(tied_export):
+    with runner.connect() as con:
+        alerts, flagged, deal_aggregates, html = runner.run(con, tied_export, use_cache=False, keep_duplicates=True)
+    with runner.connect() as con:
+        runner.score(con, tied_export, keep_duplicates=True)
+        expected = runner.fetch_arrow(con.execute(runner.ALERTS_QUERY))
+        deals = con.execute("SELECT COUNT(*), SUM(amount) FROM risk_analysis").fetchone()
+
+    assert isinstance(alerts, pa.Table) and alerts.equals(expected)
+    assert alerts.schema.field('risk_factors').type == pa.list_(pa.string())
+    assert flagged == alerts.num_rows
+    assert deal_aggregates['deals'].sum() == deals[0]
+    assert deal_aggregates['amount'].sum() == pytest.approx(float(deals[1]))
+    assert f'{flagged} deals flagged' in html
+    top = max(alerts.to_pylist(), key=rank_key)
+    assert top['account_name'] in html
+
+
+def test_run_is_served_from_the_cache_on_a_second_call(tied_export, tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, 'load', functools.partial(result_cache.load, cache_dir=tmp_path))
+    monkeypatch.setattr(result_cache, 'store', functools.partial(result_cache.store, cache_dir=tmp_path))
+    with runner.connect() as con:
+        first = runner.run(con, tied_export, keep_duplicates=True)
+
+    def no_snapshot(con):
+        raise AssertionError('scored again on a cache hit')
+
+    monkeypatch.setattr(runner, 'snapshot_scores', no_snapshot)
+    with runner.connect() as con:
+        second = runner.run(con, tied_export, keep_duplicates=True)
+    assert second[0].equals(first[0]) and second[1] == first[1] and second[3] == first[3]
+    pd.testing.assert_frame_equal(second[2], first[2])
+
+
+def test_fetch_arrow_and_batches_agree():
+    with runner.connect() as con:
+        runner.score(con)
+        table = runner.fetch_arrow(con.execute(runner.ALERTS_QUERY))
+        batches = list(runner.arrow_batches(con.execute(runner.ALERTS_QUERY), batch_rows=2))
+    assert isinstance(table, pa.Table)
+    assert all(batch.num_rows <= 2 for batch in batches)
+    assert pa.Table.from_batches(batches, table.schema).equals(table)
+
+
+def test_analysis_date_is_parsed_before_it_reaches_the_sql():
+    as_string = runner.load_scoring_sql(analysis_date='2025-07-01')
+    assert as_string == runner.load_scoring_sql(analysis_date=date(2025, 7, 1))
+    assert any("DATE '2025-07-01' as analysis_date" in stmt for stmt in as_string)
+    for bad in ("2025-07-01' as analysis_date; DROP TABLE risk_rules; --", '2025-13-01', 'yesterday'):
+        with pytest.raises(ValueError):
+            runner.load_scoring_sql(analysis_date=bad)
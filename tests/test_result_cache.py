@@ -0,0 +1,94 @@
+import os
+import shutil
+
+import pyarrow as pa
+import pytest
+
+import pipeline_runner as runner
+import result_cache
+
+EXPORT = runner.DEFAULT_INPUT
+
+
+@pytest.fixture
+def code(tmp_path, monkeypatch):
+    """Copies of the renderer, runner and risk model sources the key hashes, so a test can edit them"""
+    renderer = tmp_path / 'generate_html_dashboard.py'
+    queries = tmp_path / 'pipeline_runner.py'
+    model = tmp_path / 'risk_model.py'
+    shutil.copy(result_cache.RENDERER_SOURCE, renderer)
+    shutil.copy(result_cache.QUERIES_SOURCE, queries)
+    shutil.copy(result_cache.MODEL_SOURCE, model)
+    monkeypatch.setattr(result_cache, 'RENDERER_SOURCE', renderer)
+    monkeypatch.setattr(result_cache, 'QUERIES_SOURCE', queries)
+    monkeypatch.setattr(result_cache, 'MODEL_SOURCE', model)
+    return renderer, queries, model
+
+
+def key_for(input_path, analysis_date=None):
+    con = runner.connect()
+    runner.score(con, input_path, analysis_date=analysis_date)
+    return result_cache.cache_key(con, input_path, runner.load_scoring_sql(analysis_date=analysis_date))
+
+
+def test_key_is_stable_for_identical_inputs(code):
+    assert key_for(EXPORT) == key_for(EXPORT)
+
+
+def test_key_changes_with_input_bytes(code, tmp_path):
+    edited = tmp_path / 'opportunities.csv'
+    edited.write_text(EXPORT.read_text().replace('75000', '75001', 1))
+    assert key_for(edited) != key_for(EXPORT)
+
+
+def test_key_changes_with_analysis_date(code):
+    assert key_for(EXPORT, analysis_date='2025-11-30') != key_for(EXPORT)
+
+
+def test_key_changes_with_the_risk_model(code, tmp_path):
+    con = runner.connect()
+    runner.score(con, model=None)
+    model = tmp_path / 'risk_model.json'
+
+    def key():
+        return result_cache.cache_key(con, EXPORT, runner.load_scoring_sql(), model)
+
+    without_model = key()
+    model.write_text('{"intercept": 0.1}')
+    with_model = key()
+    model.write_text('{"intercept": 0.2}')
+    assert len({without_model, with_model, key()}) == 3
+
+
+@pytest.mark.parametrize('source', [0, 1, 2], ids=['renderer', 'runner queries', 'risk model'])
+def test_key_changes_when_code_changes(code, source):
+    before = key_for(EXPORT)
+    with open(code[source], 'a') as f:
+        f.write('\n# edited\n')
+    assert key_for(EXPORT) != before
+
+
+def test_store_then_load_round_trips(tmp_path):
+    alerts = pa.table({'id': ['a', 'b'], 'risk_score': [7.0, 4.5]})
+    con = runner.connect()
+    runner.score(con)
+    aggregates = runner.fetch_deal_aggregates(con)
+
+    result_cache.store('k1', alerts, aggregates, '<html>', cache_dir=tmp_path)
+    loaded_alerts, loaded_aggregates, html = result_cache.load('k1', cache_dir=tmp_path)
+    assert loaded_alerts.equals(alerts)
+    assert loaded_aggregates.equals(aggregates)
+    assert html == '<html>'
+    assert result_cache.load('missing', cache_dir=tmp_path) is None
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    for key in ['old', 'new']:
+        entry = tmp_path / key
+        entry.mkdir()
+        (entry / result_cache.HTML_FILE).write_text('x' * 1000)
+    os.utime(tmp_path / 'old', (1, 1))
+
+    result_cache.evict(tmp_path, max_bytes=1500)
+    assert not (tmp_path / 'old').exists()
+    assert (tmp_path / 'new').exists()
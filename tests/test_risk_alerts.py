@@ -0,0 +1,98 @@
+import pytest
+
+import pipeline_runner as runner
+
+SIGNAL_SCORES = {
+    'time_in_stage': 'time_in_stage_score',
+    'activity_gap': 'activity_gap_score',
+    'missing_field': 'missing_fields_score',
+    'close_date': 'close_date_score',
+    'competitor': 'competitor_score',
+    'next_step': 'next_step_score',
+}
+DAYS = {'time_in_stage': 'days_in_stage', 'activity_gap': 'days_since_activity', 'close_date': 'days_to_close'}
+
+
+def render(template, deal, rule_type):
+    """A risk_rules template filled in for one deal, as the view should render it"""
+    days = deal[DAYS[rule_type]] if rule_type in DAYS else None
+    pct = round(deal['days_in_stage'] * 100 / deal['benchmark_max']) if deal['benchmark_max'] else None
+    values = {
+        'stage': deal['stage_name'],
+        'days': None if days is None else abs(days),
+        'benchmark_max': deal['benchmark_max'],
+        'pct_over_benchmark': pct,
+        'competitor': deal['competitor'],
+        'missing_fields': deal['missing_field_list'],
+        'next_step': deal['next_step'],
+    }
+    for name, value in values.items():
+        template = template.replace(f'{{{name}}}', '' if value is None else str(value))
+    return template
+
+
+def expected_reasons(deal, rules):
+    """(risk_factors, recommended_actions): every rule whose signal scores above 0, strongest first"""
+    fired = []
+    for rule in rules:
+        score = deal[SIGNAL_SCORES[rule['rule_type']]]
+        if not score or score <= 0:
+            continue
+        if rule['rule_type'] == 'close_date' and not (rule['threshold_low'] <= deal['days_to_close']
+                                                      < rule['threshold_med']):
+            continue
+        fired.append((-score, rule['rule_id'], render(rule['message_template'], deal, rule['rule_type']),
+                      render(rule['action_template'], deal, rule['rule_type'])))
+    fired.sort()
+    actions = [action for *_, action in fired][:3] or ['Review deal status with account executive']
+    return [message for *_, message, _ in fired], actions
+
+
+@pytest.fixture(scope='module')
+def con():
+    con = runner.connect()
+    runner.score(con)
+    return con
+
+
+def fetch_dicts(con, sql):
+    return runner.fetch_arrow(con.execute(sql)).to_pylist()
+
+
+def test_each_factor_and_action_renders_exactly_when_its_signal_scores(con):
+    rules = fetch_dicts(con, "SELECT * FROM risk_rules")
+    alerts = fetch_dicts(con, "SELECT * FROM risk_alerts ORDER BY id")
+    assert alerts
+    fired_types = set()
+    for alert in alerts:
+        assert (alert['risk_factors'], alert['recommended_actions']) == expected_reasons(alert, rules), alert['id']
+        fired_types |= {rule['rule_type'] for rule in rules if alert[SIGNAL_SCORES[rule['rule_type']]] > 0}
+    # The sample exercises every signal
+    assert fired_types == set(SIGNAL_SCORES)
+
+
+def test_only_flagged_deals_are_alerts(con):
+    flagged = con.execute("SELECT COUNT(*) FROM risk_analysis WHERE risk_level IN ('at_risk', 'high_risk')").fetchone()
+    assert con.execute("SELECT COUNT(*) FROM risk_alerts").fetchone() == flagged
+
+
+def test_template_placeholders_are_filled(con):
+    assert con.execute(
+        "SELECT risk_template_format('{stage}|{days}|{benchmark_max}|{pct_over_benchmark}|{competitor}|"
+        "{missing_fields}|{next_step}|{unknown}')"
+    ).fetchone()[0] == '{0}|{1}|{2}|{3}|{4}|{5}|{6}|{unknown}'
+
+    template = '{stage}|{days}|{benchmark_max}|{pct_over_benchmark}|{competitor}|{missing_fields}|{next_step}'
+    con.execute("CREATE TEMP TABLE saved_rules AS SELECT * FROM risk_rules")
+    try:
+        con.execute("INSERT INTO risk_rules VALUES ('every_placeholder', 'time_in_stage', 1, 1, 1, 0, 0, 0, ?, ?)",
+                    [template, template])
+        alerts = fetch_dicts(con, "SELECT * FROM risk_alerts WHERE time_in_stage_score > 0")
+    finally:
+        con.execute("CREATE OR REPLACE TABLE risk_rules AS SELECT * FROM saved_rules")
+    assert alerts
+    for alert in alerts:
+        rendered = render(template, alert, 'time_in_stage')
+        assert rendered in alert['risk_factors'] and '{' not in rendered
+    assert not any('{' in text for alert in fetch_dicts(con, "SELECT * FROM risk_alerts")
+                   for text in alert['risk_factors'] + alert['recommended_actions'])
@@ -0,0 +1,122 @@
+import json
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+import generate_html_dashboard as dashboard
+import pipeline_runner as runner
+import risk_model
+
+AS_OF = '2025-10-30'
+
+
+def synthetic_deals(n, seed=0):
+    """Signals drawn like the scored export, with losses driven by activity gap, competitor and days to close"""
+    rng = np.random.default_rng(seed)
+    columns = {name: rng.integers(0, 3, n).astype('float64') for name in risk_model.FEATURES[:6]}
+    columns['days_in_stage'] = rng.integers(0, 200, n).astype('float64')
+    columns['days_since_activity'] = rng.integers(0, 60, n).astype('float64')
+    columns['days_to_close'] = rng.integers(-30, 120, n).astype('float64')
+    features = risk_model.feature_matrix(columns)
+    features[rng.random(n) < 0.05, risk_model.FEATURES.index('days_since_activity')] = np.nan
+    log_odds = (-2.0 + 0.8 * columns['activity_gap_score'] + 1.0 * columns['competitor_score']
+                - 0.01 * columns['days_to_close'])
+    lost = (rng.random(n) < 1 / (1 + np.exp(-log_odds))).astype('float64')
+    return features, lost
+
+
+@pytest.fixture(scope='module')
+def model():
+    features, lost = synthetic_deals(200_000)
+    return risk_model.train(features, lost)
+
+
+def test_training_recovers_the_signals_that_drive_losses(model):
+    coefficients = model['coefficients']
+    assert coefficients['activity_gap_score'] == pytest.approx(0.8, abs=0.1)
+    assert coefficients['competitor_score'] == pytest.approx(1.0, abs=0.1)
+    assert coefficients['days_to_close'] == pytest.approx(-0.01, abs=0.003)
+    assert abs(coefficients['time_in_stage_score']) < 0.1
+
+    features, lost = synthetic_deals(20_000, seed=1)
+    assert risk_model.auc(risk_model.predict(model, features), lost) > 0.7
+
+
+def test_sql_expression_matches_numpy(model):
+    features, _ = synthetic_deals(1000, seed=2)
+    features[::7, risk_model.FEATURES.index('days_to_close')] = 900  # past the clip
+    frame = pd.DataFrame(features, columns=risk_model.FEATURES).astype('Float64')  # NaN -> NULL
+    sql = duckdb.sql(f"SELECT {risk_model.model_expression(model)} AS p FROM frame").fetchnumpy()['p']
+    np.testing.assert_allclose(sql, risk_model.predict(model, risk_model.feature_matrix(
+        {name: features[:, i] for i, name in enumerate(risk_model.FEATURES)})), rtol=1e-9)
+
+
+def test_auc_counts_ties_as_half():
+    scores = np.array([0.1, 0.4, 0.4, 0.8, 0.4])
+    lost = np.array([0, 1, 0, 1, 0])
+    pairs = [(p, n) for p in scores[lost == 1] for n in scores[lost == 0]]
+    expected = np.mean([1.0 if p > n else 0.5 if p == n else 0.0 for p, n in pairs])
+    assert risk_model.auc(scores, lost) == pytest.approx(expected)
+
+
+def test_score_fills_loss_probability_when_a_model_exists(model, tmp_path):
+    model_file = tmp_path / 'risk_model.json'
+    risk_model.save_model(model, model_file)
+
+    with runner.connect() as con:
+        runner.score(con, model=tmp_path / 'missing.json')
+        assert con.execute("SELECT COUNT(loss_probability) FROM risk_analysis").fetchone()[0] == 0
+
+    with runner.connect() as con:
+        runner.score(con, model=model_file)
+        scored = runner.fetch_arrow(con.execute("SELECT * FROM risk_analysis"))
+        alerts = con.execute("SELECT COUNT(loss_probability), COUNT(*) FROM risk_alerts").fetchone()
+    expected = risk_model.predict(model, risk_model.arrow_features(scored))
+    np.testing.assert_allclose(scored['loss_probability'].to_numpy(), expected, rtol=1e-9)
+    assert alerts[0] == alerts[1] > 0
+
+
+def test_loss_probability_is_reported_next_to_the_risk_score(model, tmp_path):
+    model_file = tmp_path / 'risk_model.json'
+    risk_model.save_model(model, model_file)
+    with runner.connect() as con:
+        runner.score(con, model=model_file)
+        expected = dict(con.execute("SELECT id, ROUND(loss_probability, 3) FROM risk_alerts").fetchall())
+        alerts = runner.fetch_alerts(con)
+        leaderboards = runner.fetch_leaderboards(con)
+        runner.export_json(con, tmp_path / 'alerts.json')
+        html = dashboard.render_dashboard(alerts, runner.fetch_deal_aggregates(con))
+
+    assert dict(zip(alerts['id'].to_pylist(), alerts['loss_probability'].to_pylist())) == expected
+    assert {row['id']: row['loss_probability'] for row in json.loads((tmp_path / 'alerts.json').read_text())} == expected
+    assert all(row['loss_probability'] == expected[row['id']] for row in leaderboards.to_pylist())
+    top = dashboard.top_alerts(alerts, 1).to_pylist()[0]
+    assert '<th>Loss Prob.</th>' in html and f"<td>{dashboard.format_probability(top['loss_probability'])}</td>" in html
+
+    with runner.connect() as con:
+        runner.score(con, model=None)
+        html = dashboard.render_dashboard(runner.fetch_alerts(con), runner.fetch_deal_aggregates(con))
+    assert 'Loss Prob.' not in html
+
+
+def test_labelled_deals_train_end_to_end(tmp_path):
+    export = pd.read_csv(runner.DEFAULT_INPUT)
+    open_deals = export[~export['StageName'].isin(['Closed Won', 'Closed Lost'])]
+    snapshot = tmp_path / 'snapshot.csv'
+    open_deals.to_csv(snapshot, index=False)
+    outcomes = open_deals.assign(
+        StageName=['Closed Lost' if i % 3 == 0 else 'Closed Won' for i in range(len(open_deals))]
+    )
+    outcomes_path = tmp_path / 'outcomes.csv'
+    outcomes.to_csv(outcomes_path, index=False)
+
+    with runner.connect() as con:
+        runner.score(con, snapshot, analysis_date=AS_OF, model=None)
+        features, risk_score, lost = risk_model.load_labelled(con, outcomes_path)
+    assert features.shape == (len(open_deals), len(risk_model.FEATURES))
+    assert lost.sum() == len(range(0, len(open_deals), 3))
+    model = risk_model.train(features, lost, epochs=2, batch_size=16)
+    assert set(model['coefficients']) == set(risk_model.FEATURES)
+    assert np.all((risk_model.predict(model, features) > 0) & (risk_model.predict(model, features) < 1))
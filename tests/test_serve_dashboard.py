@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import pipeline_runner as runner
+import serve_dashboard
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    export = tmp_path_factory.mktemp('serve') / 'opportunities.csv'
+    export.write_bytes(runner.DEFAULT_INPUT.read_bytes())
+    data = serve_dashboard.DashboardData(export)
+    data.rescore()
+    httpd = serve_dashboard.PooledHTTPServer(('127.0.0.1', 0), serve_dashboard.DashboardHandler, data, workers=4)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}', data
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_etag_revalidation_returns_304(server):
+    base, _ = server
+    status, headers, body = get(f'{base}/api/alerts?page_size=5')
+    assert status == 200 and len(json.loads(body)['alerts']) == 5
+    etag = headers['ETag']
+
+    status, headers, body = get(f'{base}/api/alerts?page_size=5', {'If-None-Match': etag})
+    assert (status, body, headers['ETag']) == (304, b'', etag)
+
+    status, _, _ = get(f'{base}/api/alerts?page_size=5', {'If-None-Match': '"stale"'})
+    assert status == 200
+
+
+def test_rescore_changes_the_etag_only_when_the_body_changes(server):
+    base, data = server
+    _, before, _ = get(f'{base}/')
+    version = data.version
+    request = urllib.request.Request(f'{base}/api/rescore', method='POST')
+    with urllib.request.urlopen(request) as response:
+        assert json.loads(response.read())['version'] == version + 1
+    _, after, _ = get(f'{base}/')
+    assert after['ETag'] == before['ETag']
+
+
+def test_failed_rescore_returns_a_json_error(server, monkeypatch):
+    base, data = server
+    version = data.version
+
+    def broken():
+        raise ValueError('export is unreadable')
+
+    monkeypatch.setattr(data, 'rescore', broken)
+    request = urllib.request.Request(f'{base}/api/rescore', method='POST')
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request)
+    assert error.value.code == 500
+    assert json.loads(error.value.read()) == {'error': 'rescore failed: export is unreadable'}
+    assert data.version == version and get(f'{base}/')[0] == 200
+
+
+def test_filters_pagination_and_drill_down(server):
+    base, _ = server
+    _, _, body = get(f'{base}/api/alerts?risk_level=high_risk&page_size=500')
+    page = json.loads(body)
+    assert page['total'] == len(page['alerts']) > 0
+    assert {alert['risk_level'] for alert in page['alerts']} == {'high_risk'}
+
+    deal_id = page['alerts'][0]['id']
+    status, _, body = get(f'{base}/api/deals/{deal_id}')
+    assert status == 200 and json.loads(body)['id'] == deal_id
+    assert get(f'{base}/api/deals/missing')[0] == 404
+
+
+def test_bad_parameters_are_rejected(server):
+    base, _ = server
+    status, _, body = get(f'{base}/api/alerts?page_size=0')
+    assert status == 400 and 'page_size' in json.loads(body)['error']
+
+
+def test_concurrent_misses_build_once():
+    cache = serve_dashboard.ResponseCache()
+    calls = []
+    gate = threading.Event()
+
+    def build():
+        calls.append(1)
+        gate.wait(1)
+        return 'entry'
+    threads = [threading.Thread(target=cache.get_or_build, args=('key', build)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)  # every thread is now waiting on the one build
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and cache.get_or_build('key', build) == 'entry'
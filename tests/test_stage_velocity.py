@@ -0,0 +1,80 @@
+import hashlib
+import subprocess
+import sys
+
+import pytest
+
+import pipeline_runner as runner
+import stage_velocity
+from generate_salesforce_data import DEFAULT_OUTPUT
+
+# Deal A advances, regresses, re-enters Solution Mapping and wins; deal B is lost
+HISTORY = """OpportunityId,Field,OldValue,NewValue,CreatedDate
+A,StageName,,Qualification,2025-01-01 00:00:00
+A,StageName,Qualification,Solution Mapping,2025-01-11 00:00:00
+A,StageName,Solution Mapping,Qualification,2025-01-21 00:00:00
+A,StageName,Qualification,Solution Mapping,2025-01-26 00:00:00
+A,StageName,Solution Mapping,Closed Won,2025-02-05 00:00:00
+B,StageName,,Qualification,2025-01-01 00:00:00
+B,StageName,Qualification,Closed Lost,2025-01-05 00:00:00
+"""
+
+
+@pytest.fixture
+def velocity(tmp_path):
+    history = tmp_path / 'history.csv'
+    history.write_text(HISTORY)
+
+    def analyze(**kwargs):
+        con = runner.connect()
+        stage_velocity.configure(con, tmp_path / 'spill')
+        paths = stage_velocity.analyze(con, history, tmp_path / 'velocity', **kwargs)
+        return con, paths
+    return analyze
+
+
+def rows(con, source, order):
+    return con.execute(f"SELECT * FROM {source} ORDER BY {order}").df()
+
+
+def test_repeat_visits_are_summed_per_deal(velocity):
+    con, paths = velocity()
+    durations = rows(con, stage_velocity.bucket_scan(paths['deal_stage_durations']), 'opportunity_id, stage_name')
+    a = durations[durations['opportunity_id'] == 'A'].set_index('stage_name')
+    assert a.loc['Solution Mapping', 'visits'] == 2
+    assert a.loc['Solution Mapping', 'days_in_stage'] == pytest.approx(20)
+    assert a.loc['Qualification', 'days_in_stage'] == pytest.approx(15)
+    assert a.loc['Solution Mapping', 'regressions'] == 1
+
+
+def test_velocity_rates_and_cycle_time(velocity):
+    con, paths = velocity()
+    stages = rows(con, runner.source_scan(paths['stage_velocity']), 'stage_name').set_index('stage_name')
+    assert stages.loc['Qualification', 'deals'] == 2
+    assert stages.loc['Qualification', 'loss_rate'] == pytest.approx(1 / 3)
+    assert stages.loc['Solution Mapping', 'regress_rate'] == pytest.approx(1 / 2)
+
+    cycle = rows(con, runner.source_scan(paths['cycle_time']), 'outcome').set_index('outcome')
+    assert cycle.loc['Closed Won', 'median_days'] == pytest.approx(35, abs=0.5)
+    assert cycle.loc['Closed Lost', 'median_days'] == pytest.approx(4, abs=0.5)
+
+
+def test_bucket_count_does_not_change_the_results(velocity):
+    con, one = velocity()
+    one_bucket = rows(con, runner.source_scan(one['stage_velocity']), 'stage_name')
+    con, many = velocity(events_per_bucket=2)
+    assert len(list(many['stage_intervals'].glob('bucket=*'))) > 1
+    assert rows(con, runner.source_scan(many['stage_velocity']), 'stage_name').equals(one_bucket)
+
+
+def test_history_alone_leaves_the_snapshot_untouched(tmp_path):
+    before = hashlib.sha256(DEFAULT_OUTPUT.read_bytes()).hexdigest()
+    snapshot = DEFAULT_OUTPUT.read_bytes()
+    try:
+        subprocess.run([sys.executable, str(runner.PROJECT_ROOT / 'scripts' / 'generate_salesforce_data.py'),
+                        '--history', str(tmp_path / 'history.csv'), '--history-deals', '50'],
+                       check=True, capture_output=True)
+        assert hashlib.sha256(DEFAULT_OUTPUT.read_bytes()).hexdigest() == before
+        assert (tmp_path / 'history.csv').exists()
+    finally:
+        DEFAULT_OUTPUT.write_bytes(snapshot)
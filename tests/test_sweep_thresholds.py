@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+import pipeline_runner as runner
+import sweep_thresholds
+
+AS_OF = '2025-10-30'
+
+
+@pytest.fixture
+def labelled(tmp_path):
+    """Open deals from the sample export, some missing activity or close dates, labelled with outcomes"""
+    export = pd.read_csv(runner.DEFAULT_INPUT)
+    open_deals = export[~export['StageName'].isin(['Closed Won', 'Closed Lost'])].copy()
+    open_deals.iloc[::3, open_deals.columns.get_loc('LastActivityDate')] = None
+    open_deals.iloc[1::3, open_deals.columns.get_loc('CloseDate')] = None
+    snapshot = tmp_path / 'snapshot.csv'
+    open_deals.to_csv(snapshot, index=False)
+
+    outcomes = open_deals.copy()
+    outcomes['StageName'] = ['Closed Lost' if i % 2 else 'Closed Won' for i in range(len(outcomes))]
+    outcomes_path = tmp_path / 'outcomes.csv'
+    outcomes.to_csv(outcomes_path, index=False)
+
+    con = runner.connect()
+    runner.score(con, snapshot, analysis_date=AS_OF)
+    deals = runner.fetch_arrow(con.execute(
+        sweep_thresholds.LABELLED_DEALS_QUERY.format(outcomes=runner.source_scan(outcomes_path))
+    )).to_pandas()
+    return con, deals
+
+
+def test_missing_dates_do_not_crash_the_sweep(labelled):
+    con, deals = labelled
+    assert deals['days_since_activity'].isna().any() and deals['days_to_close'].isna().any()
+    results = sweep_thresholds.sweep(deals)
+    assert len(results) == len(sweep_thresholds.pairs(sweep_thresholds.STAGE_CUTS)) * len(
+        sweep_thresholds.pairs(sweep_thresholds.ACTIVITY_CUTS)) * len(
+        sweep_thresholds.pairs(sweep_thresholds.CLOSE_CUTS)) * len(sweep_thresholds.LEVEL_CUTOFFS)
+
+
+def test_current_thresholds_reproduce_the_sql_flags(labelled):
+    con, deals = labelled
+    results = sweep_thresholds.sweep(deals)
+    current = results[sweep_thresholds.is_current(results)].iloc[0]
+    sql_flagged = con.execute(
+        "SELECT COUNT(*) FROM risk_analysis WHERE risk_level <> 'healthy' AND id IN (SELECT UNNEST(?))",
+        [deals['id'].tolist()],
+    ).fetchone()[0]
+    assert current['flagged'] == sql_flagged
+
+
+def test_recall_by_reason_handles_missing_dates(labelled):
+    con, deals = labelled
+    by_reason = sweep_thresholds.recall_by_reason(deals, sweep_thresholds.CURRENT)
+    assert by_reason['size'].sum() == deals['lost'].sum()
@@ -0,0 +1,26 @@
+import pytest
+
+import pipeline_runner as runner
+
+
+@pytest.fixture(scope='module')
+def con():
+    con = runner.connect()
+    runner.score(con)
+    return con
+
+
+def test_rollup_average_matches_dashboard_aggregates(con):
+    aggregates = runner.fetch_deal_aggregates(con).groupby(level='owner').sum()
+    rollups = runner.fetch_rollups(con, levels=('owner',)).to_pandas().set_index('owner_name')
+    assert con.execute("SELECT COUNT(*) FROM risk_analysis WHERE risk_level = 'healthy' "
+                       "AND overall_risk_score > 0").fetchone()[0] > 0
+    for owner, row in aggregates.iterrows():
+        assert rollups.loc[owner, 'avg_risk_score'] == pytest.approx(row['risk_score'] / row['deals'], abs=0.005)
+
+
+def test_every_level_covers_every_deal(con):
+    total = con.execute("SELECT COUNT(*) FROM risk_analysis").fetchone()[0]
+    rollups = runner.fetch_rollups(con, levels=('segment', 'region', 'manager', 'owner')).to_pandas()
+    for level, rows in rollups.groupby('rollup_level'):
+        assert rows['deals'].sum() == total, level
@@ -0,0 +1,89 @@
+import csv
+
+import pandas as pd
+import pytest
+
+import pipeline_runner as runner
+import validate_ingest
+
+
+def write_export(path, edit=None):
+    rows = list(csv.DictReader(open(runner.DEFAULT_INPUT, newline='')))
+    if edit:
+        edit(rows)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def validate(tmp_path, export):
+    output, quarantine = tmp_path / 'valid.parquet', tmp_path / 'quarantine.csv'
+    valid, rejected = validate_ingest.validate(runner.connect(), export, output, quarantine)
+    return valid, rejected, output, (pd.read_csv(quarantine) if quarantine.exists() else None)
+
+
+def test_clean_export_passes_untouched(tmp_path):
+    valid, rejected, output, quarantine = validate(tmp_path, runner.DEFAULT_INPUT)
+    assert (valid, rejected, quarantine) == (50, 0, None)
+    assert not list(tmp_path.glob('.*'))
+
+
+def test_failing_rows_are_quarantined_with_reasons(tmp_path):
+    def edit(rows):
+        rows[0]['Amount'] = '-5'
+        rows[1]['StageName'] = 'Negotiating'
+        rows[2]['Amount'] = 'lots'
+        rows[3]['Id'] = rows[4]['Id']
+        rows[5]['Security_Review_Status__c'] = 'Maybe'
+        rows[6]['CloseDate'] = '1999-01-01'
+    valid, rejected, output, quarantine = validate(tmp_path, write_export(tmp_path / 'bad.csv', edit))
+
+    assert (valid, rejected) == (43, 7)
+    reasons = ' | '.join(quarantine['_reasons'])
+    for reason in ('negative Amount', 'unknown StageName', 'Amount could not be parsed', 'duplicate Id',
+                   'unknown Security_Review_Status__c', 'CloseDate out of range'):
+        assert reason in reasons
+    assert quarantine['_raw_line'].notna().sum() == 1
+
+    kept = runner.connect().execute(f"SELECT * FROM {runner.source_scan(output)}").df()
+    assert len(kept) == 43 and (kept['Amount'] >= 0).all()
+
+
+def test_parse_failures_alone_are_quarantined(tmp_path):
+    def edit(rows):
+        rows[0]['Amount'] = 'lots'
+    valid, rejected, output, quarantine = validate(tmp_path, write_export(tmp_path / 'bad.csv', edit))
+
+    assert (valid, rejected) == (49, 1)
+    assert list(quarantine['_reasons']) == ['Amount could not be parsed']
+    assert not list(tmp_path.glob('.*'))
+
+
+def test_quarantine_is_removed_once_the_export_is_clean(tmp_path):
+    def edit(rows):
+        rows[0]['Amount'] = '-5'
+    validate(tmp_path, write_export(tmp_path / 'bad.csv', edit))
+    assert (tmp_path / 'quarantine.csv').exists()
+    validate(tmp_path, runner.DEFAULT_INPUT)
+    assert not (tmp_path / 'quarantine.csv').exists()
+
+
+def test_missing_columns_fail_with_their_names(tmp_path):
+    export = tmp_path / 'narrow.csv'
+    export.write_text('Id,Name\n006A,Acme\n')
+    with pytest.raises(ValueError, match=r"missing required column\(s\): Account.Name, Owner.Name, Amount"):
+        validate(tmp_path, export)
+    assert not list(tmp_path.glob('*.parquet'))
+
+
+def test_validated_scores_only_valid_rows(tmp_path):
+    def edit(rows):
+        rows[0]['StageName'] = 'Negotiating'
+    export = write_export(tmp_path / 'bad.csv', edit)
+    path = validate_ingest.validated(export, tmp_path / 'valid.parquet', tmp_path / 'quarantine.csv')
+    con = runner.connect()
+    runner.score(con, path)
+    assert con.execute("SELECT COUNT(*) FROM raw_opportunities").fetchone()[0] == 49
+    assert validate_ingest.validated(path) == path